@@ -0,0 +1,171 @@
+"""
+Measures the extraction accuracy and time per image on a test image set, offline from recorded API responses.
+
+Run from root directory with: python -m benchmarks.bench_accuracy [--set set_1] [--mode replay|record]
+                                                                  [--workers 4] [--attempts 1] [--report FILE]
+
+The images are read from test_image_sets/images/<set>, the correct results from
+test_image_sets/expected_results/<set> and the API responses from test_image_sets/cassettes/<set>
+(one cassette per image, see modules/cassettes.py):
+
+- "record" calls the API (CLAUDE_API_KEY must be set) and stores its responses, once per image set
+  or whenever the prompt or the model changes;
+- "replay" (default) needs no network access and no API key: scoreboard detection, consensus and the
+  comparison run for real, the API answers come from the cassettes.
+
+Images run in parallel worker processes. For each image the report gives the share of correct team
+victory points, player names and player scores, and the time spent in `parse_game_score`.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_IMAGE_SETS_PATH = os.path.join(ROOT, "test_image_sets")
+FIELDS = ("team_vp", "player_names", "player_scores")
+
+
+def pair_teams(actual_teams, expected_teams):
+    """
+    Pairs each expected team with the extracted team it corresponds to: by name when the extraction found
+    the same team names, otherwise by rank of victory points (like test_robz_elo_system.py).
+    """
+    if set(actual_teams) == set(expected_teams):
+        return [(actual_teams[name], expected_teams[name]) for name in expected_teams]
+    by_points = lambda teams: sorted(teams.values(), key=lambda team: team.get('victory_points') or 0, reverse=True)
+    actual, expected = by_points(actual_teams), by_points(expected_teams)
+    return [(actual[index] if index < len(actual) else {}, team) for index, team in enumerate(expected)]
+
+
+def score_fields(actual, expected):
+    """
+    Compares an extracted game result with the correct one.
+
+    **Returns:**
+    - `{field: (correct, total)}` for `team_vp`, `player_names` (expected players found in their team)
+      and `player_scores` (correct scores of the players found).
+    """
+    counts = {field: [0, 0] for field in FIELDS}
+    for actual_team, expected_team in pair_teams((actual or {}).get('teams', {}), expected.get('teams', {})):
+        counts['team_vp'][0] += actual_team.get('victory_points') == expected_team.get('victory_points')
+        counts['team_vp'][1] += 1
+
+        actual_scores = {}
+        for player in actual_team.get('players', []):
+            actual_scores.setdefault(player.get('name'), []).append(player.get('score'))
+        for player in expected_team.get('players', []):
+            counts['player_names'][1] += 1
+            counts['player_scores'][1] += 1
+            scores = actual_scores.get(player['name'])
+            if scores:
+                counts['player_names'][0] += 1
+                counts['player_scores'][0] += player.get('score') in scores
+    return {field: tuple(value) for field, value in counts.items()}
+
+
+def evaluate_image(image_path, expected_path, cassette_path, mode="replay", num_attempts=1):
+    """Parses one image through a cassette and scores it; runs in a worker process."""
+    from modules.cassettes import Cassette, CassetteClient
+    from modules.extract_data import parse_game_score
+
+    with open(expected_path, "r", encoding="utf-8") as file:
+        expected = json.load(file)
+
+    client = None
+    if mode == "record":
+        from anthropic import Anthropic
+        from configs.llm_config import API_KEYS
+        client = Anthropic(api_key=API_KEYS['claude'])
+        if os.path.exists(cassette_path):
+            os.remove(cassette_path)  # Record from scratch
+    cassette_client = CassetteClient(Cassette(cassette_path), mode=mode, client=client)
+
+    start = time.perf_counter()
+    error = None
+    try:
+        actual = parse_game_score(image_path, num_attempts=num_attempts, client=cassette_client)
+        failed_attempts = [attempt['error'] for attempt in (actual or {}).get('attempts_data', []) if attempt['error']]
+        if failed_attempts:
+            error = failed_attempts[0]
+    except Exception as e:
+        actual, error = None, str(e)
+    seconds = time.perf_counter() - start
+
+    return {'image_file': os.path.basename(image_path), 'seconds': seconds, 'error': error,
+            'fields': score_fields(actual, expected)}
+
+
+def run(set_name="set_1", mode="replay", workers=None, num_attempts=1):
+    """
+    Evaluates every image of the set that has an expected result and returns the per-image rows
+    (see `evaluate_image`), in file name order.
+    """
+    image_folder = os.path.join(TEST_IMAGE_SETS_PATH, "images", set_name)
+    expected_folder = os.path.join(TEST_IMAGE_SETS_PATH, "expected_results", set_name)
+    cassette_folder = os.path.join(TEST_IMAGE_SETS_PATH, "cassettes", set_name)
+
+    jobs = []
+    for image_file in sorted(os.listdir(image_folder)):
+        stem = os.path.splitext(image_file)[0]
+        expected_path = os.path.join(expected_folder, f"{stem}.json")
+        if image_file.lower().endswith(('.png', '.jpg', '.jpeg')) and os.path.exists(expected_path):
+            jobs.append((os.path.join(image_folder, image_file), expected_path, os.path.join(cassette_folder, f"{stem}.json")))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(evaluate_image, *job, mode, num_attempts) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def totals(rows):
+    """Adds up the field counts of every image: `{field: (correct, total)}`."""
+    counts = Counter()
+    for row in rows:
+        for field, (correct, total) in row['fields'].items():
+            counts[(field, 0)] += correct
+            counts[(field, 1)] += total
+    return {field: (counts[(field, 0)], counts[(field, 1)]) for field in FIELDS}
+
+
+def accuracy(correct, total):
+    return correct / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--set", default="set_1", dest="set_name", help="Image set in test_image_sets/images (default: set_1)")
+    parser.add_argument("--mode", choices=("replay", "record"), default="replay", help="Replay the cassettes or record new ones")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--attempts", type=int, default=1, help="Extraction attempts per image (must match the recording)")
+    parser.add_argument("--report", help="Also write the per-image results to this JSON file")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()  # Keep the workers quiet (they inherit this), the report says what went wrong
+    logger.add(sys.stderr, level="ERROR")
+
+    start = time.perf_counter()
+    rows = run(args.set_name, args.mode, args.workers, args.attempts)
+    wall_seconds = time.perf_counter() - start
+
+    print(f"{'Image':<28} {'Team VP':>9} {'Names':>9} {'Scores':>9} {'Time (s)':>9}  {'Error'}")
+    print("-" * 80)
+    for row in rows + [{'image_file': "TOTAL", 'fields': totals(rows), 'seconds': sum(row['seconds'] for row in rows), 'error': None}]:
+        columns = " ".join(f"{accuracy(*row['fields'][field]):>9.1%}" for field in FIELDS)
+        print(f"{row['image_file']:<28} {columns} {row['seconds']:>9.2f}  {row['error'] or ''}")
+    print(f"{len(rows)} image(s) in {wall_seconds:.2f} s of wall time")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as file:
+            json.dump({'set': args.set_name, 'mode': args.mode, 'images': rows, 'totals': totals(rows),
+                       'wall_seconds': wall_seconds}, file, indent=4)
+    if any(row['error'] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmarks the team-balancing solvers used by the matchmaker.
+
+Run from root directory with: python -m benchmarks.bench_matchmaker [--sizes 8 16 24 40 64 100 200]
+
+Each size uses random Elo ratings in the range real lobbies span. The brute-force column is the
+original `combinations` search, only run for small lobbies where it finishes at all. Fractional
+ratings are also timed, since they take the meet-in-the-middle path instead of the DP, and so is the
+win-probability objective ("p(win)" rows).
+"""
+
+import time
+import random
+import argparse
+from itertools import combinations
+
+from loguru import logger
+
+from modules.team_balancer import balance_teams, MITM_MAX_PLAYERS
+
+BRUTE_FORCE_MAX_PLAYERS = 20
+
+
+def brute_force(ratings):
+    """The search `modules.matchmaker` used before the solver layer, for comparison."""
+    n = len(ratings)
+    total = sum(ratings)
+    return min(abs(total - 2 * sum(ratings[i] for i in team)) for team in combinations(range(n), n // 2))
+
+
+def time_call(function, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(sizes, repeat=3, seed=0):
+    """
+    Runs the benchmark and returns a list of `(players, method, seconds, difference)` rows.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for num_players in sizes:
+        ratings = [rng.randint(900, 1900) for _ in range(num_players)]
+        if num_players <= BRUTE_FORCE_MAX_PLAYERS:
+            seconds, difference = time_call(lambda: brute_force(ratings), 1)
+            rows.append((num_players, "brute force", seconds, difference))
+        for method in ("auto", "kk"):
+            seconds, split = time_call(lambda: balance_teams(ratings, method), repeat)
+            rows.append((num_players, split['method'] if method == "auto" else method, seconds, abs(split['difference'])))
+        seconds, split = time_call(lambda: balance_teams(ratings, objective="win_probability"), repeat)
+        rows.append((num_players, f"p(win) {split['method']}", seconds, abs(split['difference'])))
+        if num_players <= MITM_MAX_PLAYERS:
+            fractional = [rating + rng.random() for rating in ratings]
+            seconds, split = time_call(lambda: balance_teams(fractional, "mitm"), repeat)
+            rows.append((num_players, "mitm (fractional)", seconds, round(abs(split['difference']), 4)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 20, 24, 32, 40, 64, 100, 200], help="Number of players per lobby")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement (the best time is reported)")
+    args = parser.parse_args()
+
+    logger.remove()  # The solvers log every split at debug level
+    print(f"{'Players':>8} {'Method':<18} {'Time (s)':>10} {'Difference':>11}")
+    print("-" * 50)
+    for num_players, method, seconds, difference in run(args.sizes, args.repeat):
+        print(f"{num_players:>8} {method:<18} {seconds:>10.4f} {difference:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmarks saving and loading the Elo database in every supported DATABASE_FORMAT.
+
+Run from root directory with: python -m benchmarks.bench_serialization [--sizes 1000 10000 100000]
+
+Each size uses a synthetic database whose players have realistic `Elo History` arrays. Saves go through
+`Database.commit` and loads through `Database.read`, so the timings include locking, fsync and format
+detection exactly as the ingest and admin tools experience them.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+from modules.database import Database
+from modules.serialization import get_serializer
+
+FORMATS = ["json-pretty", "json", "msgpack", "zstd"]
+
+
+def make_synthetic_database(num_players, max_history=300, seed=0):
+    """
+    Returns an Elo database with `num_players` players and random-length rating histories.
+    """
+    rng = random.Random(seed)
+    players = []
+    for index in range(num_players):
+        elo = 1200
+        history = []
+        for _ in range(rng.randint(0, max_history)):
+            elo += rng.randint(-40, 40)
+            history.append(elo)
+        wins = rng.randint(0, len(history))
+        players.append({
+            'PlayerName': f"Player_{index:06d}",
+            'Starting Elo': elo,
+            'games played': len(history),
+            'past names': [f"Alias_{index:06d}"] if rng.random() < 0.1 else [],
+            'Elo History': history,
+            'Games Won': wins,
+            'Games Lost': len(history) - wins
+        })
+    return {"Players": players}
+
+
+def time_call(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, repeat=3):
+    """
+    Runs the benchmark and returns a list of `(players, format, save_seconds, load_seconds, size_bytes)` rows.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_players in sizes:
+            data = make_synthetic_database(num_players)
+            for format_name in FORMATS:
+                try:
+                    serializer = get_serializer(format_name)
+                except ImportError as e:
+                    print(f"Skipping {format_name}: {e}", file=sys.stderr)
+                    continue
+
+                path = os.path.join(tmp_dir, f"players_{num_players}_{format_name}.db")
+                database = Database(path, serializer=serializer)
+                version = [0]
+
+                def save():
+                    version[0] = database.commit(data, version[0])
+
+                save_seconds = time_call(save, repeat)
+                load_seconds = time_call(database.read, repeat)
+                rows.append((num_players, format_name, save_seconds, load_seconds, os.path.getsize(path)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Number of players per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement (the best time is reported)")
+    args = parser.parse_args()
+
+    print(f"{'Players':>8} {'Format':<12} {'Save (s)':>10} {'Load (s)':>10} {'Size (MB)':>10}")
+    print("-" * 54)
+    for num_players, format_name, save_seconds, load_seconds, size in run(args.sizes, args.repeat):
+        print(f"{num_players:>8} {format_name:<12} {save_seconds:>10.4f} {load_seconds:>10.4f} {size / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmarks how long each command of robz_elo_system.py takes to start, and fails on regressions.
+
+Run from root directory with: python -m benchmarks.bench_startup [--repeat 5] [--max-seconds 1.5]
+
+Each command runs in a fresh interpreter, in a temporary directory with a small database, so it
+measures what a user waits for: interpreter start, imports and the command itself. Interactive
+commands (matchmake, serve, ingest) are measured by importing what they import.
+
+The run fails (exit code 1) if a command that does not read images loads one of the heavy libraries
+(OpenCV, Pillow, the Anthropic client, pandas; numpy is only allowed for matchmaking and the rating
+service), or takes longer than --max-seconds.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("cv2", "PIL", "anthropic", "pandas", "numpy")
+
+# (command, interpreter arguments, heavy modules it may load)
+COMMANDS = [
+    ("leaderboard", [os.path.join(ROOT, "robz_elo_system.py"), "leaderboard", "5"], ()),
+    ("rename", [os.path.join(ROOT, "robz_elo_system.py"), "rename", "Player 3", "Player Three"], ()),
+    ("replay", [os.path.join(ROOT, "robz_elo_system.py"), "replay"], ()),
+    ("pairs", [os.path.join(ROOT, "robz_elo_system.py"), "pairs", "Player 3"], ()),
+    ("games", [os.path.join(ROOT, "robz_elo_system.py"), "games", "--player", "Player 3", "--fields", "game_id"], ()),
+    ("matchmake", ["-c", "import robz_elo_system, modules.matchmaker"], ("numpy",)),
+    ("serve", ["-c", "import robz_elo_system, modules.rating_service"], ("numpy",)),
+    # For comparison: what ingest pays once it reads images (not subject to the budget)
+    ("ingest", ["-c", "import robz_elo_system, modules.save_data, cv2, numpy, PIL.Image, anthropic"], HEAVY_MODULES),
+]
+
+
+def write_database(directory, num_players=50, num_games=20):
+    """Writes a small Elo database and game ledger to `directory`."""
+    players = [{'PlayerName': f"Player {i}", 'Starting Elo': 1000 + 10 * i, 'games played': 5, 'past names': [],
+                'Elo History': [1000 + 10 * i], 'Games Won': 2, 'Games Lost': 3} for i in range(num_players)]
+    games = [{'game_id': f"game-{g}", 'consensus_data': {'teams': {
+        'Team A': {'victory_points': 10, 'players': [{'name': f"Player {(g + i) % num_players}"} for i in range(3)]},
+        'Team B': {'victory_points': 5, 'players': [{'name': f"Player {(g + i + 3) % num_players}"} for i in range(3)]}}}}
+        for g in range(num_games)]
+    with open(os.path.join(directory, "players_data.json"), "w") as file:
+        json.dump({'Players': players}, file)
+    with open(os.path.join(directory, "game_results.json"), "w") as file:
+        json.dump(games, file)
+
+
+def run_command(arguments, directory, import_time=False):
+    """Runs `python <arguments>` in `directory` and returns `(seconds, completed process)`."""
+    environment = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    flags = ["-X", "importtime"] if import_time else []
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *flags, *arguments], cwd=directory, env=environment,
+                               capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    return time.perf_counter() - start, completed
+
+
+def loaded_heavy_modules(arguments, directory):
+    """Returns the heavy libraries a command imports, read from `python -X importtime`."""
+    _, completed = run_command(arguments, directory, import_time=True)
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            loaded.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return sorted(loaded & set(HEAVY_MODULES))
+
+
+def run(repeat=5, max_seconds=1.5):
+    """
+    Runs the benchmark and returns a list of `(command, seconds, unexpected heavy modules, failed)` rows.
+    """
+    rows = []
+    directory = tempfile.mkdtemp()
+    try:
+        for command, arguments, allowed in COMMANDS:
+            times = []
+            for _ in range(repeat):
+                write_database(directory)  # Fresh files every run, e.g. the rename only succeeds once
+                times.append(run_command(arguments, directory)[0])
+            best = min(times)
+            unexpected = [module for module in loaded_heavy_modules(arguments, directory) if module not in allowed]
+            failed = bool(unexpected) or (command != "ingest" and best > max_seconds)
+            rows.append((command, best, unexpected, failed))
+    finally:
+        shutil.rmtree(directory)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (the best time is reported)")
+    parser.add_argument("--max-seconds", type=float, default=1.5, help="Startup budget of every command except ingest")
+    args = parser.parse_args()
+
+    print(f"{'Command':<12} {'Time (s)':>9}  {'Unexpected imports':<24} {'Result'}")
+    print("-" * 60)
+    rows = run(args.repeat, args.max_seconds)
+    for command, seconds, unexpected, failed in rows:
+        print(f"{command:<12} {seconds:>9.3f}  {', '.join(unexpected) or '-':<24} {'FAIL' if failed else 'ok'}")
+    if any(failed for *_, failed in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
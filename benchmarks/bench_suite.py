@@ -0,0 +1,189 @@
+"""
+Benchmarks the extraction, rating and persistence code paths, and flags regressions against a stored baseline.
+
+Run from root directory with: python -m benchmarks.bench_suite [--sizes 1000 10000 100000] [--images 10]
+                                                                [--save-baseline] [--tolerance 0.25]
+
+Cases (each timed `--repeat` times, the median is reported):
+- detect_scoreboard: every image of test_image_sets/set_all (or the first `--images`), per image
+- compute_consensus / group_similar_names: synthetic extraction attempts with misread names
+- order_data / calculatePoints: one 8 vs 8 game against synthetic databases of each size
+- prepareData: committing one rated game to a database file of each size
+- Leaderboard: moving the players of one rated game on a leaderboard of each size, and one rank lookup
+- load_elo_database: reading a database file of each size
+
+Everything runs offline in a temporary directory; the synthetic data comes from a fixed seed, so two runs
+measure the same work. The medians are compared with benchmarks/baseline.json: a case is flagged (and the
+run exits with 1) when it is more than `--tolerance` slower than its baseline. Timings depend on the
+machine, so regenerate the baseline with --save-baseline when switching machines.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from statistics import median
+
+from benchmarks.bench_serialization import make_synthetic_database
+from modules.database import players_database
+from modules.elo_calculation import calculatePoints
+from modules.extract_data import order_data, compute_consensus, group_similar_names
+from modules.leaderboard import Leaderboard
+from modules.save_data import prepareData
+from modules.utils import load_elo_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_SET_PATH = os.path.join(ROOT, "test_image_sets", "set_all")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+NOISE_FLOOR_SECONDS = 0.0005  # Differences below this are timer noise, never regressions
+
+
+def misread(name, rng):
+    """Returns `name` with one character replaced, like a misread screenshot."""
+    index = rng.randrange(len(name))
+    return name[:index] + rng.choice("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ") + name[index + 1:]
+
+
+def synthetic_attempts(num_attempts, players_per_team=8, error_rate=0.1, seed=0):
+    """Returns `num_attempts` parsed results of the same game, with some misread names and scores."""
+    rng = random.Random(seed)
+    names = {team: [f"{team[:3].upper()}_Player_{i:02d}" for i in range(players_per_team)] for team in ("Wehrmacht", "USA")}
+    scores = {name: rng.randint(0, 400) for team in names.values() for name in team}
+    attempts = []
+    for _ in range(num_attempts):
+        teams = {}
+        for team, team_names in names.items():
+            players = [{'name': misread(name, rng) if rng.random() < error_rate else name,
+                        'score': scores[name] + (1 if rng.random() < error_rate else 0)} for name in team_names]
+            teams[team] = {'victory_points': 500 if team == "Wehrmacht" else 380, 'players': players}
+        attempts.append({'teams': teams, 'winner': "Wehrmacht"})
+    return attempts
+
+
+def synthetic_game(eloDatabase, players_per_team=8, seed=0):
+    """Returns a game result between players of `eloDatabase` (one of them under a past name if any has one)."""
+    rng = random.Random(seed)
+    chosen = rng.sample(eloDatabase['Players'], 2 * players_per_team)
+    names = [player['past names'][0] if player['past names'] and index == 0 else player['PlayerName']
+             for index, player in enumerate(chosen)]
+    return {'teams': {
+        'Wehrmacht': {'victory_points': 500, 'players': [{'name': name, 'score': 100} for name in names[:players_per_team]]},
+        'USA': {'victory_points': 380, 'players': [{'name': name, 'score': 100} for name in names[players_per_team:]]},
+    }, 'winner': "Wehrmacht"}
+
+
+def measure(function, repeat):
+    """Calls `function` `repeat` times and returns the median duration in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+
+def run(sizes, images=None, repeat=5):
+    """
+    Runs every case and returns `{case name: median seconds}`.
+    """
+    from modules.extract_data import detect_scoreboard  # Pulls in OpenCV, only needed for this case
+
+    results = {}
+    image_files = sorted(f for f in os.listdir(IMAGE_SET_PATH) if f.lower().endswith(('.png', '.jpg', '.jpeg')))[:images]
+    if image_files:
+        paths = [os.path.join(IMAGE_SET_PATH, image_file) for image_file in image_files]
+        total = measure(lambda: [detect_scoreboard(path, save_cropped=False) for path in paths], max(1, repeat // 5))
+        results["detect_scoreboard (per image)"] = total / len(paths)
+
+    for num_attempts in (3, 10):
+        attempts = synthetic_attempts(num_attempts)
+        results[f"compute_consensus ({num_attempts} attempts)"] = measure(lambda: compute_consensus(json.loads(json.dumps(attempts))), repeat)
+    names = [player['name'] for attempt in synthetic_attempts(10) for team in attempt['teams'].values() for player in team['players']]
+    results[f"group_similar_names ({len(names)} names)"] = measure(lambda: group_similar_names(names), repeat)
+
+    current_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)  # prepareData commits to ELO_JSON_DATABASE_PATH, relative to the working directory
+        try:
+            for num_players in sizes:
+                eloDatabase = make_synthetic_database(num_players, max_history=50)
+                game = synthetic_game(eloDatabase)
+                results[f"order_data ({num_players} players)"] = measure(lambda: order_data(game, eloDatabase), repeat)
+                playerDictionary = order_data(game, eloDatabase)
+                results[f"calculatePoints ({num_players} players)"] = measure(
+                    lambda: calculatePoints(json.loads(json.dumps(playerDictionary))), repeat)
+
+                database = players_database()
+                database.commit(eloDatabase, database.current_version())
+                updatedPlayerDictionary = calculatePoints(playerDictionary)
+                results[f"prepareData ({num_players} players)"] = measure(
+                    lambda: prepareData(json.loads(json.dumps(updatedPlayerDictionary)), eloDatabase), repeat)
+                results[f"load_elo_database ({num_players} players)"] = measure(lambda: load_elo_database(database.path), repeat)
+
+                leaderboard = Leaderboard.from_database(eloDatabase)
+                results[f"Leaderboard.update_from_game ({num_players} players)"] = measure(
+                    lambda: leaderboard.update_from_game(updatedPlayerDictionary), repeat)
+                results[f"Leaderboard.rank ({num_players} players)"] = measure(
+                    lambda: leaderboard.rank(updatedPlayerDictionary['Wehrmacht']['players'][0][0]), repeat)
+        finally:
+            os.chdir(current_dir)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns `(case, seconds, baseline seconds, ratio, regressed)` rows; cases missing from the baseline
+    have None as baseline and ratio.
+    """
+    rows = []
+    for case, seconds in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            rows.append((case, seconds, None, None, False))
+            continue
+        regressed = seconds > reference * (1 + tolerance) and seconds - reference > NOISE_FLOOR_SECONDS
+        rows.append((case, seconds, reference, seconds / reference if reference else None, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Number of players of the synthetic databases")
+    parser.add_argument("--images", type=int, help="Number of images of test_image_sets/set_all to time (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per case (the median is reported)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Slowdown relative to the baseline flagged as a regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare with (or write)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's timings as the new baseline")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()  # The code under test logs every game, which would drown the table
+    logger.add(sys.stderr, level="WARNING")
+
+    results = run(args.sizes, args.images, args.repeat)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    print(f"{'Case':<40} {'Median (ms)':>12} {'Baseline (ms)':>14} {'Ratio':>7}  {'Result'}")
+    print("-" * 86)
+    rows = compare(results, baseline, args.tolerance)
+    for case, seconds, reference, ratio, regressed in rows:
+        reference_text = f"{reference * 1000:>14.3f}" if reference is not None else f"{'-':>14}"
+        ratio_text = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+        print(f"{case:<40} {seconds * 1000:>12.3f} {reference_text} {ratio_text}  {'REGRESSION' if regressed else 'ok'}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(dict(baseline, **results), file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+    elif any(regressed for *_, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,42 @@ IMAGE_FOLDER_PATH = "image_input" # Path to the folder containing the game score
 ELO_JSON_DATABASE_PATH = "players_data.json" # Path to the Elo JSON database (will be created if it doesn't exist)
 GAME_RESULTS_JSON_PATH = "game_results.json" # Path to the game results JSON file (will be created if it doesn't exist)
 LOGGING_FILE_PATH = "robz_elo_system.log" # Path to the logging file (will be created if it doesn't exist)
-LOG_LEVEL = "INFO" # INFO / DEBUG
\ No newline at end of file
+LOG_LEVEL = "INFO" # INFO / DEBUG
+FLUSH_EVERY_N_GAMES = 5 # Number of processed games after which pending database updates are written to disk
+FLUSH_INTERVAL_SECONDS = 30 # Maximum number of seconds pending database updates are kept in memory before being written to disk
+DATABASE_LOCK_TIMEOUT_SECONDS = 10 # Maximum number of seconds to wait for another process to release the database lock
+DATABASE_COMMIT_RETRIES = 5 # Number of times a database update is retried when another process changed the database in the meantime
+ATTEMPTS_STORAGE = "inline" # How per-attempt extraction data is saved: "inline" (diffs in game_results.json) / "side_file" (diffs in ATTEMPTS_SIDE_FILE_PATH) / "full" (raw copies)
+ATTEMPTS_SIDE_FILE_PATH = "attempts_data.jsonl.gz" # Path to the compressed per-attempt side-file (used when ATTEMPTS_STORAGE is "side_file")
+DATABASE_FORMAT = "json" # Format the Elo database is written in: json (compact) / json-pretty / msgpack / zstd (msgpack and zstd need "pip install msgpack zstandard"). Any format is detected automatically on load
+LEADERBOARD_SNAPSHOT_PATH = "leaderboard.bin" # Path to the memory-mapped leaderboard snapshot published on every database commit (set to "" to disable)
+NAME_MATCH_MAX_EDITS = 2 # Maximum number of character edits between a scanned name and a known name for them to be considered a match
+NAME_AUTO_MAP_THRESHOLD = 0.85 # Similarity score (0-1) above which an unknown scanned name is mapped to the matching player automatically
+NAME_REVIEW_THRESHOLD = 0.6 # Similarity score (0-1) above which an unknown scanned name is queued for review instead of being added as a new player
+NAME_REVIEW_QUEUE_PATH = "name_review_queue.json" # Path to the queue of scanned names awaiting review (see modules/name_management.py)
+MATCHMAKING_OBJECTIVE = "win_probability" # How the matchmaker ranks team splits: "win_probability" (predicted win chance closest to 50%, using the same Elo model as game predictions) / "rating_sum" (smallest difference of summed Elo ratings)
+MULTI_LOBBY_TIME_BUDGET_SECONDS = 2 # Time the matchmaker spends searching for the best partition when splitting a pool into several lobbies
+MULTI_LOBBY_ACROSS_WEIGHT = 0.25 # Weight of evening out the lobbies (relative to balancing the two teams within each lobby) when splitting a pool into several lobbies
+MATCHMAKING_ALTERNATIVE_SPLITS = 2 # Number of next-best team splits the matchmaker shows after the best one (0 shows only the best)
+RATING_SERVICE_HOST = "127.0.0.1" # Address the local rating service listens on (see modules/rating_service.py)
+RATING_SERVICE_PORT = 8765 # Port of the local rating service. The command line tools use the service when it is running and read the database files otherwise
+RATING_SERVICE_TIMEOUT_SECONDS = 30 # Maximum number of seconds a tool waits for a response from the rating service
+HEADLESS_UNREVIEWED_POLICY = "hold" # What "robz_elo_system.py ingest --headless" does with the games nobody reviewed: "commit" (rate them as read) / "hold" (record them unrated until "robz_elo_system.py review") / "reject" (skip them)
+METRICS_ENABLED = False # Record how long each stage of the ingest takes (scoreboard detection, LLM requests, consensus, review, saves) and export p50/p95/p99 per stage at the end of the run (same as "robz_elo_system.py ingest --metrics")
+METRICS_PROMETHEUS_PATH = "metrics.prom" # Path to the Prometheus text file written at the end of an ingest with metrics (e.g. for the node exporter's textfile collector; set to "" to disable)
+METRICS_SUMMARY_PATH = "metrics_summary.json" # Path to the JSON summary written at the end of an ingest with metrics (set to "" to disable)
+LLM_INPUT_COST_PER_MILLION_TOKENS = 3.00 # Price in USD of one million input tokens of the extraction model (used for the cost accounting, see modules/llm_usage.py)
+LLM_OUTPUT_COST_PER_MILLION_TOKENS = 15.00 # Price in USD of one million output tokens of the extraction model
+LLM_ESTIMATED_OUTPUT_TOKENS = 400 # Output tokens per call assumed by "robz_elo_system.py ingest --dry-run" until calls have been recorded in the game results
+LLM_ESTIMATED_SECONDS_PER_CALL = 8 # Seconds per call assumed by "robz_elo_system.py ingest --dry-run" until calls have been recorded in the game results
+PROFILES_FOLDER = "profiles" # Folder where "robz_elo_system.py ingest --profile" writes its cProfile traces (one subfolder per run, one per image)
+PROFILE_TOP_FUNCTIONS = 30 # Number of hot functions listed in the summary of a profiled run
+PROFILE_OUTLIER_FACTOR = 3.0 # A profiled image is flagged as an outlier when one of its stages takes more than this many times the median of that stage
+PROFILE_OUTLIER_MIN_SECONDS = 0.1 # Stage durations below this are never flagged (timer noise on the fast stages)
+CROPPED_SCOREBOARDS_FOLDER = "cropped_scoreboards" # Folder where the cropped scoreboard of every processed image is kept (used for the thumbnails of the report)
+REPORT_FOLDER = "report" # Folder the static HTML report is published to by "robz_elo_system.py report" (leaderboard, player pages, recent games)
+REPORT_RECENT_GAMES = 50 # Number of most recent games shown, with their scoreboard thumbnails, on the report's games page
+REPORT_THUMBNAIL_WIDTH = 480 # Largest width and height in pixels of the scoreboard thumbnails of the report
+PAIR_STATS_FOLDER = "pair_stats" # Folder of the head-to-head and teammate statistics (one file per player), updated with every rated game and computed from the game results when missing (see modules/pair_stats.py)
+PAIR_STATS_MIN_GAMES = 3 # Minimum number of games together (or against each other) for a partner or opponent to be listed by "robz_elo_system.py pairs"
+PAIR_STATS_COUNT = 5 # Number of best and worst partners and opponents listed by "robz_elo_system.py pairs"
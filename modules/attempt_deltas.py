@@ -0,0 +1,291 @@
+import os
+import gzip
+import json
+import copy
+import uuid
+from loguru import logger
+
+from configs.app_config import GAME_RESULTS_JSON_PATH, ATTEMPTS_STORAGE, ATTEMPTS_SIDE_FILE_PATH
+from modules.database import FileLock, game_results_database
+
+# Run from root directory with: python -m modules.attempt_deltas
+# (compacts the attempts data of games saved before delta encoding was introduced)
+
+
+def diff_json(base, target, path=()):
+    """
+    Returns a list of operations that turn `base` into `target`.
+
+    Operations are compact lists so they serialize small:
+    - `["set", path, value]`: set a dictionary key or list index (appending at the end of a list)
+    - `["del", path]`: remove a dictionary key
+    - `["len", path, n]`: truncate a list to `n` items
+
+    **Example:**
+
+    ```python
+    base = {"victory_points": 15, "players": [{"name": "Alice", "score": 2000}]}
+    target = {"victory_points": 12, "players": [{"name": "Alyce", "score": 2000}, {"name": "Bob", "score": 1800}]}
+    print(diff_json(base, target))
+    # Output:
+    # [['set', ['victory_points'], 12], ['set', ['players', 0, 'name'], 'Alyce'],
+    #  ['set', ['players', 1], {'name': 'Bob', 'score': 1800}]]
+    ```
+    """
+    if isinstance(base, dict) and isinstance(target, dict):
+        operations = []
+        for key, value in target.items():
+            if key in base:
+                operations.extend(diff_json(base[key], value, path + (key,)))
+            else:
+                operations.append(["set", list(path + (key,)), value])
+        for key in base:
+            if key not in target:
+                operations.append(["del", list(path + (key,))])
+        return operations
+
+    if isinstance(base, list) and isinstance(target, list):
+        operations = []
+        for index, value in enumerate(target[:len(base)]):
+            operations.extend(diff_json(base[index], value, path + (index,)))
+        if len(target) < len(base):
+            operations.append(["len", list(path), len(target)])
+        for index in range(len(base), len(target)):
+            operations.append(["set", list(path + (index,)), target[index]])
+        return operations
+
+    if type(base) is type(target) and base == target:
+        return []
+    return [["set", list(path), target]]
+
+
+def patch_json(base, operations):
+    """
+    Applies operations produced by `diff_json` to a copy of `base` and returns the result.
+    """
+    result = copy.deepcopy(base)
+    for operation in operations:
+        action, path = operation[0], operation[1]
+        if not path:
+            if action == "set":
+                result = copy.deepcopy(operation[2])
+            elif action == "len":
+                del result[operation[2]:]
+            continue
+
+        parent = result
+        for key in path[:-1]:
+            parent = parent[key]
+        key = path[-1]
+
+        if action == "set":
+            value = copy.deepcopy(operation[2])
+            if isinstance(parent, list) and key == len(parent):
+                parent.append(value)
+            else:
+                parent[key] = value
+        elif action == "del":
+            del parent[key]
+        elif action == "len":
+            del parent[key][operation[2]:]
+        else:
+            raise ValueError(f"Unknown delta operation '{action}'")
+    return result
+
+
+def encode_attempts(consensus_data, attempts_data):
+    """
+    Encodes the raw extraction attempts as diffs against the consensus result.
+
+    Most attempts agree with the consensus on nearly every field, so each one shrinks to a handful of
+    operations instead of a full copy of the teams and players.
+
+    **Parameters:**
+    - `consensus_data` (dict): The consensus game result (without `attempts_data`).
+    - `attempts_data` (list of dict): The per-attempt records produced by `parse_game_score`.
+
+    **Returns:**
+    - A list of `{"attempt", "error", "diff"}` records; `diff` is `None` for failed attempts.
+    """
+    encoded = []
+    for attempt in attempts_data:
+        parsed_data = attempt.get('parsed_data')
+        encoded.append({
+            'attempt': attempt.get('attempt'),
+            'error': attempt.get('error'),
+            'diff': diff_json(consensus_data, parsed_data) if parsed_data is not None else None
+        })
+    return encoded
+
+
+def decode_attempts(consensus_data, encoded_attempts):
+    """
+    Rebuilds the full per-attempt records from the consensus result and the output of `encode_attempts`.
+    """
+    return [
+        {
+            'attempt': attempt['attempt'],
+            'parsed_data': patch_json(consensus_data, attempt['diff']) if attempt['diff'] is not None else None,
+            'error': attempt['error']
+        }
+        for attempt in encoded_attempts
+    ]
+
+
+def append_side_file(game_id, encoded_attempts, side_file_path=ATTEMPTS_SIDE_FILE_PATH):
+    """
+    Appends the encoded attempts of one game to the compressed side-file.
+
+    The side-file is a gzip stream of JSON lines (`{"id": ..., "game_id": ..., "attempts": [...]}`); every
+    append adds a new gzip member, which standard gzip readers concatenate transparently. Game ids are
+    millisecond timestamps that two games of a fast run can share, so each record gets a unique `id`,
+    which the ledger entry keeps under `attempts_id`.
+
+    **Returns:**
+    - The id of the new record.
+    """
+    record_id = uuid.uuid4().hex
+    line = json.dumps({'id': record_id, 'game_id': game_id, 'attempts': encoded_attempts}, separators=(',', ':')) + "\n"
+    with FileLock(side_file_path):
+        with gzip.open(side_file_path, "ab") as file:
+            file.write(line.encode("utf-8"))
+    return record_id
+
+
+def read_side_file(side_file_path=ATTEMPTS_SIDE_FILE_PATH):
+    """
+    Returns a dictionary mapping record id to encoded attempts from the side-file. Records written
+    before records had ids are keyed by their game_id.
+
+    A record cut off by a crash at the end of the file is ignored.
+
+    **Raises:**
+    - `ValueError`: If two records have the same key, e.g. two old records of games that share a game_id,
+      instead of silently returning the attempts of one game for the other.
+    """
+    records = {}
+    if not os.path.exists(side_file_path):
+        return records
+    try:
+        with gzip.open(side_file_path, "rt", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = record.get('id', record['game_id'])
+                if key in records:
+                    raise ValueError(f"Duplicate record '{key}' in '{side_file_path}': can not tell which game's attempts it holds")
+                records[key] = record['attempts']
+    except (EOFError, gzip.BadGzipFile):
+        logger.warning(f"Ignoring truncated data at the end of '{side_file_path}'")
+    return records
+
+
+def store_attempts(game_entry, attempts_data, storage=ATTEMPTS_STORAGE, side_file_path=ATTEMPTS_SIDE_FILE_PATH):
+    """
+    Stores the attempts of a game entry according to `storage` ("inline", "side_file" or "full").
+
+    - "inline" adds the encoded attempts to the entry under `attempts_delta`.
+    - "side_file" appends them to the compressed side-file and records its path under `attempts_file` and
+      the record's id under `attempts_id`.
+    - "full" keeps the previous behaviour of storing every raw attempt inside `consensus_data`.
+    """
+    if not attempts_data:
+        return game_entry
+    if storage == "full":
+        game_entry['consensus_data']['attempts_data'] = attempts_data
+        return game_entry
+
+    encoded = encode_attempts(game_entry['consensus_data'], attempts_data)
+    if storage == "side_file":
+        game_entry['attempts_id'] = append_side_file(game_entry['game_id'], encoded, side_file_path)
+        game_entry['attempts_file'] = os.path.basename(side_file_path)
+    else:
+        game_entry['attempts_delta'] = encoded
+    return game_entry
+
+
+def load_attempts_data(game_entry, side_file_records=None, side_file_path=ATTEMPTS_SIDE_FILE_PATH):
+    """
+    Returns the full per-attempt data of a saved game entry, whichever way it was stored.
+
+    **Parameters:**
+    - `game_entry` (dict): An entry from the game results ledger.
+    - `side_file_records` (dict): Optional output of `read_side_file`, to avoid re-reading it for every entry.
+
+    **Returns:**
+    - The list of per-attempt records (empty if the entry has none).
+    """
+    consensus_data = {k: v for k, v in game_entry['consensus_data'].items() if k != 'attempts_data'}
+    if 'attempts_data' in game_entry['consensus_data']:
+        return game_entry['consensus_data']['attempts_data']
+    if 'attempts_delta' in game_entry:
+        return decode_attempts(consensus_data, game_entry['attempts_delta'])
+    if 'attempts_file' in game_entry:
+        if side_file_records is None:
+            side_file_records = read_side_file(side_file_path)
+        encoded = side_file_records.get(game_entry.get('attempts_id', game_entry['game_id']))
+        if encoded is None:
+            logger.warning(f"Attempts for game '{game_entry['game_id']}' not found in '{side_file_path}'")
+            return []
+        return decode_attempts(consensus_data, encoded)
+    return []
+
+
+def replace_consensus(game_entry, consensus_data, side_file_records=None, side_file_path=ATTEMPTS_SIDE_FILE_PATH):
+    """
+    Replaces the consensus result of a ledger entry, e.g. with the reviewer's corrections or a merged
+    player's new name, and re-encodes the entry's attempts against it, so they still decode to exactly
+    what each attempt extracted. Side-file attempts are appended again as a new record.
+
+    **Parameters:**
+    - `game_entry` (dict): An entry from the game results ledger, updated in place.
+    - `consensus_data` (dict): The new consensus result.
+    - `side_file_records` (dict): Optional output of `read_side_file` (see `load_attempts_data`).
+
+    **Returns:**
+    - The updated `game_entry`.
+    """
+    attempts_data = load_attempts_data(game_entry, side_file_records, side_file_path)
+    if 'attempts_data' in game_entry['consensus_data']:
+        game_entry['consensus_data'] = dict(consensus_data, attempts_data=attempts_data)
+        return game_entry
+
+    consensus_data = {k: v for k, v in consensus_data.items() if k != 'attempts_data'}
+    game_entry['consensus_data'] = consensus_data
+    if 'attempts_delta' in game_entry:
+        game_entry['attempts_delta'] = encode_attempts(consensus_data, attempts_data)
+    elif 'attempts_file' in game_entry and attempts_data:
+        encoded = encode_attempts(consensus_data, attempts_data)
+        game_entry['attempts_id'] = append_side_file(game_entry['game_id'], encoded, side_file_path)
+    return game_entry
+
+
+def compact_game_results(game_results_path=GAME_RESULTS_JSON_PATH, storage=ATTEMPTS_STORAGE, side_file_path=ATTEMPTS_SIDE_FILE_PATH):
+    """
+    Rewrites ledger entries that still embed full `attempts_data` using delta encoding.
+
+    **Returns:**
+    - The number of entries that were compacted.
+    """
+    if storage == "full":
+        logger.info("ATTEMPTS_STORAGE is 'full', nothing to compact.")
+        return 0
+
+    def compact(game_results):
+        compacted = 0
+        for entry in game_results:
+            attempts_data = entry['consensus_data'].pop('attempts_data', None)
+            if attempts_data is not None:
+                store_attempts(entry, attempts_data, storage, side_file_path)
+                compacted += 1
+        return compacted
+
+    _, compacted = game_results_database(game_results_path).update(compact)
+    return compacted
+
+
+if __name__ == "__main__":
+    compacted = compact_game_results()
+    logger.info(f"Compacted the attempts data of {compacted} game(s) in '{GAME_RESULTS_JSON_PATH}'.")
@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+from types import SimpleNamespace
+from loguru import logger
+
+from modules.database import atomic_write_json
+
+
+class CassetteMiss(Exception):
+    """Raised when a replayed cassette has no recorded response left for a request."""
+
+
+class RecordedError(Exception):
+    """Raised on replay where the recorded call failed, with the original error message."""
+
+
+def fingerprint(request):
+    """
+    Returns what identifies an extraction request: the model, the token limit and hashes of the prompt
+    and of the image, so cassettes stay small and a changed prompt or crop can be detected.
+    """
+    content = request['messages'][0]['content']
+    image = next(part['source']['data'] for part in content if part['type'] == 'image')
+    prompt = next(part['text'] for part in content if part['type'] == 'text')
+    return {
+        'model': request.get('model'),
+        'max_tokens': request.get('max_tokens'),
+        'prompt_sha256': hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        'image_sha256': hashlib.sha256(image.encode("ascii")).hexdigest(),
+    }
+
+
+class Cassette:
+    """
+    The recorded API responses for one image, in call order, stored as a JSON file.
+
+    Each interaction holds the request's `fingerprint` and either the `response` (text, model, usage and
+    retries) or the `error` of the call.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.interactions = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.interactions = json.load(file)['interactions']
+        self.position = 0
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        atomic_write_json(self.path, {'interactions': self.interactions}, indent=4)
+
+
+class CassetteClient:
+    """
+    Stands in for the `anthropic.Anthropic` client of `parse_game_score`, recording or replaying its calls.
+
+    - "record": forwards every call to `client` and appends the response to the cassette (saved after each call).
+    - "replay": answers from the cassette without any network access; a request whose fingerprint differs
+      from the recorded one (e.g. after changing the prompt or the scoreboard crop) is answered anyway with
+      a warning, or raises `CassetteMiss` if `strict`.
+
+    **Example:**
+
+    ```python
+    client = CassetteClient(Cassette("cassettes/set_1/test_image_1.json"), mode="replay")
+    game_result_dictionary = parse_game_score("images/set_1/test_image_1.jpg", num_attempts=3, client=client)
+    ```
+    """
+
+    def __init__(self, cassette, mode="replay", client=None, strict=False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}', expected 'record' or 'replay'")
+        if mode == "record" and client is None:
+            raise ValueError("Recording needs the real API client")
+        self.cassette = cassette
+        self.mode = mode
+        self.client = client
+        self.strict = strict
+        self.messages = SimpleNamespace(with_raw_response=SimpleNamespace(create=self._create))
+
+    def _create(self, **request):
+        if self.mode == "record":
+            return self._record(request)
+        return self._replay(request)
+
+    def _record(self, request):
+        interaction = {'request': fingerprint(request)}
+        try:
+            response = self.client.messages.with_raw_response.create(**request)
+            message = response.parse()
+        except Exception as e:
+            interaction['error'] = str(e)
+            raise
+        else:
+            interaction['response'] = {
+                'text': message.content[0].text,
+                'model': message.model,
+                'usage': {'input_tokens': message.usage.input_tokens, 'output_tokens': message.usage.output_tokens},
+                'retries_taken': getattr(response, 'retries_taken', 0),
+            }
+            return response
+        finally:
+            self.cassette.interactions.append(interaction)
+            self.cassette.save()
+
+    def _replay(self, request):
+        if self.cassette.position >= len(self.cassette.interactions):
+            raise CassetteMiss(f"'{self.cassette.path}' has no recorded call {self.cassette.position + 1}")
+        interaction = self.cassette.interactions[self.cassette.position]
+        self.cassette.position += 1
+
+        if interaction['request'] != fingerprint(request):
+            message = f"Call {self.cassette.position} differs from the one recorded in '{self.cassette.path}'"
+            if self.strict:
+                raise CassetteMiss(message)
+            logger.warning(f"{message}, replaying the recorded response anyway.")
+
+        if 'error' in interaction:
+            raise RecordedError(interaction['error'])
+        recorded = interaction['response']
+        message = SimpleNamespace(content=[SimpleNamespace(text=recorded['text'])], model=recorded['model'],
+                                  usage=SimpleNamespace(**recorded['usage']))
+        return SimpleNamespace(parse=lambda: message, retries_taken=recorded.get('retries_taken', 0))
@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import random
+import tempfile
+from contextlib import contextmanager
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, DATABASE_FORMAT, LEADERBOARD_SNAPSHOT_PATH, DATABASE_LOCK_TIMEOUT_SECONDS, DATABASE_COMMIT_RETRIES, PAIR_STATS_FOLDER
+from modules.serialization import JsonSerializer, get_serializer, loads_auto
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# The umask can only be read by setting it, so it is read once, before any thread could create files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class DatabaseLockTimeout(Exception):
+    """Raised when a database lock could not be acquired within the configured timeout."""
+
+
+class VersionConflictError(Exception):
+    """Raised when a commit is based on a version of the database that is no longer current."""
+
+
+def _fsync_directory(directory):
+    """
+    Flushes a directory entry to disk so a completed rename survives a power loss.
+
+    Directories cannot be opened on Windows, where `os.replace` is already durable enough, so this is a no-op there.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _new_file_mode(path):
+    """
+    Returns the permissions for the new version of `path`: those of the file it replaces, or what
+    `open(path, "w")` would give a new file (0666 minus the umask). `mkstemp` creates files readable
+    by their owner only, which would lock out other readers such as a web server serving the report.
+    """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path, payload):
+    """
+    Writes `payload` to `path` without ever leaving a truncated file behind.
+
+    The payload is written to a temporary file in the same directory, flushed and fsynced, and then moved
+    over the destination with `os.replace`. Readers (and a crash at any point) either see the old file or
+    the new one, never a partial write. The new file keeps the permissions of the one it replaces.
+
+    **Parameters:**
+    - `path` (str): Destination file path.
+    - `payload` (bytes): The complete new file contents.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+            if hasattr(os, "fchmod"):  # Not on Windows, where files have no such permissions
+                os.fchmod(file.fileno(), _new_file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def atomic_write_json(path, data, indent=None):
+    """
+    Serializes `data` as JSON and writes it to `path` atomically (see `atomic_write_bytes`).
+    """
+    atomic_write_bytes(path, json.dumps(data, indent=indent).encode("utf-8"))
+
+
+class FileLock:
+    """
+    Advisory inter-process lock on `<path>.lock`, which also stores the database version counter.
+
+    Uses `fcntl.flock` on POSIX (shared locks for readers, exclusive locks for writers) and
+    `msvcrt.locking` on Windows (always exclusive). The lock is only honoured by code that goes
+    through this module, which is every reader and writer in this project.
+
+    **Example:**
+
+    ```python
+    with FileLock("players_data.json") as lock:
+        version = lock.read_version()
+        ...
+        lock.write_version(version + 1)
+    ```
+    """
+
+    def __init__(self, path, shared=False, timeout=DATABASE_LOCK_TIMEOUT_SECONDS):
+        self.lock_path = f"{path}.lock"
+        self.shared = shared and fcntl is not None
+        self.timeout = timeout
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        delay = 0.005
+        while True:
+            try:
+                self._try_lock()
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise DatabaseLockTimeout(f"Could not lock '{self.lock_path}' within {self.timeout} seconds")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _try_lock(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, (fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+
+    def read_version(self):
+        """Returns the version counter stored in the lock file (0 for a new database)."""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        raw = os.read(self._fd, 64).strip()
+        try:
+            return int(raw) if raw else 0
+        except ValueError:
+            logger.warning(f"Ignoring invalid version counter in '{self.lock_path}'")
+            return 0
+
+    def write_version(self, version):
+        """Stores a new version counter. Must only be called while holding an exclusive lock."""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, str(version).encode("ascii"))
+        os.fsync(self._fd)
+
+
+class Database:
+    """
+    Versioned access to a database file shared between processes.
+
+    Every successful commit increments a version counter. `commit` is a compare-and-swap: it only writes
+    if the file is still at the version the caller read, so concurrent writers (the ingest loop, name
+    management, parallel workers) can never silently overwrite each other. `update` wraps the usual
+    read-modify-commit cycle and retries it on conflicts.
+
+    Files are written with `serializer` (pretty-printed JSON by default) and read in whichever
+    supported format they are in, so switching DATABASE_FORMAT needs no migration step.
+
+    **Example:**
+
+    ```python
+    database = Database("players_data.json")
+
+    def add_alias(data):
+        data["Players"][0]["past names"].append("THEAK74")
+
+    database.update(add_alias)
+    ```
+    """
+
+    def __init__(self, path, default_factory=lambda: {"Players": []}, serializer=None,
+                 lock_timeout=DATABASE_LOCK_TIMEOUT_SECONDS, retries=DATABASE_COMMIT_RETRIES, on_commit=None):
+        self.path = path
+        self.default_factory = default_factory
+        self.serializer = serializer or JsonSerializer(indent=4)
+        self.on_commit = on_commit  # Called as on_commit(data, new_version) while the lock is still held
+        self.lock_timeout = lock_timeout
+        self.retries = retries
+
+    def lock(self, shared=False):
+        return FileLock(self.path, shared=shared, timeout=self.lock_timeout)
+
+    def read(self):
+        """
+        Reads the file under a shared lock.
+
+        **Returns:**
+        - A tuple `(data, version)`. If the file does not exist, `data` comes from `default_factory`.
+        """
+        with self.lock(shared=True) as lock:
+            return self._load(), lock.read_version()
+
+    def current_version(self):
+        """Returns the current version counter without loading the file (cheap enough to poll)."""
+        with self.lock(shared=True) as lock:
+            return lock.read_version()
+
+    def commit(self, data, expected_version):
+        """
+        Writes `data` if the file is still at `expected_version`.
+
+        **Returns:**
+        - The new version number.
+
+        **Raises:**
+        - `VersionConflictError` if another process committed in the meantime.
+        """
+        with self.lock() as lock:
+            return self._commit_locked(lock, data, expected_version)
+
+    def update(self, mutate):
+        """
+        Applies `mutate(data)` to the latest data and commits it, retrying on version conflicts.
+
+        `mutate` may be called more than once, so it must only change the data it is given.
+
+        **Returns:**
+        - A tuple `(data, result)` with the committed data and the return value of the last `mutate` call.
+        """
+        for attempt in range(self.retries + 1):
+            data, version = self.read()
+            result = mutate(data)
+            try:
+                self.commit(data, version)
+                return data, result
+            except VersionConflictError:
+                if attempt == self.retries:
+                    break
+                logger.warning(f"'{self.path}' was modified by another process, retrying ({attempt + 1}/{self.retries})")
+                time.sleep(random.uniform(0.01, 0.05) * (attempt + 1))
+        raise VersionConflictError(f"Could not commit to '{self.path}' after {self.retries + 1} attempts")
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Holds the exclusive lock for a change that can not be retried piecemeal, e.g. one that has to
+        update two database files together.
+
+        Yields a tuple `(data, commit)`; calling `commit(new_data)` writes while the lock is still held,
+        so nobody else can commit in between the read and the write.
+
+        **Example:**
+
+        ```python
+        with players_database().exclusive() as (players, commit_players), \\
+             game_results_database().exclusive() as (game_results, commit_game_results):
+            ...
+            commit_game_results(game_results)
+            commit_players(players)
+        ```
+        """
+        with self.lock() as lock:
+            version = lock.read_version()
+            yield self._load(), lambda data: self._commit_locked(lock, data, version)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return self.default_factory()
+        with open(self.path, "rb") as file:
+            return loads_auto(file.read())
+
+    def _commit_locked(self, lock, data, expected_version):
+        current_version = lock.read_version()
+        if current_version != expected_version:
+            raise VersionConflictError(
+                f"'{self.path}' is at version {current_version}, expected {expected_version}"
+            )
+        # Bump the version before replacing the data: a crash in between only causes a spurious conflict
+        new_version = current_version + 1
+        lock.write_version(new_version)
+        atomic_write_bytes(self.path, self.serializer.dumps(data))
+        if self.on_commit is not None:
+            self.on_commit(data, new_version)
+        return new_version
+
+
+def players_database(path=ELO_JSON_DATABASE_PATH, **kwargs):
+    """
+    Returns the `Database` for the Elo database file, written in the configured DATABASE_FORMAT.
+
+    Every commit also publishes the memory-mapped leaderboard snapshot (see `modules.leaderboard_snapshot`).
+    """
+    from modules.leaderboard_snapshot import publish_snapshot  # Imported here, it depends on this module
+
+    kwargs.setdefault("on_commit", lambda data, version: publish_snapshot(data, version, snapshot_path_for(path)))
+    return Database(path, serializer=get_serializer(DATABASE_FORMAT), **kwargs)
+
+
+def snapshot_path_for(path):
+    """Returns the leaderboard snapshot that goes with the Elo database at `path` (`<path>.leaderboard.bin`, unless it is the configured one)."""
+    if LEADERBOARD_SNAPSHOT_PATH and os.path.abspath(path) != os.path.abspath(ELO_JSON_DATABASE_PATH):
+        return f"{path}.leaderboard.bin"
+    return LEADERBOARD_SNAPSHOT_PATH
+
+
+def game_results_database(path=GAME_RESULTS_JSON_PATH, **kwargs):
+    """Returns the `Database` for the game results ledger (always pretty-printed JSON)."""
+    return Database(path, default_factory=list, serializer=JsonSerializer(indent=2), **kwargs)
+
+
+def pair_stats_folder_for(path):
+    """Returns the statistics folder that goes with the Elo database at `path` (`<path>.pair_stats`, unless it is the configured one)."""
+    if os.path.abspath(path) != os.path.abspath(ELO_JSON_DATABASE_PATH):
+        return f"{path}.pair_stats"
+    return PAIR_STATS_FOLDER
@@ -1,23 +1,24 @@
 import math 
 import base64
 import json
-import cv2
-import numpy as np
 import os
+import time
 
-from PIL import Image 
-from anthropic import Anthropic
 from io import BytesIO
 from collections import Counter
 from difflib import SequenceMatcher 
 from loguru import logger
 
+from configs.app_config import CROPPED_SCOREBOARDS_FOLDER
 from configs.llm_config import API_KEYS
 from modules.elo_calculation import calculatePoints
 from modules.utils import print_game_results
+from modules.name_index import resolve_name
+from modules.metrics import timed
+from modules.llm_usage import usage_record
 
 
-def order_data(data, eloDatabase):
+def order_data(data, eloDatabase, name_index=None):
     """
     Organizes player data from game results and Elo database.
 
@@ -29,6 +30,9 @@ def order_data(data, eloDatabase):
     **Parameters:**
     - `data` (dict): Game result data containing teams and players.
     - `eloDatabase` (dict): Database containing player Elo ratings, games played, and past names.
+    - `name_index` (NameIndex): Optional fuzzy index over all known names. Names without an exact match
+      are then auto-mapped to a close known name or queued for review (see `modules.name_index.resolve_name`)
+      instead of always becoming new players.
 
     **Returns:**
     - A dictionary with team names as keys. Each team contains:
@@ -74,15 +78,29 @@ def order_data(data, eloDatabase):
 
     playerDictionary = {}
 
+    # Exact matches first, so a misread name is never matched to a player who is in the game under their own name
+    exact_names = {player['name']: find_name(player['name'], eloDatabase)
+                   for team_info in data['teams'].values() for player in team_info['players']}
+    players_in_game = {name for name in exact_names.values() if name}
+
     for team_name, team_info in data['teams'].items():
         team_players = []
 
         for player in team_info['players']:
-            current_player_name = find_name(player['name'], eloDatabase)
+            current_player_name = exact_names[player['name']]
             if current_player_name:
                 player_name = current_player_name
             else:    
                 player_name = player['name']
+                if name_index is not None:
+                    # No exact match: look for a close match to a known name (e.g. an OCR misread)
+                    matched_name, _ = resolve_name(player_name, name_index, context={'team': team_name},
+                                                   exclude=players_in_game)
+                    if matched_name:
+                        player_name = matched_name
+                    else:
+                        name_index.add(player_name, player_name)  # Will be added as a new player
+                players_in_game.add(player_name)
 
 
             player_data = next((p for p in eloDatabase["Players"] if p["PlayerName"] == player_name), None)
@@ -440,7 +458,7 @@ def compute_consensus(parsed_data_list):
 
     return consensus_data
 
-def detect_scoreboard(image_path, save_cropped=True, cropped_folder="cropped_scoreboards"):
+def detect_scoreboard(image_path, save_cropped=True, cropped_folder=CROPPED_SCOREBOARDS_FOLDER):
     """
     Detects, crops, and upscales the scoreboard from a game screenshot.
 
@@ -455,6 +473,11 @@ def detect_scoreboard(image_path, save_cropped=True, cropped_folder="cropped_sco
     **Returns:**
     - A PIL Image object of the upscaled and sharpened scoreboard.
     """
+    # The image libraries are imported here, so tools that only rate, match or rename players start quickly
+    import cv2
+    import numpy as np
+    from PIL import Image
+
     # Read image using OpenCV
     img = cv2.imread(image_path)
     original_height, original_width = img.shape[:2]
@@ -513,41 +536,8 @@ def detect_scoreboard(image_path, save_cropped=True, cropped_folder="cropped_sco
     
     return pil_image
 
-def parse_game_score(image_path, num_attempts=1):
-    """
-    Parses a game score image using the Claude API and returns structured data.
-
-    This function reads an image of a game score sheet, crops the scoreboard area, and sends it to the Claude API for parsing.
-    It attempts to extract team names, player names, scores, and victory points.
-
-    **Parameters:**
-    - `image_path` (str): The file path to the game score image.
-    - `num_attempts` (int): Number of times to send the image to Claude for consensus.
-
-    **Returns:**
-    - A dictionary containing the consensus data extracted from the image, including team information and winner.
-
-    **How It Works:**
-    - Detects and crops the scoreboard from the image.
-    - Encodes the cropped image in base64 format.
-    - Sends the image and a prompt to the Claude API for parsing.
-    - Collects the parsed data from multiple attempts.
-    - Computes consensus data using `compute_consensus`.
-    - Includes all attempt data in the final consensus data for analysis.
-    """
-    # Detect and crop the scoreboard from the image
-    cropped_image = detect_scoreboard(image_path)
-    if cropped_image is None:
-        logger.error("Error: Unable to process image for scoreboard detection.")
-        return None
-
-    # Determine media type based on the image format (we'll use PNG for the cropped image)
-    media_type = "image/png"
-
-    client = Anthropic(api_key=API_KEYS['claude'])
-
-    # Prepare the prompt with role assignment and instructions
-    prompt = """
+# Prompt sent with every scoreboard image (with role assignment and instructions)
+EXTRACTION_PROMPT = """
     You are a data extraction assistant with perfect vision and excellent attention to detail.
     Your task is to parse the provided game score sheet image and extract the information into
     a structured JSON format. Please follow these instructions carefully:
@@ -623,9 +613,53 @@ def parse_game_score(image_path, num_attempts=1):
     - There must be exactly 2 teams in the output - no more, no less
     """
 
+
+def parse_game_score(image_path, num_attempts=1, client=None):
+    """
+    Parses a game score image using the Claude API and returns structured data.
+
+    This function reads an image of a game score sheet, crops the scoreboard area, and sends it to the Claude API for parsing.
+    It attempts to extract team names, player names, scores, and victory points.
+
+    **Parameters:**
+    - `image_path` (str): The file path to the game score image.
+    - `num_attempts` (int): Number of times to send the image to Claude for consensus.
+    - `client`: The API client to use instead of a new `Anthropic` client, e.g. a `CassetteClient` that
+      replays recorded responses (see modules/cassettes.py).
+
+    **Returns:**
+    - A dictionary containing the consensus data extracted from the image, including team information and winner.
+
+    **How It Works:**
+    - Detects and crops the scoreboard from the image.
+    - Encodes the cropped image in base64 format.
+    - Sends the image and a prompt to the Claude API for parsing.
+    - Collects the parsed data from multiple attempts.
+    - Computes consensus data using `compute_consensus`.
+    - Includes all attempt data in the final consensus data for analysis, and the token, byte and
+      latency accounting of every API call under `llm_usage`.
+    """
+    # Detect and crop the scoreboard from the image
+    with timed("detect_scoreboard"):
+        cropped_image = detect_scoreboard(image_path)
+    if cropped_image is None:
+        logger.error("Error: Unable to process image for scoreboard detection.")
+        return None
+
+    # Determine media type based on the image format (we'll use PNG for the cropped image)
+    media_type = "image/png"
+
+    if client is None:
+        from anthropic import Anthropic  # Slow to import, so only loaded when an image is actually parsed
+
+        client = Anthropic(api_key=API_KEYS['claude'])
+
     parsed_data_list = []
+    llm_usage = []  # One accounting record per API call (see modules/llm_usage.py)
 
     for attempt in range(num_attempts):
+        message, payload_bytes, retries = None, 0, 0
+        call_started = None
         try:
             logger.info(f"{'='*50}")
             logger.info(f"Attempt {attempt + 1}")
@@ -634,32 +668,39 @@ def parse_game_score(image_path, num_attempts=1):
             logger.info('Parsing game score from the cropped scoreboard image.')
 
             # Convert the cropped image to bytes and encode in base64
-            buffered = BytesIO()
-            cropped_image.save(buffered, format='PNG')
-            image_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-            # Send image and prompt to Claude
-            message = client.messages.create(
-                model="claude-3-5-sonnet-latest",
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": image_data
+            with timed("encode_image"):
+                buffered = BytesIO()
+                cropped_image.save(buffered, format='PNG')
+                image_data = base64.b64encode(buffered.getvalue()).decode("utf-8")
+            payload_bytes = len(image_data)
+
+            # Send image and prompt to Claude (through the raw response, which also tells how often the client retried)
+            call_started = time.perf_counter()
+            with timed("llm_request"):
+                response = client.messages.with_raw_response.create(
+                    model="claude-3-5-sonnet-latest",
+                    max_tokens=1024,
+                    messages=[{
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "image",
+                                "source": {
+                                    "type": "base64",
+                                    "media_type": media_type,
+                                    "data": image_data
+                                }
+                            },
+                            {
+                                "type": "text",
+                                "text": EXTRACTION_PROMPT
                             }
-                        },
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ]
-                }]
-            )
+                        ]
+                    }]
+                )
+                message = response.parse()
+            retries = getattr(response, 'retries_taken', 0)
+            llm_usage.append(usage_record(attempt + 1, payload_bytes, time.perf_counter() - call_started, message, retries))
 
             # Parse JSON response
             parsed_text = message.content[0].text.strip()
@@ -679,6 +720,9 @@ def parse_game_score(image_path, num_attempts=1):
         except Exception as e:
             error_message = str(e)
             logger.error(f"Error parsing game score on attempt {attempt+1}: {error_message}")
+            if message is None and call_started is not None:
+                # The call itself failed: record the attempt with its latency but no tokens
+                llm_usage.append(usage_record(attempt + 1, payload_bytes, time.perf_counter() - call_started, error=error_message))
             parsed_data_list.append({
                 'attempt': attempt + 1,
                 'parsed_data': None,
@@ -692,10 +736,12 @@ def parse_game_score(image_path, num_attempts=1):
 
     # Combine parsed data using consensus mechanism
     valid_parsed_data = [pd['parsed_data'] for pd in parsed_data_list if pd['parsed_data'] is not None]
-    consensus_data = compute_consensus(valid_parsed_data)
+    with timed("compute_consensus"):
+        consensus_data = compute_consensus(valid_parsed_data)
 
     # Include all attempt data in consensus_data for later analysis
     consensus_data['attempts_data'] = parsed_data_list
+    consensus_data['llm_usage'] = llm_usage
 
     return consensus_data
 
@@ -0,0 +1,227 @@
+import os
+import json
+import bisect
+import hashlib
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH
+from modules.database import FileLock, players_database, atomic_write_json
+
+# Secondary indexes over the game results ledger, so a query reads only the entries it returns.
+#
+# The index is kept next to the ledger (`game_results.json.index`). It holds the byte range of every
+# entry in the ledger file and posting lists of entry numbers per scanned player name, date, team name
+# (case-insensitive) and image file:
+#
+#     {"layout_version": 1, "stamp": [ledger version, file size, mtime], "size": 81234, "digest": "...",
+#      "entries": [[offset, length], ...],
+#      "players": {"Ann": [0, 4, ...]}, "dates": {"2024-05-01": [0, 1]}, "teams": {"wehrmacht": [0, 3]},
+#      "images": {"league_001.png": [0]}}
+#
+# The ledger is rewritten as a whole on every commit, but new games are appended to it: when the bytes
+# indexed so far (`size`, checked with `digest`) are unchanged, only the new entries are indexed.
+# Anything else, e.g. a game corrected by hand or released by a review, re-indexes the whole ledger.
+
+LAYOUT_VERSION = 1
+INDEX_SUFFIX = ".index"
+
+
+def project(entry, fields):
+    """
+    Returns only `fields` of a ledger entry, as `{field: value}`, or the whole entry if `fields` is None.
+    A field can be a dotted path into the entry, e.g. "consensus_data.winner" (None where it is missing).
+    """
+    if fields is None:
+        return entry
+    projected = {}
+    for field in fields:
+        value = entry
+        for key in field.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        projected[field] = value
+    return projected
+
+
+def _empty_index():
+    return {'layout_version': LAYOUT_VERSION, 'stamp': None, 'size': 0, 'digest': None,
+            'entries': [], 'players': {}, 'dates': {}, 'teams': {}, 'images': {}}
+
+
+def _post(postings, key, ordinal):
+    ordinals = postings.setdefault(key, [])
+    if not ordinals or ordinals[-1] != ordinal:  # A name can appear twice in one game
+        ordinals.append(ordinal)
+
+
+def _add_entry(index, entry, offset, length):
+    ordinal = len(index['entries'])
+    index['entries'].append([offset, length])
+    for team_name, team in (entry.get('consensus_data') or {}).get('teams', {}).items():
+        _post(index['teams'], team_name.casefold(), ordinal)
+        for player in team.get('players', []):
+            if player.get('name') is not None:
+                _post(index['players'], player['name'], ordinal)
+    if entry.get('date'):
+        _post(index['dates'], entry['date'], ordinal)
+    if entry.get('image_file'):
+        _post(index['images'], entry['image_file'], ordinal)
+
+
+def _index_entries(index, data, start):
+    """Indexes the entries of the JSON list in `data` (the ledger's bytes) from byte `start` on; returns how many."""
+    text = data[start:].decode("utf-8")
+    ascii_only = data.isascii()  # The ledger is written with non-ASCII characters escaped, so characters are bytes
+    decoder = json.JSONDecoder()
+    count, position, end = 0, 0, start
+    char_mark, byte_mark = 0, start  # A position in `text` and the byte offset in `data` it corresponds to
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        if position >= len(text) or text[position] == "]":
+            break
+        entry, next_position = decoder.raw_decode(text, position)
+        if ascii_only:
+            offset, length = start + position, next_position - position
+        else:
+            offset = byte_mark + len(text[char_mark:position].encode("utf-8"))
+            length = len(text[position:next_position].encode("utf-8"))
+            char_mark, byte_mark = next_position, offset + length
+        _add_entry(index, entry, offset, length)
+        end = offset + length
+        position = next_position
+        count += 1
+    index['size'] = max(index['size'], end)
+    return count
+
+
+class GameIndex:
+    """
+    Queries the game results ledger through secondary indexes on player, date, team (faction) and image file.
+
+    Queries return iterators that read and decode only the matching entries, one at a time, from the
+    ledger file, optionally keeping only some fields (see `project`), so a large result set is never
+    held in memory. The index is brought up to date with the ledger before every query.
+
+    **Example:**
+
+    ```python
+    games = GameIndex()
+    for game in games.query(player="Ann", date_from="2024-05-01", date_to="2024-05-31", fields=["date", "consensus_data.winner"]):
+        print(game)
+    print(sum(1 for _ in games.query(team="Wehrmacht")))
+    ```
+    """
+
+    def __init__(self, game_results_path=GAME_RESULTS_JSON_PATH, json_file_path=ELO_JSON_DATABASE_PATH):
+        self.game_results_path = game_results_path
+        self.json_file_path = json_file_path
+        self.index_path = f"{game_results_path}{INDEX_SUFFIX}"
+        self._index = None
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return _empty_index()
+        return index if index.get('layout_version') == LAYOUT_VERSION else _empty_index()
+
+    def _open(self):
+        """
+        Opens the ledger and brings the index up to date with that file.
+
+        **Returns:**
+        - A tuple `(file, indexed)`: the open ledger (None if there is none yet) and the number of entries
+          that had to be indexed.
+        """
+        with FileLock(self.game_results_path, shared=True) as lock:
+            version = lock.read_version()
+            try:
+                file = open(self.game_results_path, "rb")
+            except FileNotFoundError:
+                self._index = _empty_index()
+                return None, 0
+        # Commits replace the ledger file, so the open file stays the version the index describes
+        stat = os.fstat(file.fileno())
+        stamp = [version, stat.st_size, stat.st_mtime_ns]
+        index = self._index or self._load_index()
+        indexed = 0
+        if index['stamp'] != stamp:
+            data = file.read()
+            size = index['size']
+            if not (size and len(data) >= size and hashlib.sha1(data[:size]).hexdigest() == index['digest']):
+                index, size = _empty_index(), data.index(b"[") + 1
+            indexed = _index_entries(index, data, size)
+            index['digest'] = hashlib.sha1(data[:index['size']]).hexdigest()
+            index['stamp'] = stamp
+            atomic_write_json(self.index_path, index)
+            logger.debug(f"Indexed {indexed} game(s) of '{self.game_results_path}'.")
+        self._index = index
+        return file, indexed
+
+    def refresh(self):
+        """Brings the index up to date with the ledger; returns the number of entries that had to be indexed."""
+        file, indexed = self._open()
+        if file is not None:
+            file.close()
+        return indexed
+
+    def _player_names(self, name):
+        """Returns every scanned name in the ledger that belongs to the player `name` is a current or past name of."""
+        from modules.replay import build_name_resolver  # Imported here, only player queries need the Elo database
+
+        eloDatabase, _ = players_database(self.json_file_path).read()
+        resolve = build_name_resolver(eloDatabase)
+        current = resolve(name)
+        return [scanned for scanned in self._index['players'] if resolve(scanned) == current]
+
+    def query(self, player=None, team=None, date_from=None, date_to=None, image_file=None, fields=None):
+        """
+        Returns an iterator over the ledger entries matching every given filter, in ledger order.
+
+        **Parameters:**
+        - `player` (str): A current or past name; games under any of the player's names match.
+        - `team` (str): A team or faction name as read from the scoreboards, in any case.
+        - `date_from`, `date_to` (str): Inclusive range of dates (`YYYY-MM-DD`); either can be left open.
+        - `image_file` (str): The scoreboard image the game was read from (its path or file name).
+        - `fields` (list): Only return these fields of each entry (see `project`).
+
+        **Returns:**
+        - A generator of entries (or projections). It keeps the ledger file open until it is exhausted or closed.
+        """
+        file, _ = self._open()
+        if file is None:
+            return (entry for entry in ())
+        index = self._index
+        candidates = None
+
+        def narrow(ordinals):
+            nonlocal candidates
+            candidates = set(ordinals) if candidates is None else candidates & set(ordinals)
+
+        if player is not None:
+            narrow(ordinal for name in self._player_names(player) for ordinal in index['players'][name])
+        if team is not None:
+            narrow(index['teams'].get(team.casefold(), []))
+        if date_from is not None or date_to is not None:
+            dates = sorted(index['dates'])
+            first = bisect.bisect_left(dates, date_from) if date_from is not None else 0
+            last = bisect.bisect_right(dates, date_to) if date_to is not None else len(dates)
+            narrow(ordinal for date in dates[first:last] for ordinal in index['dates'][date])
+        if image_file is not None:
+            narrow(index['images'].get(os.path.basename(image_file), []))
+
+        ordinals = range(len(index['entries'])) if candidates is None else sorted(candidates)
+        return self._stream(file, [index['entries'][ordinal] for ordinal in ordinals], fields)
+
+    @staticmethod
+    def _stream(file, ranges, fields):
+        with file:
+            for offset, length in ranges:
+                file.seek(offset)
+                yield project(json.loads(file.read(length)), fields)
+
+
+def query_games(game_results_path=GAME_RESULTS_JSON_PATH, json_file_path=ELO_JSON_DATABASE_PATH, **filters):
+    """Shortcut for `GameIndex(game_results_path, json_file_path).query(**filters)`."""
+    return GameIndex(game_results_path, json_file_path).query(**filters)
@@ -0,0 +1,95 @@
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH
+from modules.database import players_database, game_results_database
+from modules.attempt_deltas import replace_consensus, read_side_file
+from modules.elo_calculation import calculatePoints
+from modules.extract_data import order_data
+from modules.pair_stats import update_pair_stats
+from modules.replay import is_rated_game
+from modules.save_data import _apply_player_updates
+
+# Games recorded by a headless ingest with the "hold" policy (see `process_images` in robz_elo_system.py)
+# are in the ledger with the status "held" and do not count until someone reviews them.
+
+
+def held_games(game_results_path=GAME_RESULTS_JSON_PATH):
+    """Returns the ledger entries that are waiting for review, oldest first."""
+    game_results, _ = game_results_database(game_results_path).read()
+    return [entry for entry in game_results if entry.get('status') == 'held']
+
+
+def release_held_games(reviewed_entries, json_file_path=ELO_JSON_DATABASE_PATH, game_results_path=GAME_RESULTS_JSON_PATH):
+    """
+    Applies the review of held games: rates the ones marked "committed" and keeps the ones marked
+    "rejected" in the ledger without rating them.
+
+    A committed game is moved to the end of the ledger, because it is rated against the current ratings:
+    replaying the ledger (see `modules.replay`) then gives the same result. Both files are updated under
+    their exclusive locks, so the review itself (which waits for the user) happens before calling this.
+
+    **Parameters:**
+    - `reviewed_entries` (list): Held entries returned by `held_games`, possibly corrected, with their
+      `status` set to "committed" or "rejected". Entries still marked "held" are left as they are. The
+      attempts of a corrected entry are re-encoded against its corrected consensus (see
+      `modules.attempt_deltas.replace_consensus`).
+
+    **Returns:**
+    - A dictionary with the number of `committed`, `rejected` and still `held` games.
+
+    **Example:**
+
+    ```python
+    reviewed = []
+    for entry in held_games():
+        entry['status'] = 'committed' if entry['image_file'].startswith('league_') else 'rejected'
+        reviewed.append(entry)
+    release_held_games(reviewed)
+    ```
+    """
+    # Game ids are timestamps in milliseconds, so a fast headless ingest can give two games the same one
+    reviewed = {_entry_key(entry): entry for entry in reviewed_entries if entry.get('status') in ('committed', 'rejected')}
+    counts = {'committed': 0, 'rejected': 0, 'held': 0}
+
+    with players_database(json_file_path).exclusive() as (eloDatabase, commit_players), \
+         game_results_database(game_results_path).exclusive() as (game_results, commit_game_results):
+        kept, committed, rated = [], [], []
+        side_file_records = None
+        for entry in game_results:
+            review = reviewed.get(_entry_key(entry)) if entry.get('status') == 'held' else None
+            if review is not None and review['consensus_data'] != entry['consensus_data']:
+                # The attempts are diffs against the consensus as it was read, not as it was corrected
+                if side_file_records is None and 'attempts_file' in entry:
+                    side_file_records = read_side_file()
+                review = replace_consensus(dict(review, consensus_data=entry['consensus_data']), review['consensus_data'], side_file_records)
+            if review is None:
+                if entry.get('status') == 'held':
+                    counts['held'] += 1
+                kept.append(entry)
+            elif review['status'] == 'committed' and not is_rated_game(review):
+                logger.warning(f"Game '{review['game_id']}' can not be rated (it needs two teams with victory points), keeping it held.")
+                counts['held'] += 1
+                kept.append(dict(review, status='held'))
+            elif review['status'] == 'committed':
+                committed.append(review)
+            else:
+                counts['rejected'] += 1
+                kept.append(review)
+
+        for entry in committed:
+            playerDictionary = order_data(entry['consensus_data'], eloDatabase)
+            rated.append(calculatePoints(playerDictionary))
+            _apply_player_updates(rated[-1], eloDatabase)
+            counts['committed'] += 1
+
+        # The ledger first: if the players commit fails, `python robz_elo_system.py replay` repairs the ratings
+        commit_game_results(kept + committed)
+        commit_players(eloDatabase)
+        update_pair_stats(json_file_path, rated)
+
+    logger.info(f"Reviewed held games: {counts['committed']} committed, {counts['rejected']} rejected, {counts['held']} still held.")
+    return counts
+
+
+def _entry_key(entry):
+    return entry.get('game_id'), entry.get('image_file')
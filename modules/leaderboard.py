@@ -0,0 +1,229 @@
+import bisect
+from loguru import logger
+
+BUCKET_SIZE = 256  # Players per bucket after a split: inserting into a bucket moves at most twice as many pointers
+
+
+class Leaderboard:
+    """
+    The players ordered by rating, kept in order as games are rated instead of being sorted on demand.
+
+    Players are ordered like `rank_players` (highest rating first, ties by name). The keys are held in a
+    list of sorted buckets of `bucket_size` to `2 * bucket_size` keys, with the last key of each bucket
+    for bisecting to the right one and a Fenwick tree over the bucket lengths for positions. A rating
+    change is a removal and an insertion, and a rank, a lookup by rank or a percentile takes O(log n);
+    the buckets are only re-indexed when one is split or emptied.
+
+    Between `start_run` and `rank_changes` the leaderboard remembers the order at the start of the run
+    (copied on the first change, never sorted), so the rank each player gained or lost is a pair of
+    lookups.
+
+    **Example:**
+
+    ```python
+    leaderboard = Leaderboard.from_database(eloDatabase)
+    leaderboard.update("Ann", 1312)
+    print(leaderboard.rank("Ann"), leaderboard.top(10), leaderboard.percentile("Ann"))
+    print(leaderboard.rank_changes())
+    ```
+    """
+
+    def __init__(self, ratings=None, bucket_size=BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self._ratings = dict(ratings or {})
+        keys = sorted((-rating, name) for name, rating in self._ratings.items())
+        self._buckets = [keys[i:i + bucket_size] for i in range(0, len(keys), bucket_size)]
+        self._reindex()
+        self.start_run()
+
+    @classmethod
+    def from_database(cls, eloDatabase, **kwargs):
+        """Builds the leaderboard of every player in `eloDatabase` (new players start at 1200, as in order_data)."""
+        return cls({player['PlayerName']: player.get('Starting Elo', 1200) for player in eloDatabase.get('Players', [])}, **kwargs)
+
+    def __len__(self):
+        return len(self._ratings)
+
+    def __contains__(self, name):
+        return name in self._ratings
+
+    def _reindex(self):
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        # Fenwick tree (1-based) of the bucket lengths, built in linear time
+        self._tree = [0] + [len(bucket) for bucket in self._buckets]
+        for index in range(1, len(self._tree)):
+            parent = index + (index & -index)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[index]
+
+    def _grow(self, bucket_index, delta):
+        index = bucket_index + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _position(self, key):
+        """Returns the 0-based position of `key`, which must be on the leaderboard."""
+        bucket_index = bisect.bisect_left(self._maxes, key)
+        position, index = 0, bucket_index
+        while index > 0:
+            position += self._tree[index]
+            index -= index & -index
+        return position + bisect.bisect_left(self._buckets[bucket_index], key)
+
+    def _key_at(self, position):
+        """Returns the key at a 0-based position, descending the Fenwick tree to its bucket."""
+        bucket_index, remaining = 0, position
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            next_index = bucket_index + step
+            if next_index < len(self._tree) and self._tree[next_index] <= remaining:
+                bucket_index = next_index
+                remaining -= self._tree[next_index]
+            step >>= 1
+        return self._buckets[bucket_index][remaining]
+
+    def _insert(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._reindex()
+            return
+        bucket_index = min(bisect.bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[bucket_index]
+        bisect.insort(bucket, key)
+        self._maxes[bucket_index] = bucket[-1]
+        if len(bucket) > 2 * self.bucket_size:
+            self._buckets[bucket_index:bucket_index + 1] = [bucket[:self.bucket_size], bucket[self.bucket_size:]]
+            self._reindex()
+        else:
+            self._grow(bucket_index, 1)
+
+    def _remove(self, key):
+        bucket_index = bisect.bisect_left(self._maxes, key)
+        bucket = self._buckets[bucket_index]
+        del bucket[bisect.bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[bucket_index] = bucket[-1]
+            self._grow(bucket_index, -1)
+        else:
+            del self._buckets[bucket_index]
+            self._reindex()
+
+    def _before_change(self, name):
+        if self._baseline is None:
+            self._baseline = self.copy()
+        self._changed.add(name)
+
+    def update(self, name, rating):
+        """Sets the rating of `name`, adding the player if needed."""
+        current = self._ratings.get(name)
+        if current == rating and name in self._ratings:
+            return
+        self._before_change(name)
+        if name in self._ratings:
+            self._remove((-current, name))
+        self._insert((-rating, name))
+        self._ratings[name] = rating
+
+    def update_from_game(self, updatedDictionary):
+        """
+        Applies the rating changes of a game rated by `calculatePoints` (see `prepareData`).
+
+        Like `_apply_player_updates`, each player's change is added to their current rating and a new
+        player starts at their new rating. The names are the current names `order_data` resolved, so
+        nothing has to be looked up in the database.
+        """
+        for team in updatedDictionary.values():
+            for player in team['players']:
+                name, elo_change = player[0], player[6] - player[1]
+                self.update(name, self._ratings.get(name, player[1]) + elo_change)
+
+    def remove(self, name):
+        if name in self._ratings:
+            self._before_change(name)
+            self._remove((-self._ratings.pop(name), name))
+
+    def rating(self, name):
+        return self._ratings.get(name)
+
+    def rank(self, name):
+        """Returns the 1-based rank of `name`, or None if the player is not on the leaderboard."""
+        if name not in self._ratings:
+            return None
+        return self._position((-self._ratings[name], name)) + 1
+
+    def at_rank(self, rank):
+        """Returns `(name, rating)` of the player at a 1-based `rank`."""
+        if not 1 <= rank <= len(self):
+            raise IndexError(f"Rank {rank} is not between 1 and {len(self)}")
+        negated_rating, name = self._key_at(rank - 1)
+        return name, -negated_rating
+
+    def top(self, count=None):
+        """Returns `(name, rating)` of the `count` highest rated players (all players if `count` is None), highest first."""
+        players = []
+        for bucket in self._buckets:
+            for negated_rating, name in bucket:
+                if count is not None and len(players) >= count:
+                    return players
+                players.append((name, -negated_rating))
+        return players
+
+    def percentile(self, name):
+        """Returns the percentage of the other players that `name` is ranked above (100 for the leader), or None."""
+        rank = self.rank(name)
+        if rank is None:
+            return None
+        return 100.0 * (len(self) - rank) / (len(self) - 1) if len(self) > 1 else 100.0
+
+    def at_percentile(self, percent):
+        """Returns `(name, rating)` of the player ranked above `percent` % of the others (e.g. 90 for the top 10%)."""
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile {percent} is not between 0 and 100")
+        return self.at_rank(len(self) - round(percent / 100 * (len(self) - 1)))
+
+    def copy(self):
+        """Returns an independent copy, without sorting anything."""
+        other = Leaderboard.__new__(Leaderboard)
+        other.bucket_size = self.bucket_size
+        other._ratings = dict(self._ratings)
+        other._buckets = [list(bucket) for bucket in self._buckets]
+        other._maxes = list(self._maxes)
+        other._tree = list(self._tree)
+        other.start_run()
+        return other
+
+    def start_run(self):
+        """Makes `rank_changes` compare with the leaderboard as it is now."""
+        self._baseline = None  # Copied on the first change of the run
+        self._changed = set()
+
+    def rank_changes(self, names=None):
+        """
+        Returns how the ranks of the players rated since `start_run` (or of `names`) moved, best ranked first.
+
+        **Returns:**
+        - A list of `{'PlayerName', 'Starting Elo', 'rank_before', 'rank_after', 'change'}` dictionaries, where
+          `change` is the number of places gained (negative if lost) and `rank_before` is None for a new player.
+        """
+        before = self._baseline or self
+        changes = []
+        for name in (self._changed if names is None else names):
+            if name not in self._ratings:
+                continue
+            rank_before, rank_after = before.rank(name), self.rank(name)
+            changes.append({'PlayerName': name, 'Starting Elo': self._ratings[name], 'rank_before': rank_before,
+                            'rank_after': rank_after, 'change': rank_before - rank_after if rank_before is not None else None})
+        changes.sort(key=lambda change: change['rank_after'])
+        return changes
+
+
+def log_rank_changes(changes):
+    """Logs rank changes (as returned by `Leaderboard.rank_changes`) as a table."""
+    logger.info(f"{'Rank':>4} {'Player Name':<20} {'Elo Rating':>10} {'Before':>7} {'Change':>7}")
+    for change in changes:
+        if change['rank_before'] is None:
+            before, moved = "new", ""
+        else:
+            before, moved = change['rank_before'], f"{change['change']:+d}" if change['change'] else "="
+        logger.info(f"{change['rank_after']:>4} {change['PlayerName']:<20} {change['Starting Elo']:>10} {before:>7} {moved:>7}")
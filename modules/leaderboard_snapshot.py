@@ -0,0 +1,230 @@
+import os
+import sys
+import mmap
+import struct
+from loguru import logger
+
+from configs.app_config import LEADERBOARD_SNAPSHOT_PATH
+from modules.database import atomic_write_bytes, FileLock, snapshot_path_for
+
+# Run from root directory with: python -m modules.leaderboard_snapshot [number of players]
+
+# Binary layout (little-endian):
+#   header    : magic "RZLB", layout version (u16), reserved (u16), player count (u32),
+#               database version (u64), name index offset (u64), names offset (u64)
+#   records   : one 32-byte record per player, sorted by rating (highest first), so a record's
+#               position is the player's rank: rating (f64), games played (u32), games won (u32),
+#               games lost (u32), name length (u32), name offset (u64)
+#   name index: one u32 record number per player, sorted by player name, for binary search
+#   names     : UTF-8 encoded player names
+
+MAGIC = b"RZLB"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHIQQQ")
+RECORD = struct.Struct("<dIIIIQ")
+INDEX_ENTRY = struct.Struct("<I")
+
+
+def rank_players(eloDatabase):
+    """
+    Returns every player of `eloDatabase` as a leaderboard entry (the fields `LeaderboardSnapshot.player`
+    returns), highest rated first, in the same order as the snapshot.
+    """
+    players = sorted(eloDatabase.get("Players", []), key=lambda p: (-p.get('Starting Elo', 1200), p['PlayerName']))
+    return [{
+        'PlayerName': player['PlayerName'],
+        'Starting Elo': player.get('Starting Elo', 1200),
+        'games played': player.get('games played', 0),
+        'Games Won': player.get('Games Won', 0),
+        'Games Lost': player.get('Games Lost', 0),
+        'Rank': rank
+    } for rank, player in enumerate(players, start=1)]
+
+
+def log_leaderboard(players):
+    """Logs leaderboard entries (as returned by `rank_players` or `LeaderboardSnapshot.top`) as a table."""
+    logger.info(f"{'Rank':>4} {'Player Name':<20} {'Elo Rating':>10} {'Games':>6} {'W':>5} {'L':>5}")
+    for player in players:
+        logger.info(f"{player['Rank']:>4} {player['PlayerName']:<20} {player['Starting Elo']:>10} "
+                    f"{player['games played']:>6} {player['Games Won']:>5} {player['Games Lost']:>5}")
+
+
+def build_snapshot(eloDatabase, database_version=0):
+    """
+    Encodes the current ratings of every player in `eloDatabase` into the binary snapshot layout.
+
+    **Returns:**
+    - The snapshot as bytes.
+    """
+    players = sorted(eloDatabase.get("Players", []), key=lambda p: (-p.get('Starting Elo', 1200), p['PlayerName']))
+    count = len(players)
+    encoded_names = [p['PlayerName'].encode("utf-8") for p in players]
+
+    index_offset = HEADER.size + count * RECORD.size
+    names_offset = index_offset + count * INDEX_ENTRY.size
+
+    records = bytearray()
+    name_position = 0
+    for player, encoded_name in zip(players, encoded_names):
+        records += RECORD.pack(
+            float(player.get('Starting Elo', 1200)),
+            player.get('games played', 0),
+            player.get('Games Won', 0),
+            player.get('Games Lost', 0),
+            len(encoded_name),
+            name_position
+        )
+        name_position += len(encoded_name)
+
+    name_order = sorted(range(count), key=lambda i: encoded_names[i])
+    index = b"".join(INDEX_ENTRY.pack(i) for i in name_order)
+
+    header = HEADER.pack(MAGIC, LAYOUT_VERSION, 0, count, database_version, index_offset, names_offset)
+    return header + bytes(records) + index + b"".join(encoded_names)
+
+
+def publish_snapshot(eloDatabase, database_version=0, path=LEADERBOARD_SNAPSHOT_PATH):
+    """
+    Writes a new leaderboard snapshot and atomically swaps it in place of the previous one.
+
+    Readers that already mapped the old snapshot keep reading it undisturbed. Failures are logged
+    and never propagate, so publishing can not break a database commit.
+    """
+    if not path:
+        return False
+    try:
+        atomic_write_bytes(path, build_snapshot(eloDatabase, database_version))
+        return True
+    except Exception as e:
+        # On Windows the old snapshot can not be replaced while a reader has it mapped; the next commit retries
+        logger.warning(f"Could not publish leaderboard snapshot '{path}': {e}")
+        return False
+
+
+class LeaderboardSnapshot:
+    """
+    Read-only, memory-mapped view of a leaderboard snapshot.
+
+    Opening a snapshot only maps the file, so startup cost does not depend on the number of players
+    or the length of their Elo histories. Lookups by rank are O(1) and lookups by name are a binary
+    search over the name index.
+
+    **Example:**
+
+    ```python
+    with LeaderboardSnapshot.open() as leaderboard:
+        for rank, player in enumerate(leaderboard.top(10), start=1):
+            print(rank, player['PlayerName'], player['Starting Elo'])
+        print(leaderboard.lookup('Taters'))
+    ```
+    """
+
+    def __init__(self, path=LEADERBOARD_SNAPSHOT_PATH):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, layout_version, _, self._count, self.database_version, self._index_offset, self._names_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or layout_version != LAYOUT_VERSION:
+            self._map.close()
+            raise ValueError(f"'{path}' is not a leaderboard snapshot (layout version {LAYOUT_VERSION})")
+
+    @classmethod
+    def open(cls, path=LEADERBOARD_SNAPSHOT_PATH):
+        return cls(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._map.close()
+
+    def player(self, rank_index):
+        """Returns the player at a 0-based rank as a dictionary using the database field names."""
+        rating, games, won, lost, name_length, name_position = RECORD.unpack_from(self._map, HEADER.size + rank_index * RECORD.size)
+        start = self._names_offset + name_position
+        return {
+            'PlayerName': self._map[start:start + name_length].decode("utf-8"),
+            'Starting Elo': int(rating) if rating.is_integer() else rating,
+            'games played': games,
+            'Games Won': won,
+            'Games Lost': lost,
+            'Rank': rank_index + 1
+        }
+
+    def top(self, n=None):
+        """Returns the `n` highest rated players (all players if `n` is None)."""
+        return [self.player(i) for i in range(min(self._count, self._count if n is None else n))]
+
+    def __iter__(self):
+        return (self.player(i) for i in range(self._count))
+
+    def lookup(self, name):
+        """Returns the player called `name` (including their `Rank`), or None."""
+        target = name.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            rank_index = INDEX_ENTRY.unpack_from(self._map, self._index_offset + middle * INDEX_ENTRY.size)[0]
+            candidate = self._name_bytes(rank_index)
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                return self.player(rank_index)
+        return None
+
+    def ratings(self):
+        """Returns a dictionary mapping every player name to their rating."""
+        return {player['PlayerName']: player['Starting Elo'] for player in self}
+
+    def _name_bytes(self, rank_index):
+        name_length, name_position = RECORD.unpack_from(self._map, HEADER.size + rank_index * RECORD.size)[4:]
+        start = self._names_offset + name_position
+        return self._map[start:start + name_length]
+
+
+def open_current_snapshot(database_path, path=None):
+    """
+    Opens the snapshot if it exists and matches the current version of the database at `database_path`.
+    `path` defaults to that database's own snapshot (see `modules.database.snapshot_path_for`).
+
+    **Returns:**
+    - A `LeaderboardSnapshot`, or None if there is no up-to-date snapshot (callers then read the database).
+    """
+    if path is None:
+        path = snapshot_path_for(database_path)
+    if not path or not os.path.exists(path) or not os.path.exists(database_path):
+        return None
+    try:
+        snapshot = LeaderboardSnapshot(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Ignoring unreadable leaderboard snapshot '{path}': {e}")
+        return None
+    with FileLock(database_path, shared=True) as lock:
+        current_version = lock.read_version()
+    if snapshot.database_version != current_version:
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    try:
+        leaderboard = LeaderboardSnapshot.open()
+    except FileNotFoundError:
+        logger.error(f"Leaderboard snapshot '{LEADERBOARD_SNAPSHOT_PATH}' not found. It is written on every database commit.")
+        sys.exit(1)
+    with leaderboard:
+        log_leaderboard(leaderboard.top(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import io
+import math
+import os
+import time
+from statistics import median
+from loguru import logger
+
+from configs.app_config import (LLM_INPUT_COST_PER_MILLION_TOKENS, LLM_OUTPUT_COST_PER_MILLION_TOKENS,
+                                LLM_ESTIMATED_OUTPUT_TOKENS, LLM_ESTIMATED_SECONDS_PER_CALL)
+
+# Images are downscaled by the API until they fit both limits, then cost about one token per 750 pixels
+# (see https://docs.anthropic.com/en/docs/build-with-claude/vision#evaluate-image-size)
+IMAGE_MAX_EDGE = 1568
+IMAGE_MAX_PIXELS = 1_150_000
+IMAGE_PIXELS_PER_TOKEN = 750
+CHARACTERS_PER_TOKEN = 4  # Rough average for English text, used to estimate the prompt
+
+
+def call_cost(input_tokens, output_tokens):
+    """Returns the price in USD of a call, from LLM_*_COST_PER_MILLION_TOKENS in app_config.py."""
+    return (input_tokens * LLM_INPUT_COST_PER_MILLION_TOKENS + output_tokens * LLM_OUTPUT_COST_PER_MILLION_TOKENS) / 1_000_000
+
+
+def usage_record(attempt, payload_bytes, latency_seconds, message=None, retries=0, error=None):
+    """
+    Builds the accounting record of one `messages.create` call from its response (None if it failed).
+
+    **Returns:**
+    - A dictionary with the `attempt` number, `model`, `input_tokens`, `output_tokens`, `payload_bytes`
+      (the base64 image sent), `latency_seconds`, `retries` (taken by the API client), `cost` and `error`.
+    """
+    usage = getattr(message, 'usage', None)
+    input_tokens = getattr(usage, 'input_tokens', 0) or 0
+    output_tokens = getattr(usage, 'output_tokens', 0) or 0
+    return {
+        'attempt': attempt,
+        'model': getattr(message, 'model', None),
+        'input_tokens': input_tokens,
+        'output_tokens': output_tokens,
+        'payload_bytes': payload_bytes,
+        'latency_seconds': round(latency_seconds, 3),
+        'retries': retries,
+        'cost': round(call_cost(input_tokens, output_tokens), 6),
+        'error': error,
+    }
+
+
+def summarize(records):
+    """
+    Adds up usage records (see `usage_record`).
+
+    **Returns:**
+    - A dictionary with the number of `calls` and `failed_calls`, and the totals of `input_tokens`,
+      `output_tokens`, `payload_bytes`, `latency_seconds`, `retries` and `cost`.
+    """
+    records = list(records)
+    return {
+        'calls': len(records),
+        'failed_calls': sum(1 for record in records if record.get('error')),
+        'input_tokens': sum(record.get('input_tokens', 0) for record in records),
+        'output_tokens': sum(record.get('output_tokens', 0) for record in records),
+        'payload_bytes': sum(record.get('payload_bytes', 0) for record in records),
+        'latency_seconds': round(sum(record.get('latency_seconds', 0) for record in records), 3),
+        'retries': sum(record.get('retries', 0) for record in records),
+        'cost': round(sum(record.get('cost', 0) for record in records), 6),
+    }
+
+
+def usage_by_day(game_results):
+    """Returns `{date: summary}` (see `summarize`) of the calls recorded in the ledger entries, oldest day first."""
+    days = {}
+    for entry in game_results:
+        if entry.get('llm_usage'):
+            days.setdefault(entry.get('date'), []).extend(entry['llm_usage'])
+    return {day: summarize(records) for day, records in sorted(days.items(), key=lambda item: item[0] or "")}
+
+
+def log_usage(summary, title="LLM USAGE"):
+    logger.info(f"=== {title} ===")
+    logger.info(f"Calls: {summary['calls']} ({summary['failed_calls']} failed, {summary['retries']} retries)")
+    logger.info(f"Tokens: {summary['input_tokens']} in / {summary['output_tokens']} out")
+    logger.info(f"Payload: {summary['payload_bytes'] / 1_000_000:.2f} MB, latency {summary['latency_seconds']:.1f} s")
+    logger.info(f"Cost: ${summary['cost']:.4f}")
+
+
+def estimate_image_tokens(width, height):
+    """Returns the approximate number of input tokens of an image of `width` x `height` pixels."""
+    scale = min(1.0, IMAGE_MAX_EDGE / max(width, height), math.sqrt(IMAGE_MAX_PIXELS / (width * height)))
+    return math.ceil((width * scale) * (height * scale) / IMAGE_PIXELS_PER_TOKEN)
+
+
+def estimate_run(image_files, image_folder_path, num_attempts, game_results=()):
+    """
+    Projects the tokens, cost and time of processing `image_files` without calling the API (dry run).
+
+    Each image goes through the same scoreboard detection and PNG encoding as `parse_game_score`, so
+    the image tokens and payload bytes are what would be sent. Output tokens and call latency are the
+    medians of the calls recorded in `game_results`, or LLM_ESTIMATED_* from app_config.py without history.
+
+    **Returns:**
+    - A dictionary with one estimate per image under `images` and the totals under `total`.
+    """
+    from modules.extract_data import detect_scoreboard, EXTRACTION_PROMPT
+
+    history = [record for entry in game_results for record in entry.get('llm_usage', []) if not record.get('error')]
+    output_tokens = median(record['output_tokens'] for record in history) if history else LLM_ESTIMATED_OUTPUT_TOKENS
+    call_seconds = median(record['latency_seconds'] for record in history) if history else LLM_ESTIMATED_SECONDS_PER_CALL
+    prompt_tokens = math.ceil(len(EXTRACTION_PROMPT) / CHARACTERS_PER_TOKEN)
+
+    images = []
+    for image_file in image_files:
+        start = time.perf_counter()
+        try:
+            cropped_image = detect_scoreboard(os.path.join(image_folder_path, image_file), save_cropped=False)
+        except Exception as e:
+            logger.error(f"Unable to read '{image_file}': {e}")
+            continue
+        buffered = io.BytesIO()
+        cropped_image.save(buffered, format='PNG')
+        input_tokens = estimate_image_tokens(*cropped_image.size) + prompt_tokens
+        images.append({
+            'image_file': image_file,
+            'input_tokens': input_tokens * num_attempts,
+            'output_tokens': round(output_tokens * num_attempts),
+            'payload_bytes': 4 * math.ceil(len(buffered.getvalue()) / 3) * num_attempts,
+            'seconds': round(time.perf_counter() - start + call_seconds * num_attempts, 3),
+            'cost': round(call_cost(input_tokens, output_tokens) * num_attempts, 6),
+        })
+
+    total = {key: sum(image[key] for image in images) for key in ('input_tokens', 'output_tokens', 'payload_bytes')}
+    total['seconds'] = round(sum(image['seconds'] for image in images), 3)
+    total['cost'] = round(sum(image['cost'] for image in images), 6)
+    total.update(images=len(images), calls=len(images) * num_attempts, history_calls=len(history))
+    return {'images': images, 'total': total}
@@ -0,0 +1,254 @@
+import math
+import time
+import random
+from loguru import logger
+
+from configs.app_config import MATCHMAKING_OBJECTIVE, MULTI_LOBBY_TIME_BUDGET_SECONDS, MULTI_LOBBY_ACROSS_WEIGHT
+from modules.team_balancer import balance_teams, _describe_split
+
+
+def partition_lobbies(ratings, team_size, num_lobbies=None, together=(), apart=(),
+                      time_budget=MULTI_LOBBY_TIME_BUDGET_SECONDS, across_weight=MULTI_LOBBY_ACROSS_WEIGHT,
+                      objective=MATCHMAKING_OBJECTIVE, seed=0):
+    """
+    Partitions a pool of players into several simultaneous matches of `team_size` versus `team_size`.
+
+    The search assigns every player to a slot (a team in a lobby, or the bench when the pool does not
+    divide evenly) and minimizes, over all lobbies, the rating difference between the two teams plus
+    `across_weight` times how far the lobby's total is from the average lobby total. Constraint
+    violations are penalized far above any rating difference. It is a simulated annealing over
+    player swaps: the cost change of a swap is computed in O(1) from the slot totals, so a budget of
+    a second explores a few hundred thousand partitions. The best partition found within
+    `time_budget` seconds is returned. Finally, each lobby without a constraint between its players
+    is re-split exactly with `balance_teams` (using `objective`).
+
+    **Parameters:**
+    - `ratings` (list of numbers): The rating of each player.
+    - `team_size` (int): Players per team.
+    - `num_lobbies` (int): Number of matches (default: as many as the pool fills).
+    - `together` (list of player index groups): Players in a group must be on the same team.
+    - `apart` (list of player index pairs): The two players must not be on the same team.
+
+    **Returns:**
+    - A dictionary with the `lobbies` (each the same dictionary as `balance_teams` returns, with
+      indexes into `ratings`), the `bench` (players left out), the number of constraint `violations`
+      (0 unless the constraints can not all be met) and the search `cost` and `iterations`.
+
+    **Example:**
+
+    ```python
+    result = partition_lobbies(ratings, team_size=4, together=[(0, 7)], apart=[(1, 2)])
+    for lobby in result['lobbies']:
+        print(lobby['team_a'], lobby['team_b'], lobby['difference'])
+    ```
+    """
+    n = len(ratings)
+    lobby_players = 2 * team_size
+    if num_lobbies is None:
+        num_lobbies = n // lobby_players
+    if team_size < 1 or num_lobbies < 1 or num_lobbies * lobby_players > n:
+        raise ValueError(f"Can not fill {num_lobbies} lobbies of {team_size} vs {team_size} with {n} players")
+
+    # Slots 0 .. 2K-1 are teams (slot // 2 is the lobby), slot 2K is the bench
+    bench = 2 * num_lobbies
+    capacity = [team_size] * bench + [n - num_lobbies * lobby_players]
+    target = sum(ratings) * lobby_players / n  # Expected lobby total, whoever ends up on the bench
+    penalty = 10 * (max(ratings) - min(ratings) + 1) * lobby_players
+
+    groups = _together_groups(n, together)
+    links = [[] for _ in range(n)]  # (other player, must be together)
+    for group in groups:
+        for player in group:
+            links[player].extend((other, True) for other in group if other != player)
+    for first, second in apart:
+        links[first].append((second, False))
+        links[second].append((first, False))
+
+    slot_of = _initial_assignment(ratings, groups, links, capacity, bench)
+    totals = [0.0] * (bench + 1)
+    for player, slot in enumerate(slot_of):
+        totals[slot] += ratings[player]
+
+    def lobby_cost(lobby):
+        team_a, team_b = totals[2 * lobby], totals[2 * lobby + 1]
+        return abs(team_a - team_b) + across_weight * abs(team_a + team_b - target)
+
+    def violations_of(player, slot):
+        count = 0
+        for other, same in links[player]:
+            other_slot = slot_of[other]
+            if same:
+                count += other_slot != slot
+            else:
+                count += other_slot == slot and slot != bench
+        return count
+
+    cost = sum(lobby_cost(lobby) for lobby in range(num_lobbies)) + penalty * _count_violations(slot_of, links, bench)
+    best_cost, best_slots = cost, list(slot_of)
+
+    # The temperature falls geometrically from a quarter of the rating spread to 0.5 over most of the time
+    # budget; the rest is left for the polish
+    rng = random.Random(seed)
+    start = time.monotonic()
+    deadline = start + time_budget
+    search_budget = time_budget * 0.9
+    start_temperature = max((max(ratings) - min(ratings)) / 4, 1.0)
+    temperature = start_temperature
+    iterations = 0
+    while best_cost > 0:
+        iterations += 1
+        if iterations % 256 == 0:
+            progress = (time.monotonic() - start) / search_budget if search_budget > 0 else 1
+            if progress >= 1:
+                break
+            temperature = start_temperature * (0.5 / start_temperature) ** progress
+
+        first, second = rng.randrange(n), rng.randrange(n)
+        slot_1, slot_2 = slot_of[first], slot_of[second]
+        if slot_1 == slot_2:
+            continue
+
+        lobbies = {slot // 2 for slot in (slot_1, slot_2) if slot != bench}
+        before = sum(lobby_cost(lobby) for lobby in lobbies)
+        before += penalty * (violations_of(first, slot_1) + violations_of(second, slot_2))
+        _swap(totals, slot_of, ratings, first, second)
+        after = sum(lobby_cost(lobby) for lobby in lobbies)
+        after += penalty * (violations_of(first, slot_2) + violations_of(second, slot_1))
+        # A link between the two swapped players is counted on both sides, so it cancels out
+        delta = after - before
+
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            cost += delta
+            if cost < best_cost - 1e-9:
+                best_cost, best_slots = cost, list(slot_of)
+        else:
+            _swap(totals, slot_of, ratings, first, second)
+
+    # Polish the best partition: apply improving swaps until no single swap helps or the time is up
+    slot_of[:] = best_slots
+    totals = [0.0] * (bench + 1)
+    for player, slot in enumerate(slot_of):
+        totals[slot] += ratings[player]
+    improved = True
+    while improved and best_cost > 0:
+        improved = False
+        for first in range(n):
+            if time.monotonic() >= deadline:
+                improved = False
+                break
+            for second in range(first + 1, n):
+                slot_1, slot_2 = slot_of[first], slot_of[second]
+                if slot_1 == slot_2:
+                    continue
+                lobbies = {slot // 2 for slot in (slot_1, slot_2) if slot != bench}
+                before = sum(lobby_cost(lobby) for lobby in lobbies)
+                before += penalty * (violations_of(first, slot_1) + violations_of(second, slot_2))
+                _swap(totals, slot_of, ratings, first, second)
+                after = sum(lobby_cost(lobby) for lobby in lobbies)
+                after += penalty * (violations_of(first, slot_2) + violations_of(second, slot_1))
+                if after < before - 1e-9:
+                    best_cost += after - before
+                    improved = True
+                else:
+                    _swap(totals, slot_of, ratings, first, second)
+    best_slots = list(slot_of)
+
+    violations = _count_violations(best_slots, links, bench)
+    lobbies = []
+    for lobby in range(num_lobbies):
+        team_a = [p for p in range(n) if best_slots[p] == 2 * lobby]
+        team_b = [p for p in range(n) if best_slots[p] == 2 * lobby + 1]
+        members = team_a + team_b
+        member_ratings = [ratings[p] for p in members]
+        constrained = any(best_slots[other] // 2 == lobby and best_slots[other] != bench
+                          for player in members for other, _ in links[player])
+        if constrained:
+            split = _describe_split(member_ratings, list(range(len(team_a))), "search")
+        else:
+            split = balance_teams(member_ratings, objective=objective)
+        split['team_a'] = [members[i] for i in split['team_a']]
+        split['team_b'] = [members[i] for i in split['team_b']]
+        lobbies.append(split)
+
+    logger.debug(f"Partitioned {n} players into {num_lobbies} lobbies in {iterations} iterations "
+                 f"(cost {best_cost:.1f}, {violations} constraint violation(s))")
+    return {
+        'lobbies': lobbies,
+        'bench': [p for p in range(n) if best_slots[p] == bench],
+        'violations': violations,
+        'cost': round(best_cost, 4),
+        'iterations': iterations
+    }
+
+
+def _swap(totals, slot_of, ratings, first, second):
+    slot_1, slot_2 = slot_of[first], slot_of[second]
+    difference = ratings[second] - ratings[first]
+    totals[slot_1] += difference
+    totals[slot_2] -= difference
+    slot_of[first], slot_of[second] = slot_2, slot_1
+
+
+def _together_groups(n, together):
+    """Merges overlapping must-together groups (union-find) and returns the groups of two or more players."""
+    parent = list(range(n))
+
+    def find(player):
+        while parent[player] != player:
+            parent[player] = parent[parent[player]]
+            player = parent[player]
+        return player
+
+    for group in together:
+        group = list(group)
+        for other in group[1:]:
+            parent[find(other)] = find(group[0])
+    merged = {}
+    for player in range(n):
+        merged.setdefault(find(player), []).append(player)
+    return [group for group in merged.values() if len(group) > 1]
+
+
+def _count_violations(slot_of, links, bench):
+    violations = 0
+    for player, player_links in enumerate(links):
+        for other, same in player_links:
+            if other > player:
+                if same:
+                    violations += slot_of[player] != slot_of[other]
+                else:
+                    violations += slot_of[player] == slot_of[other] and slot_of[player] != bench
+    return violations
+
+
+def _initial_assignment(ratings, groups, links, capacity, bench):
+    """
+    Snake-drafts players into the team slots, strongest first, keeping must-together groups in one slot
+    and must-apart players in different slots where there is room. Whoever is left over is benched.
+    """
+    grouped = {player for group in groups for player in group}
+    units = groups + [[player] for player in range(len(ratings)) if player not in grouped]
+    units.sort(key=lambda unit: (-len(unit), -max(ratings[p] for p in unit)))
+
+    slot_of = [None] * len(ratings)
+    free = list(capacity)
+    teams = list(range(bench))
+    forward = True
+    for unit in units:
+        order = teams if forward else teams[::-1]
+        forward = not forward
+        fitting = [slot for slot in order if free[slot] >= len(unit)]
+        clear = [slot for slot in fitting
+                 if not any(slot_of[other] == slot for player in unit for other, same in links[player] if not same)]
+        slot = (clear or fitting or [bench])[0]
+        if slot == bench and free[bench] < len(unit):
+            # No room anywhere for the whole group: split it over the slots with space left
+            for player in unit:
+                slot = next(s for s in teams + [bench] if free[s] > 0)
+                slot_of[player] = slot
+                free[slot] -= 1
+            continue
+        for player in unit:
+            slot_of[player] = slot
+        free[slot] -= len(unit)
+    return slot_of
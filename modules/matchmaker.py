@@ -1,18 +1,19 @@
 import sys
-from itertools import combinations
-from modules.utils import load_elo_database
-from configs.app_config import ELO_JSON_DATABASE_PATH
+from modules.utils import load_player_ratings
+from modules.team_balancer import top_splits
+from modules.lobby_partitioner import partition_lobbies
+from modules.service_client import connect_to_service, RatingServiceError
+from configs.app_config import ELO_JSON_DATABASE_PATH, MATCHMAKING_OBJECTIVE, MATCHMAKING_ALTERNATIVE_SPLITS
 import json
 from pick import pick
 from loguru import logger
 
 # Run from root directory with: python -m modules.matchmaker
 
-# Configure Loguru
-logger.remove()
-logger.add(sys.stdout, level="INFO", colorize=True, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>")
-
 def main():
+    # Use the rating service's in-memory ratings when it is running (see modules/rating_service.py)
+    client = connect_to_service()
+
     # Prompt the user to choose input method
     input_method = input("Choose input method:\n1. Manually enter player names\n2. Select players from list\nEnter 1 or 2: ")
 
@@ -23,24 +24,18 @@ def main():
     elif input_method == '2':
         # Load players from the database
         try:
-            database = load_elo_database(ELO_JSON_DATABASE_PATH)
+            player_elo_dict = fetch_player_ratings(client)
         except Exception as e:
             logger.error("Failed to load database", exc_info=True)
             sys.exit(1)
 
         # Check if database is empty
-        if not database or 'Players' not in database:
+        if not player_elo_dict:
             logger.error("Database is empty or missing 'Players' key")
             sys.exit(1)
 
         # Extract player names and ELO ratings
-        available_players = []
-        player_elo_dict = {}
-        for player in database['Players']:
-            name = player['PlayerName']
-            elo = player.get('Starting Elo', 1200)
-            available_players.append(f"{name} (ELO: {elo})")
-            player_elo_dict[name] = elo
+        available_players = [f"{name} (ELO: {elo})" for name, elo in player_elo_dict.items()]
 
         # Use pick to select players
         title = 'Select players to matchmake (press SPACE to mark, ENTER to continue):'
@@ -56,32 +51,39 @@ def main():
         sys.exit(1)
 
     # Proceed with the rest of the matchmaking
-    # Try to read the database
-    try:
-        database = load_elo_database(ELO_JSON_DATABASE_PATH)
-    except Exception as e:
-        logger.error("Failed to load database", exc_info=True)
-        sys.exit(1)
+    # Try to read the current ratings (only needed if they were not loaded for the selection above)
+    if input_method == '1':
+        try:
+            player_elo_dict = fetch_player_ratings(client)
+        except Exception as e:
+            logger.error("Failed to load database", exc_info=True)
+            sys.exit(1)
 
     # Check if database is empty
-    if not database or 'Players' not in database:
+    if not player_elo_dict:
         logger.error("Database is empty or missing 'Players' key")
         sys.exit(1)
 
     # Filter out players specified in `players_list`
-    playerList = []
-    for player in database['Players']:
-        if player['PlayerName'] in players_list:
-            try:
-                playerList.append((player['PlayerName'], player['Starting Elo']))
-            except KeyError as e:
-                logger.warning(f"Player data missing expected fields: {e}")
-                continue
+    playerList = [(name, elo) for name, elo in player_elo_dict.items() if name in players_list]
 
     if len(playerList) != len(players_list):
         missing_players = set(players_list) - {p[0] for p in playerList}
         logger.warning(f"The following players were not found in the database: {', '.join(missing_players)}")
 
+    # On event nights the pool can be split into several simultaneous matches instead
+    team_size_input = input("Enter a team size to split the players into several lobbies, or press enter for a single match: ").strip()
+    if team_size_input:
+        try:
+            team_size = int(team_size_input)
+        except ValueError:
+            team_size = 0
+        if team_size < 1:
+            logger.error(f"Invalid team size '{team_size_input}': enter a whole number of players per team.")
+            sys.exit(1)
+        matchmake_lobbies(playerList, team_size, client)
+        return
+
     # Ensure we have an even number of players for splitting into teams
     players = playerList
     n = len(players)
@@ -89,31 +91,106 @@ def main():
         logger.error("Odd number of players, cannot split evenly into two teams")
         sys.exit(1)
 
-    best_diff = float('inf')
-    best_team1, best_team2 = [], []
-
-    # Generate all possible ways to split players into two groups of equal size
-    for team1_indices in combinations(range(n), n // 2):
-        team1 = [players[i] for i in team1_indices]
-        team2 = [players[i] for i in range(n) if i not in team1_indices]
-        
-        # Calculate total scores for each team
-        score_team1 = sum(player[1] for player in team1)
-        score_team2 = sum(player[1] for player in team2)
-        score_diff = abs(score_team1 - score_team2)
-
-        # Track the best split (minimizing the score difference)
-        if score_diff < best_diff:
-            best_diff = score_diff 
-            Team_A_Score, Team_B_Score = score_team1, score_team2
-            best_team1, best_team2 = team1, team2
-
-    # Log the final teams and scores
-    logger.info("Best Team Split Found:")
-    logger.info(f"Team A: {best_team1}, Score: {Team_A_Score}")
-    logger.info(f"Team B: {best_team2}, Score: {Team_B_Score}")
+    # Players can be pinned to a team, e.g. to keep a premade group together or rematch last game's captains
+    pinned_a = [i for group in parse_player_groups(input("Players to pin to Team A (e.g. 'Ann, Bob'), or press enter: "), playerList, min_size=1) for i in group]
+    pinned_b = [i for group in parse_player_groups(input("Players to pin to Team B (e.g. 'Cid'), or press enter: "), playerList, min_size=1) for i in group]
+
+    # Find the most balanced splits according to MATCHMAKING_OBJECTIVE (see modules/team_balancer.py)
+    try:
+        if client is not None:
+            names = [player[0] for player in players]
+            splits = client.matchmake(names, k=1 + MATCHMAKING_ALTERNATIVE_SPLITS, pinned_a=[names[i] for i in pinned_a],
+                                      pinned_b=[names[i] for i in pinned_b])['splits']
+            index = {name: i for i, name in enumerate(names)}
+            splits = [dict(split, team_a=[index[name] for name in split['team_a']],
+                           team_b=[index[name] for name in split['team_b']]) for split in splits]
+        else:
+            splits = top_splits([player[1] for player in players], k=1 + MATCHMAKING_ALTERNATIVE_SPLITS,
+                                pinned_a=pinned_a, pinned_b=pinned_b, objective=MATCHMAKING_OBJECTIVE)
+    except (ValueError, RatingServiceError) as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    for split in splits:
+        best_team1 = [players[i] for i in split['team_a']]
+        best_team2 = [players[i] for i in split['team_b']]
+        Team_A_Score = sum(player[1] for player in best_team1)
+        Team_B_Score = sum(player[1] for player in best_team2)
+
+        # Log the teams and scores, best split first
+        logger.info("Best Team Split Found:" if split['rank'] == 1 else f"Alternative {split['rank'] - 1}:")
+        logger.info(f"Team A: {best_team1}, Score: {Team_A_Score}")
+        logger.info(f"Team B: {best_team2}, Score: {Team_B_Score}")
+        logger.info(f"Predicted win probability: Team A {split['win_probability']:.2%}, Team B {1 - split['win_probability']:.2%}")
+
+def fetch_player_ratings(client=None):
+    """
+    Returns `{player name: Elo rating}` from the rating service if `client` is given, else from the database files.
+    """
+    if client is not None:
+        return {player['PlayerName']: player['Starting Elo'] for player in client.leaderboard()}
+    return load_player_ratings(ELO_JSON_DATABASE_PATH)
+
+def parse_player_groups(text, playerList, min_size=2):
+    """
+    Parses groups of player names such as "Ann, Bob; Cid, Dee" into lists of indexes into playerList.
+    Names that are not in playerList are reported and ignored, as are groups of fewer than min_size players.
+    """
+    indexes = {name: i for i, (name, _) in enumerate(playerList)}
+    groups = []
+    for group_text in text.split(';'):
+        names = [name.strip() for name in group_text.split(',') if name.strip()]
+        unknown = [name for name in names if name not in indexes]
+        if unknown:
+            logger.warning(f"Ignoring unknown player(s) in constraint: {', '.join(unknown)}")
+        group = [indexes[name] for name in names if name in indexes]
+        if len(group) >= min_size:
+            groups.append(group)
+    return groups
+
+def matchmake_lobbies(playerList, team_size, client=None):
+    """
+    Splits the selected players into as many balanced lobbies of team_size versus team_size as they fill,
+    asking for players who must (or must not) play on the same team. The search runs in the rating
+    service if `client` is given.
+    """
+    if len(playerList) < 2 * team_size:
+        logger.error(f"Not enough players for a lobby of {team_size} vs {team_size}")
+        sys.exit(1)
+
+    together = parse_player_groups(input("Players who must be on the same team (e.g. 'Ann, Bob; Cid, Dee'), or press enter: "), playerList)
+    apart_groups = parse_player_groups(input("Players who must not be on the same team (e.g. 'Eve, Fay'), or press enter: "), playerList)
+    apart = [(first, second) for group in apart_groups for i, first in enumerate(group) for second in group[i + 1:]]
+
+    if client is not None:
+        names = [player[0] for player in playerList]
+        result = client.matchmake(names, team_size=team_size, together=[[names[i] for i in group] for group in together],
+                                  apart=[[names[first], names[second]] for first, second in apart])
+        index = {name: i for i, name in enumerate(names)}
+        for lobby in result['lobbies']:
+            lobby['team_a'] = [index[name] for name in lobby['team_a']]
+            lobby['team_b'] = [index[name] for name in lobby['team_b']]
+        result['bench'] = [index[name] for name in result['bench']]
+    else:
+        result = partition_lobbies([player[1] for player in playerList], team_size, together=together, apart=apart, objective=MATCHMAKING_OBJECTIVE)
+
+    for number, lobby in enumerate(result['lobbies'], start=1):
+        team1 = [playerList[i] for i in lobby['team_a']]
+        team2 = [playerList[i] for i in lobby['team_b']]
+        logger.info(f"Lobby {number}:")
+        logger.info(f"  Team A: {team1}, Score: {sum(player[1] for player in team1)}")
+        logger.info(f"  Team B: {team2}, Score: {sum(player[1] for player in team2)}")
+        logger.info(f"  Predicted win probability: Team A {lobby['win_probability']:.2%}, Team B {1 - lobby['win_probability']:.2%}")
+    if result['bench']:
+        logger.info(f"Sitting out: {[playerList[i] for i in result['bench']]}")
+    if result['violations']:
+        logger.warning(f"{result['violations']} team constraint(s) could not be met.")
 
 if __name__ == "__main__":
+    # Configure Loguru (only when run on its own, so importing `main` keeps the caller's sinks)
+    logger.remove()
+    logger.add(sys.stdout, level="INFO", colorize=True, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>")
+
     try:
         main()
     except Exception as e:
@@ -0,0 +1,163 @@
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from loguru import logger
+
+from configs.app_config import METRICS_PROMETHEUS_PATH, METRICS_SUMMARY_PATH
+from modules.database import atomic_write_bytes
+from modules import profiling
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NULL_TIMER = nullcontext()
+_current = None  # The StageMetrics of the running ingest, None while metrics are disabled
+
+
+class StageMetrics:
+    """
+    Wall-clock durations of the stages of one run (scoreboard detection, LLM requests, saves, ...).
+
+    Every sample is kept, so the percentiles are exact: a run records a handful of stages per image,
+    which is nothing next to the images themselves. Samples can be recorded from several threads
+    (the write-behind store flushes in the background).
+
+    **Example:**
+
+    ```python
+    metrics = StageMetrics()
+    with metrics.stage("detect_scoreboard"):
+        cropped_image = detect_scoreboard(image_path)
+    print(metrics.summary()['stages']['detect_scoreboard']['p95'])
+    ```
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+
+    def samples(self, name):
+        with self._lock:
+            return list(self._samples.get(name, []))
+
+    def summary(self):
+        """
+        Returns the run's statistics: per stage the number of samples, their total, mean, minimum,
+        maximum and p50/p95/p99, in seconds.
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+        stages = {}
+        for name, values in sorted(samples.items()):
+            stages[name] = {
+                'count': len(values),
+                'total': sum(values),
+                'mean': sum(values) / len(values),
+                'min': values[0],
+                'max': values[-1],
+                **{_quantile_key(q): percentile(values, q) for q in QUANTILES},
+            }
+        return {
+            'run_started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'duration_seconds': time.time() - self.started,
+            'stages': stages,
+        }
+
+    def prometheus_text(self, summary=None):
+        """Returns the statistics in the Prometheus text exposition format, as one summary metric."""
+        summary = summary or self.summary()
+        lines = [
+            "# HELP robz_elo_stage_duration_seconds Duration of each stage of the last ingest run.",
+            "# TYPE robz_elo_stage_duration_seconds summary",
+        ]
+        for name, stats in summary['stages'].items():
+            for q in QUANTILES:
+                lines.append(f'robz_elo_stage_duration_seconds{{stage="{name}",quantile="{q}"}} {stats[_quantile_key(q)]:.6f}')
+            lines.append(f'robz_elo_stage_duration_seconds_sum{{stage="{name}"}} {stats["total"]:.6f}')
+            lines.append(f'robz_elo_stage_duration_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines += [
+            "# HELP robz_elo_run_started_timestamp_seconds Start time of the last ingest run.",
+            "# TYPE robz_elo_run_started_timestamp_seconds gauge",
+            f"robz_elo_run_started_timestamp_seconds {self.started:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, prometheus_path=METRICS_PROMETHEUS_PATH, summary_path=METRICS_SUMMARY_PATH):
+        """
+        Writes the Prometheus text file and the JSON summary (either is skipped if its path is empty).
+        Both are replaced atomically, so a collector never reads a half-written file.
+        """
+        summary = self.summary()
+        if prometheus_path:
+            atomic_write_bytes(prometheus_path, self.prometheus_text(summary).encode("utf-8"))
+        if summary_path:
+            atomic_write_bytes(summary_path, json.dumps(summary, indent=4).encode("utf-8"))
+        for name, stats in summary['stages'].items():
+            logger.info(f"{name:<20} n={stats['count']:<5} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s")
+        return summary
+
+
+def percentile(sorted_values, q):
+    """Returns the `q` quantile (0-1) of a sorted list, interpolating linearly between samples."""
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _quantile_key(q):
+    return f"p{round(q * 100)}"
+
+
+def enable():
+    """Starts recording stage durations for a new run and returns its `StageMetrics`."""
+    global _current
+    _current = StageMetrics()
+    return _current
+
+
+def disable():
+    """Stops recording and returns the `StageMetrics` of the run, or None if metrics were not enabled."""
+    global _current
+    metrics, _current = _current, None
+    return metrics
+
+
+def timed(name):
+    """
+    Returns a context manager that records the duration of the `name` stage in the current run.
+
+    While metrics and profiling are disabled this is two global lookups returning a shared no-op context
+    manager, so the instrumented code can stay in place at no measurable cost. While a run is profiled
+    (see modules/profiling.py), the stage also gets its own profile.
+    """
+    if _current is None and profiling._current is None:
+        return _NULL_TIMER
+    return _stage(name, _current, profiling._current)
+
+
+@contextmanager
+def _stage(name, metrics, profiler):
+    with profiler.stage(name) if profiler is not None else _NULL_TIMER:
+        with metrics.stage(name) if metrics is not None else _NULL_TIMER:
+            yield
+
+
+def record(name, seconds):
+    """Records a duration measured by the caller in the current run (nothing while metrics are disabled)."""
+    if _current is not None:
+        _current.record(name, seconds)
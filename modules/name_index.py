@@ -0,0 +1,183 @@
+from datetime import datetime
+from loguru import logger
+
+from configs.app_config import NAME_MATCH_MAX_EDITS, NAME_AUTO_MAP_THRESHOLD, NAME_REVIEW_THRESHOLD, NAME_REVIEW_QUEUE_PATH
+from modules.database import Database
+
+# Characters OCR commonly confuses, folded together before names are compared
+OCR_CONFUSIONS = str.maketrans({'0': 'o', '1': 'l', 'i': 'l', '|': 'l', '5': 's', '$': 's'})
+
+
+def normalize_name(name):
+    """Case-folds a name, collapses whitespace and folds OCR look-alike characters together."""
+    return " ".join(name.split()).casefold().translate(OCR_CONFUSIONS)
+
+
+def edit_distance(a, b):
+    """
+    Returns the Damerau-Levenshtein distance between two strings.
+
+    Insertions, deletions, substitutions and transpositions of adjacent characters each count as one
+    edit, so an OCR slip like `THEAK74` vs `THEAK47` is a distance of 1.
+    """
+    if a == b:
+        return 0
+    if not a or not b:
+        return len(a) or len(b)
+
+    infinity = len(a) + len(b)
+    last_row = {}
+    table = [[infinity] * (len(b) + 2)]
+    table += [[infinity, i] + [0] * len(b) for i in range(len(a) + 1)]
+    table[1][1:] = list(range(len(b) + 1))
+
+    for i in range(1, len(a) + 1):
+        last_match_column = 0
+        for j in range(1, len(b) + 1):
+            last_match_row = last_row.get(b[j - 1], 0)
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            table[i + 1][j + 1] = min(
+                table[i][j] + cost,  # substitution
+                table[i + 1][j] + 1,  # insertion
+                table[i][j + 1] + 1,  # deletion
+                table[last_match_row][last_match_column] + (i - last_match_row - 1) + 1 + (j - last_match_column - 1)  # transposition
+            )
+            if cost == 0:
+                last_match_column = j
+        last_row[a[i - 1]] = i
+    return table[len(a) + 1][len(b) + 1]
+
+
+class NameIndex:
+    """
+    Fuzzy index over every current and past player name.
+
+    Candidates are found with a symmetric-deletion index: each name is stored under every string obtained
+    by deleting up to `max_edits` characters from it, and a query looks up the deletions of the scanned
+    name. Any name within `max_edits` edits shares at least one of those keys, so a lookup is a few dozen
+    dictionary probes followed by an exact edit-distance check of the few candidates, which keeps
+    queries well under a millisecond regardless of how many players there are.
+
+    **Example:**
+
+    ```python
+    index = NameIndex.from_database(eloDatabase)
+    print(index.candidates('THEAK74'))
+    # Output:
+    # [{'player': 'THE LONG SHLONG', 'alias': 'THEAK47', 'score': 0.8571}]
+    ```
+    """
+
+    def __init__(self, max_edits=NAME_MATCH_MAX_EDITS):
+        self.max_edits = max_edits
+        self._aliases = {}  # normalized alias -> {original alias: set of player names}
+        self._deletions = {}  # deletion key -> set of normalized aliases
+        self.auto_mapped = {}  # scanned name -> player, for names mapped by resolve_name and not yet saved
+
+    @classmethod
+    def from_database(cls, eloDatabase, **kwargs):
+        index = cls(**kwargs)
+        for player in eloDatabase.get('Players', []):
+            index.add(player['PlayerName'], player['PlayerName'])
+            for past_name in player.get('past names', []):
+                index.add(past_name, player['PlayerName'])
+        return index
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def add(self, alias, player_name):
+        """Registers `alias` (a current or past name) as a name of `player_name`."""
+        normalized = normalize_name(alias)
+        if normalized not in self._aliases:
+            self._aliases[normalized] = {}
+            for key in self._deletion_keys(normalized):
+                self._deletions.setdefault(key, set()).add(normalized)
+        self._aliases[normalized].setdefault(alias, set()).add(player_name)
+
+    def candidates(self, name, limit=5, min_score=0.0):
+        """
+        Returns the players whose names are closest to `name`, best first.
+
+        **Returns:**
+        - A list of `{'player', 'alias', 'score'}` dictionaries with one entry per player.
+        """
+        normalized = normalize_name(name)
+        matches = set()
+        for key in self._deletion_keys(normalized):
+            matches.update(self._deletions.get(key, ()))
+
+        best = {}
+        for alias_key in matches:
+            distance = edit_distance(normalized, alias_key)
+            score = 1 - distance / max(len(normalized), len(alias_key), 1)
+            if distance > self.max_edits or score < min_score:
+                continue
+            for alias, players in self._aliases[alias_key].items():
+                for player in players:
+                    if player not in best or score > best[player]['score']:
+                        best[player] = {'player': player, 'alias': alias, 'score': round(score, 4)}
+
+        ranked = sorted(best.values(), key=lambda c: (-c['score'], c['player']))
+        return ranked[:limit]
+
+    def _deletion_keys(self, name):
+        keys = {name}
+        level = {name}
+        for _ in range(self.max_edits):
+            level = {word[:i] + word[i + 1:] for word in level for i in range(len(word))}
+            keys |= level
+        return keys
+
+
+def resolve_name(scanned_name, name_index, auto_map_threshold=NAME_AUTO_MAP_THRESHOLD,
+                 review_threshold=NAME_REVIEW_THRESHOLD, review_queue_path=NAME_REVIEW_QUEUE_PATH, context=None, exclude=()):
+    """
+    Decides which player a scanned name that has no exact match belongs to.
+
+    - If the best candidate scores at least `auto_map_threshold` (and no other player ties it), the
+      name is mapped to that player and recorded in `name_index.auto_mapped`, to be saved as a past name.
+    - If it scores at least `review_threshold`, the name is kept as scanned and queued in
+      `review_queue_path` with its candidates, to be confirmed with `python -m modules.name_management`.
+    - Otherwise the name is treated as a new player.
+
+    Players in `exclude` (those already in the same game) are never candidates: a name that resembles
+    a teammate or an opponent belongs to someone else.
+
+    **Returns:**
+    - A tuple `(player_name, candidates)`; `player_name` is None unless the name was auto-mapped.
+    """
+    candidates = [candidate for candidate in name_index.candidates(scanned_name, min_score=review_threshold)
+                  if candidate['player'] not in exclude]
+    if not candidates:
+        return None, candidates
+
+    best = candidates[0]
+    ambiguous = len(candidates) > 1 and candidates[1]['score'] == best['score']
+    if best['score'] >= auto_map_threshold and not ambiguous:
+        logger.info(f"'{scanned_name}' matched to '{best['player']}' via '{best['alias']}' (score {best['score']})")
+        name_index.add(scanned_name, best['player'])
+        name_index.auto_mapped[scanned_name] = best['player']
+        return best['player'], candidates
+
+    logger.warning(f"'{scanned_name}' resembles {', '.join(c['player'] for c in candidates)}; queued for review.")
+    queue_for_review(scanned_name, candidates, review_queue_path, context)
+    return None, candidates
+
+
+def queue_for_review(scanned_name, candidates, review_queue_path=NAME_REVIEW_QUEUE_PATH, context=None):
+    """Appends a scanned name and its candidates to the review queue (once per scanned name)."""
+    if not review_queue_path:
+        return
+
+    def append(queue):
+        if any(entry['scanned_name'] == scanned_name for entry in queue):
+            return
+        queue.append({
+            'scanned_name': scanned_name,
+            'candidates': candidates,
+            'queued_at': datetime.now().isoformat(timespec='seconds'),
+            'context': context
+        })
+
+    Database(review_queue_path, default_factory=list).update(append)
@@ -1,30 +1,45 @@
+import csv
+import copy
 import json
 import os
 from loguru import logger
 
-from configs.app_config import ELO_JSON_DATABASE_PATH
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, NAME_REVIEW_QUEUE_PATH
+from modules.database import Database, players_database, game_results_database, DatabaseLockTimeout, VersionConflictError
+from modules.replay import build_name_resolver, affected_games, rewind_players, replay_games, game_outcomes
+from modules.pair_stats import rebuild_pair_stats
+from modules.attempt_deltas import replace_consensus, read_side_file
 
 # Run from root directory with: python -m modules.name_management
 
-def change_player_name(json_file_path, old_name, new_name):
-    try:
-        # Load the JSON data from the file
-        with open(json_file_path, "r") as file:
-            try:
-                data = json.load(file)
-            except json.JSONDecodeError:
-                logger.error(f"Error: The file '{json_file_path}' contains invalid JSON.")
-                return
-    except FileNotFoundError:
+def _update_database(json_file_path, mutate):
+    """
+    Runs `mutate(data)` against the latest database contents and commits the result.
+
+    Goes through `Database`, so the edit is locked, versioned and retried if an ingest (or another
+    admin tool) commits at the same time, instead of one side silently overwriting the other.
+    """
+    if not os.path.exists(json_file_path):
         logger.error(f"Error: The file '{json_file_path}' was not found.")
-        return
-    except IOError:
-        logger.error(f"Error: An I/O error occurred while trying to read '{json_file_path}'.")
-        return
+        return None
 
-    # Find the player and change their name
-    player_found = False
     try:
+        _, result = players_database(json_file_path).update(mutate)
+        return result
+    except json.JSONDecodeError:
+        logger.error(f"Error: The file '{json_file_path}' contains invalid JSON.")
+    except KeyError:
+        logger.error("Error: Expected keys ('Players', 'PlayerName', or 'past names') were not found in the JSON structure.")
+    except (DatabaseLockTimeout, VersionConflictError) as e:
+        logger.error(f"Error: Could not update '{json_file_path}': {e}")
+    except IOError:
+        logger.error(f"Error: An I/O error occurred while trying to update '{json_file_path}'.")
+    return None
+
+
+def change_player_name(json_file_path, old_name, new_name):
+    def rename(data):
+        # Find the player and change their name
         for player in data["Players"]:
             if player["PlayerName"] == old_name:
                 # Change the player's name
@@ -37,45 +52,19 @@ def change_player_name(json_file_path, old_name, new_name):
                 # Add old_name to past names if not already present
                 if old_name not in player["past names"]:
                     player["past names"].append(old_name)
+                return True
+        return False
 
-                player_found = True
-                logger.info(f"Player name changed from '{old_name}' to '{new_name}', and '{old_name}' added to past names.")
-                break
-
-        if not player_found:
-            logger.error(f"Error: Player with name '{old_name}' not found in the JSON data.")
-
-    except KeyError:
-        logger.error("Error: Expected keys ('Players', 'PlayerName', or 'past names') were not found in the JSON structure.")
-        return
-
-    # Save the modified data back to the JSON file
-    try:
-        with open(json_file_path, "w") as file:
-            json.dump(data, file, indent=4)
-    except IOError:
-        logger.error(f"Error: An I/O error occurred while trying to write to '{json_file_path}'.")
+    player_found = _update_database(json_file_path, rename)
+    if player_found:
+        logger.info(f"Player name changed from '{old_name}' to '{new_name}', and '{old_name}' added to past names.")
+    elif player_found is False:
+        logger.error(f"Error: Player with name '{old_name}' not found in the JSON data.")
 
 
 def add_past_name(json_file_path, player_name, past_name):
-    try:
-        # Load the JSON data from the file
-        with open(json_file_path, "r") as file:
-            try:
-                data = json.load(file)
-            except json.JSONDecodeError:
-                logger.error(f"Error: The file '{json_file_path}' contains invalid JSON.")
-                return
-    except FileNotFoundError:
-        logger.error(f"Error: The file '{json_file_path}' was not found.")
-        return
-    except IOError:
-        logger.error(f"Error: An I/O error occurred while trying to read '{json_file_path}'.")
-        return
-
-    # Find the player and add the past name
-    player_found = False
-    try:
+    def add_alias(data):
+        # Find the player and add the past name
         for player in data["Players"]:
             if player["PlayerName"] == player_name:
                 # Ensure past names is a list, initialize if needed
@@ -85,26 +74,346 @@ def add_past_name(json_file_path, player_name, past_name):
                 # Add past_name to past names if not already present
                 if past_name not in player["past names"]:
                     player["past names"].append(past_name)
-                    logger.info(f"'{past_name}' added to the past names of '{player_name}'.")
-                else:
-                    logger.info(f"'{past_name}' is already listed as a past name for '{player_name}'.")
+                    return "added"
+                return "exists"
+        return "missing"
 
-                player_found = True
-                break
+    outcome = _update_database(json_file_path, add_alias)
+    if outcome == "added":
+        logger.info(f"'{past_name}' added to the past names of '{player_name}'.")
+    elif outcome == "exists":
+        logger.info(f"'{past_name}' is already listed as a past name for '{player_name}'.")
+    elif outcome == "missing":
+        logger.error(f"Error: Player with name '{player_name}' not found in the JSON data.")
 
-        if not player_found:
-            logger.error(f"Error: Player with name '{player_name}' not found in the JSON data.")
 
-    except KeyError:
-        logger.error("Error: Expected keys ('Players', 'PlayerName', or 'past names') were not found in the JSON structure.")
-        return
+NAME_OPERATION_ACTIONS = ("rename", "alias")
+
+
+def load_name_operations(file_path):
+    """
+    Reads a list of bulk name operations from a CSV or JSON file.
+
+    Each operation has an `action` ("rename" or "alias"), the `player` it applies to (their current name)
+    and the new `name`. CSV files need a header row with those three columns; JSON files contain a list
+    of objects with the same keys.
+
+    **Example:**
+
+    ```
+    action,player,name
+    rename,THE LONG SHLONG,Shlong
+    alias,Shlong,THEAK74
+    alias,Taters,Tatrz
+    ```
+    """
+    with open(file_path, newline="", encoding="utf-8") as file:
+        if file_path.lower().endswith(".json"):
+            rows = json.load(file)
+        else:
+            rows = list(csv.DictReader(file))
+    return [
+        {key: (row.get(key) or "").strip() for key in ("action", "player", "name")}
+        for row in rows
+    ]
+
+
+def validate_name_operations(eloDatabase, operations):
+    """
+    Checks a batch of name operations against the database before anything is changed.
+
+    Renames are applied first, then aliases; an alias may name the player by their current or new
+    name. The batch is rejected if an operation is malformed, a player is missing, a name would belong
+    to two players (an alias claimed twice, an alias or new name that is already someone else's
+    current or past name, two players renamed to the same name), a player is renamed twice, or a new
+    name is the old name of another rename in the batch (rename chains and cycles such as A -> B -> A
+    would depend on the order they are applied in).
+
+    **Returns:**
+    - A list of conflict messages, empty if the batch can be applied.
+    """
+    conflicts = []
+    current_names = {p["PlayerName"] for p in eloDatabase["Players"]}
+    past_name_owners = {}
+    for player in eloDatabase["Players"]:
+        for past_name in player.get("past names", []):
+            past_name_owners.setdefault(past_name, set()).add(player["PlayerName"])
+
+    renames, aliases = {}, {}
+    for line, operation in enumerate(operations, start=1):  # Numbered from 1 as in the file, excluding a CSV header
+        action, player, name = operation.get("action"), operation.get("player"), operation.get("name")
+        if action not in NAME_OPERATION_ACTIONS or not player or not name:
+            conflicts.append(f"Operation {line}: expected an action ({' or '.join(NAME_OPERATION_ACTIONS)}), a player and a name.")
+        elif action == "rename":
+            if player == name and player in current_names:
+                continue  # Already has that name
+            if player not in current_names:
+                conflicts.append(f"Operation {line}: player '{player}' not found.")
+            elif player in renames and renames[player] != name:
+                conflicts.append(f"Operation {line}: '{player}' is renamed to both '{renames[player]}' and '{name}'.")
+            else:
+                renames[player] = name
+        else:
+            aliases.setdefault(name, []).append((line, player))
+
+    # New names must be free and must not feed into another rename
+    new_name_owners, reported_cycles = {}, set()
+    for old_name, new_name in renames.items():
+        new_name_owners.setdefault(new_name, []).append(old_name)
+    for new_name, old_names in new_name_owners.items():
+        if len(old_names) > 1:
+            conflicts.append(f"'{new_name}' is the new name of several players: {', '.join(sorted(old_names))}.")
+        if new_name in renames:
+            chain = [old_names[0], new_name]
+            while chain[-1] in renames and chain[-1] not in chain[:-1]:
+                chain.append(renames[chain[-1]])
+            kind = "cycle" if chain[-1] in chain[:-1] else "chain"
+            if kind == "cycle":
+                if frozenset(chain) in reported_cycles:
+                    continue
+                reported_cycles.add(frozenset(chain))
+            conflicts.append(f"Rename {kind} {' -> '.join(chain)}: apply it as separate imports.")
+        elif new_name in current_names:
+            conflicts.append(f"Can not rename '{old_names[0]}' to '{new_name}': that is the name of another player.")
+        elif past_name_owners.get(new_name, set()) - set(old_names):
+            conflicts.append(f"Can not rename '{old_names[0]}' to '{new_name}': it is a past name of "
+                             f"{', '.join(sorted(past_name_owners[new_name] - set(old_names)))}.")
+
+    # Aliases must belong to exactly one player, who must exist after the renames
+    final_names = {renames.get(name, name): name for name in current_names}  # final name -> original name
+    for alias, claims in aliases.items():
+        owners = set()
+        for line, player in claims:
+            if player in current_names:
+                owners.add(renames.get(player, player))
+            elif player in final_names:
+                owners.add(player)
+            else:
+                conflicts.append(f"Operation {line}: player '{player}' not found.")
+        if len(owners) > 1:
+            conflicts.append(f"Alias '{alias}' is claimed by several players: {', '.join(sorted(owners))}.")
+        elif owners:
+            owner = next(iter(owners))
+            other_owners = past_name_owners.get(alias, set()) - {final_names[owner]}
+            if alias in renames and renames[alias] != owner:
+                other_owners.add(renames[alias])  # The old name becomes a past name of the renamed player
+            if alias in final_names and alias != owner:
+                conflicts.append(f"Alias '{alias}' for '{owner}' is the name of another player.")
+            elif other_owners:
+                conflicts.append(f"Alias '{alias}' for '{owner}' is already a past name of {', '.join(sorted(other_owners))}.")
+    return conflicts
+
+
+def _apply_name_operations(eloDatabase, operations):
+    """Applies a validated batch of name operations in memory and returns counts of what changed."""
+    players = {p["PlayerName"]: p for p in eloDatabase["Players"]}
+    renames = {op["player"]: op["name"] for op in operations if op["action"] == "rename"}
+    summary = {"renamed": 0, "aliases_added": 0, "unchanged": 0}
+
+    for old_name, new_name in renames.items():
+        player = players.pop(old_name)
+        if old_name == new_name:
+            summary["unchanged"] += 1
+            players[new_name] = player
+            continue
+        player["PlayerName"] = new_name
+        past_names = player.setdefault("past names", [])
+        if old_name not in past_names:
+            past_names.append(old_name)
+        if new_name in past_names:
+            past_names.remove(new_name)
+        players[new_name] = player
+        summary["renamed"] += 1
+
+    for operation in operations:
+        if operation["action"] != "alias":
+            continue
+        player = players[renames.get(operation["player"], operation["player"])]
+        past_names = player.setdefault("past names", [])
+        if operation["name"] == player["PlayerName"] or operation["name"] in past_names:
+            summary["unchanged"] += 1
+        else:
+            past_names.append(operation["name"])
+            summary["aliases_added"] += 1
+    return summary
+
+
+def bulk_update_names(json_file_path, operations):
+    """
+    Applies a batch of renames and aliases (see `load_name_operations`) in a single load, validate, save cycle.
+
+    The whole batch is validated with `validate_name_operations` while the database is locked. If
+    anything conflicts, every conflict is reported and nothing is written; otherwise all operations are
+    committed together.
+
+    **Returns:**
+    - A dictionary with the number of players `renamed`, `aliases_added` and `unchanged` operations, and
+      the list of `conflicts` (non-empty only if nothing was written). None if the database could not be read.
+    """
+    if not os.path.exists(json_file_path):
+        logger.error(f"Error: The file '{json_file_path}' was not found.")
+        return None
 
-    # Save the modified data back to the JSON file
     try:
-        with open(json_file_path, "w") as file:
-            json.dump(data, file, indent=4)
-    except IOError:
-        logger.error(f"Error: An I/O error occurred while trying to write to '{json_file_path}'.")
+        with players_database(json_file_path).exclusive() as (eloDatabase, commit):
+            conflicts = validate_name_operations(eloDatabase, operations)
+            if conflicts:
+                for conflict in conflicts:
+                    logger.error(conflict)
+                logger.error(f"Found {len(conflicts)} conflict(s); no changes were written to '{json_file_path}'.")
+                return {"renamed": 0, "aliases_added": 0, "unchanged": 0, "conflicts": conflicts}
+
+            summary = _apply_name_operations(eloDatabase, operations)
+            if summary["renamed"] or summary["aliases_added"]:
+                commit(eloDatabase)
+    except json.JSONDecodeError:
+        logger.error(f"Error: The file '{json_file_path}' contains invalid JSON.")
+        return None
+    except (DatabaseLockTimeout, VersionConflictError) as e:
+        logger.error(f"Error: Could not update '{json_file_path}': {e}")
+        return None
+
+    logger.info(f"Renamed {summary['renamed']} player(s) and added {summary['aliases_added']} past name(s) "
+                f"({summary['unchanged']} operation(s) were already applied).")
+    return dict(summary, conflicts=[])
+
+
+def _merge_records(source, target):
+    """
+    Folds the `source` player record into `target`: names, counters and (if target has none) the rating history.
+
+    Both records must already be rewound to before their first replayed game, so the histories being
+    combined only cover games that are not replayed.
+    """
+    past_names = target.setdefault("past names", [])
+    for name in [source["PlayerName"]] + source.get("past names", []):
+        if name != target["PlayerName"] and name not in past_names:
+            past_names.append(name)
+    for counter in ("games played", "Games Won", "Games Lost"):
+        target[counter] = target.get(counter, 0) + source.get(counter, 0)
+    if not target.get("Elo History") and source.get("Elo History"):
+        # Only the source played before the replayed games: keep their rating as the starting point
+        target["Elo History"] = list(source["Elo History"])
+        target["Starting Elo"] = source.get("Starting Elo", 1200)
+
+
+def merge_players(json_file_path, source_name, target_name, game_results_path=GAME_RESULTS_JSON_PATH):
+    """
+    Merges the player `source_name` into `target_name`, e.g. when one person has been playing under two names.
+
+    The source's names become past names of the target, their counters are added together, their
+    appearances in the game ledger are rewritten to the target's name (the recorded extraction attempts
+    keep the names that were read) and the source record is removed. Ratings are then recomputed by replaying only the games that depend on the merged player:
+    from the first game of either player, every game that includes the merged player or anyone who
+    played with or against them afterwards (see `modules.replay.affected_games`). Every other game
+    and rating is left untouched.
+
+    Both files are updated under their exclusive locks, so concurrent ingests wait instead of
+    committing in between. The head-to-head and teammate statistics are then recomputed.
+
+    **Returns:**
+    - A dictionary with the number of `replayed_games` and `rewritten_appearances`, or None on error.
+    """
+    if source_name == target_name:
+        logger.error("Error: A player can not be merged into themselves.")
+        return None
+    if not os.path.exists(json_file_path):
+        logger.error(f"Error: The file '{json_file_path}' was not found.")
+        return None
+
+    try:
+        with players_database(json_file_path).exclusive() as (eloDatabase, commit_players), \
+             game_results_database(game_results_path).exclusive() as (game_results, commit_game_results):
+            source = next((p for p in eloDatabase["Players"] if p["PlayerName"] == source_name), None)
+            target = next((p for p in eloDatabase["Players"] if p["PlayerName"] == target_name), None)
+            if source is None or target is None:
+                logger.error(f"Error: Player '{source_name if source is None else target_name}' not found in the JSON data.")
+                return None
+
+            # Work out what has to be replayed while the ledger still resolves to two separate players
+            resolve = build_name_resolver(eloDatabase)
+            indexes, _ = affected_games(game_results, {source_name, target_name}, resolve)
+            rewind_players(eloDatabase, game_results, indexes, resolve)
+
+            for index in indexes:
+                players = game_outcomes(game_results[index], resolve)
+                if source_name in players and target_name in players:
+                    logger.warning(f"Game '{game_results[index]['game_id']}' lists both '{source_name}' and '{target_name}'; "
+                                   f"both appearances now count for '{target_name}'.")
+
+            def source_players(consensus_data):
+                return [player for team in consensus_data.get("teams", {}).values() for player in team.get("players", [])
+                        if player.get("name") is not None and resolve(player["name"]) == source_name]
+
+            rewritten = 0
+            side_file_records = None
+            for entry in game_results:
+                if not source_players(entry.get("consensus_data", {})):
+                    continue
+                # The attempts are diffs against the consensus: re-encode them against the rewritten one
+                consensus_data = copy.deepcopy(entry["consensus_data"])
+                for player in source_players(consensus_data):
+                    entry.setdefault("name_rewrites", []).append({"from": player["name"], "to": target_name})
+                    player["name"] = target_name
+                    rewritten += 1
+                if side_file_records is None and "attempts_file" in entry:
+                    side_file_records = read_side_file()
+                replace_consensus(entry, consensus_data, side_file_records)
+
+            _merge_records(source, target)
+            eloDatabase["Players"].remove(source)
+            replay_games(eloDatabase, game_results, indexes)
+
+            # Players first: if the ledger commit fails, its old names still resolve to the target through past names
+            commit_players(eloDatabase)
+            commit_game_results(game_results)
+    except json.JSONDecodeError:
+        logger.error(f"Error: '{json_file_path}' or '{game_results_path}' contains invalid JSON.")
+        return None
+    except (DatabaseLockTimeout, VersionConflictError) as e:
+        logger.error(f"Error: Could not merge players: {e}")
+        return None
+
+    logger.info(f"Merged '{source_name}' into '{target_name}': rewrote {rewritten} ledger appearance(s) "
+                f"and replayed {len(indexes)} of {len(game_results)} game(s).")
+    # The statistics hold the source's rows and the old rating changes of the replayed games, as after `replay`
+    rebuild_pair_stats(json_file_path, game_results_path)
+    return {"replayed_games": len(indexes), "rewritten_appearances": rewritten}
+
+
+def review_queued_names(json_file_path, review_queue_path):
+    """
+    Walks through the scanned names queued by the fuzzy name matcher and lets the user confirm them.
+
+    Choosing a candidate adds the scanned name to that player's past names, so future scans match it
+    exactly. Choosing 'n' confirms it as a separate player. Either way the entry leaves the queue;
+    pressing enter skips it for now.
+    """
+    queue_database = Database(review_queue_path, default_factory=list)
+    queue, _ = queue_database.read()
+    if not queue:
+        logger.info("No names are waiting for review.")
+        return
+
+    resolved = set()
+    for entry in queue:
+        logger.info(f"Scanned name: '{entry['scanned_name']}'")
+        for i, candidate in enumerate(entry['candidates']):
+            logger.info(f"{i+1}. {candidate['player']} (matched '{candidate['alias']}', score {candidate['score']})")
+        choice = input("Enter the number of the matching player, 'n' if it is a new player, or press enter to skip: ").strip().lower()
+
+        if choice == "n":
+            resolved.add(entry['scanned_name'])
+        elif choice.isdigit() and 1 <= int(choice) <= len(entry['candidates']):
+            add_past_name(json_file_path, entry['candidates'][int(choice) - 1]['player'], entry['scanned_name'])
+            resolved.add(entry['scanned_name'])
+
+    def remove_resolved(latest_queue):
+        latest_queue[:] = [e for e in latest_queue if e['scanned_name'] not in resolved]
+
+    if resolved:
+        queue_database.update(remove_resolved)
+        logger.info(f"Resolved {len(resolved)} queued name(s).")
 
 
 def main():
@@ -130,7 +439,7 @@ def main():
         
 
         # Prompt the user for an action
-        action = input("Choose an action (1 to change name, 2 to add past name): ")
+        action = input("Choose an action (1 to change name, 2 to add past name, 3 to review queued names, 4 to merge two players, 5 to import renames and aliases from a CSV/JSON file): ")
 
         if action == "1":
             old_name = input("Enter the player's current (old) name: ")
@@ -151,6 +460,21 @@ def main():
                 add_past_name(json_file_path, player_name, past_name)
             else:
                 logger.error(f"Error: '{json_file_path}' does not exist.")
+
+        elif action == "3":
+            review_queued_names(json_file_path, os.path.join(project_root, NAME_REVIEW_QUEUE_PATH))
+
+        elif action == "4":
+            source_name = input("Enter the name of the player to merge (this record is removed): ")
+            target_name = input("Enter the name of the player to merge into: ")
+            merge_players(json_file_path, source_name, target_name, os.path.join(project_root, GAME_RESULTS_JSON_PATH))
+
+        elif action == "5":
+            import_path = input("Enter the path of the CSV or JSON file (columns: action, player, name): ").strip()
+            if os.path.exists(import_path):
+                bulk_update_names(json_file_path, load_name_operations(import_path))
+            else:
+                logger.error(f"Error: '{import_path}' does not exist.")
         else:
             logger.error("Invalid action selected.")
 
@@ -0,0 +1,271 @@
+import os
+import copy
+import json
+import hashlib
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, PAIR_STATS_FOLDER, PAIR_STATS_MIN_GAMES, PAIR_STATS_COUNT
+from modules.database import FileLock, players_database, game_results_database, atomic_write_json, pair_stats_folder_for
+
+# Head-to-head and teammate statistics, kept up to date with every rated game instead of being computed
+# from the whole ledger on demand. They form two sparse matrices (players x teammates, players x opponents)
+# that only hold the pairs of players who actually met. Each player's row of both matrices is a file of its
+# own, so a query reads one small file and a game rewrites the rows of its players only:
+#
+#     pair_stats/meta.json          {"layout_version": 1, "games": 120}
+#     pair_stats/<name hash>.json   {"name": "Ann",
+#                                    "teammates": {"Bob": [games, wins, elo_delta], ...},
+#                                    "opponents": {"Cid": [games, wins, elo_delta], ...}}
+#
+# A row is seen from its player: `wins` counts the games they won and `elo_delta` sums the rating they
+# gained in those games. Names are the current names at the time of the game, so the queries merge the
+# rows of a player's past names.
+
+LAYOUT_VERSION = 1
+META_FILE = "meta.json"
+RELATIONS = ("teammates", "opponents")
+
+
+def game_pairs(updatedDictionary):
+    """
+    Returns what the statistics need from a game rated by `calculatePoints`: `(won, [(name, elo_change)])`
+    per team, with the same win rule as `_apply_player_updates` (strictly more points than every other team).
+    """
+    team_points = {team_name: team_data.get('Points') or 0 for team_name, team_data in updatedDictionary.items()}
+    teams = []
+    for team_name, team_data in updatedDictionary.items():
+        other_points = [points for name, points in team_points.items() if name != team_name]
+        won = 1 if other_points and team_points[team_name] > max(other_points) else 0
+        teams.append((won, [(player[0], player[6] - player[1]) for player in team_data['players']]))
+    return teams
+
+
+def empty_row(name):
+    return {'name': name, 'teammates': {}, 'opponents': {}}
+
+
+def add_game(rows, teams):
+    """Adds one game (as returned by `game_pairs`) to `rows`, a dictionary of player rows by name, in place."""
+    for team_index, (won, players) in enumerate(teams):
+        for name, elo_change in players:
+            row = rows.setdefault(name, empty_row(name))
+            for other_index, (_, other_players) in enumerate(teams):
+                cells = row['teammates' if other_index == team_index else 'opponents']
+                for other_name, _ in other_players:
+                    if other_name == name:
+                        continue
+                    cell = cells.setdefault(other_name, [0, 0, 0])
+                    cell[0] += 1
+                    cell[1] += won
+                    cell[2] = round(cell[2] + elo_change, 2)
+    return rows
+
+
+class PairStats:
+    """
+    The statistics folder of one Elo database, read and written under one lock (`meta.json.lock`).
+
+    **Example:**
+
+    ```python
+    stats = PairStats()
+    stats.add_games([game_pairs(updatedPlayerDictionary)])
+    print(stats.row("Ann")['opponents'])
+    ```
+    """
+
+    def __init__(self, folder=PAIR_STATS_FOLDER):
+        self.folder = folder
+        self.meta_path = os.path.join(folder, META_FILE)
+
+    def exists(self):
+        return os.path.exists(self.meta_path)
+
+    def _row_path(self, name):
+        return os.path.join(self.folder, f"{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}.json")
+
+    def _read_row(self, name):
+        try:
+            with open(self._row_path(name), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return empty_row(name)
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'layout_version': LAYOUT_VERSION, 'games': 0}
+
+    def games(self):
+        """Returns the number of games the statistics include."""
+        with FileLock(self.meta_path, shared=True):
+            return self._read_meta()['games']
+
+    def row(self, name):
+        """Returns the row of `name` (exactly that name, see `player_pairs` for past names)."""
+        with FileLock(self.meta_path, shared=True):
+            return self._read_row(name)
+
+    def add_games(self, games):
+        """Adds games (each as returned by `game_pairs`), rewriting only the rows of the players in them."""
+        if not games:
+            return
+        with FileLock(self.meta_path):
+            names = {name for teams in games for _, players in teams for name, _ in players}
+            rows = {name: self._read_row(name) for name in names}
+            for teams in games:
+                add_game(rows, teams)
+            for name, row in rows.items():
+                atomic_write_json(self._row_path(name), row)
+            meta = self._read_meta()
+            meta['games'] += len(games)
+            atomic_write_json(self.meta_path, meta)
+
+    def replace(self, rows, games):
+        """Replaces all the statistics with `rows` (a dictionary of player rows by name) computed from `games` games."""
+        os.makedirs(self.folder, exist_ok=True)
+        with FileLock(self.meta_path):
+            row_files = {os.path.basename(self._row_path(name)) for name in rows}
+            for file_name in os.listdir(self.folder):
+                if file_name.endswith(".json") and file_name != META_FILE and file_name not in row_files:
+                    os.remove(os.path.join(self.folder, file_name))
+            for name, row in rows.items():
+                atomic_write_json(self._row_path(name), row)
+            atomic_write_json(self.meta_path, {'layout_version': LAYOUT_VERSION, 'games': games})
+
+
+def player_pairs(stats, eloDatabase, name, relation):
+    """
+    Returns the partners (`relation` "teammates") or opponents (`relation` "opponents") of a player.
+
+    The rows of the player's current and past names are merged, and so are the other players' names,
+    so a rename does not split anyone's record.
+
+    **Returns:**
+    - A dictionary `{other player: {'games', 'wins', 'losses', 'win_rate', 'elo_delta'}}`, seen from `name`.
+    """
+    from modules.replay import build_name_resolver  # Imported here, it depends on save_data, which depends on this module
+
+    resolve = build_name_resolver(eloDatabase)
+    current = resolve(name)
+    record = next((player for player in eloDatabase.get('Players', []) if player['PlayerName'] == current), None)
+    own_names = [current] + [past_name for past_name in (record or {}).get('past names', []) if resolve(past_name) == current]
+
+    merged = {}
+    for own_name in own_names:
+        for other_name, (games, wins, elo_delta) in stats.row(own_name)[relation].items():
+            other_name = resolve(other_name)
+            if other_name == current:
+                continue
+            cell = merged.setdefault(other_name, [0, 0, 0])
+            cell[0] += games
+            cell[1] += wins
+            cell[2] += elo_delta
+    return {other_name: {'games': games, 'wins': wins, 'losses': games - wins, 'win_rate': wins / games,
+                         'elo_delta': round(elo_delta, 2)}
+            for other_name, (games, wins, elo_delta) in merged.items()}
+
+
+def ranked_pairs(stats, eloDatabase, name, relation, count=PAIR_STATS_COUNT, min_games=PAIR_STATS_MIN_GAMES):
+    """
+    Returns a player's best and worst partners or opponents: by win rate, then by the rating gained with
+    (or against) them, among those met in at least `min_games` games.
+
+    **Returns:**
+    - `{'best': [...], 'worst': [...]}`, each a list of up to `count` `player_pairs` rows with a `name` key,
+      best first and worst first respectively.
+
+    **Example:**
+
+    ```python
+    for row in ranked_pairs(PairStats(), eloDatabase, "Ann", "teammates")['best']:
+        print(row['name'], row['wins'], row['losses'])
+    ```
+    """
+    rows = [dict(row, name=other_name) for other_name, row in player_pairs(stats, eloDatabase, name, relation).items()
+            if row['games'] >= min_games]
+    rows.sort(key=lambda row: (row['win_rate'], row['elo_delta'], row['games'], row['name']), reverse=True)
+    return {'best': rows[:count], 'worst': rows[::-1][:count]}
+
+
+def compute_pair_stats(eloDatabase, game_results):
+    """
+    Computes the rows of every player from the rated games of the ledger.
+
+    The rating changes are not in the ledger, so the games are rated again the way `replay` does: every
+    player is rewound to before their first game (on a copy of `eloDatabase`), then each game goes through
+    `order_data` -> `calculatePoints` in ledger order.
+
+    **Returns:**
+    - A tuple `(rows, games)`: the player rows by name and the number of games.
+    """
+    from modules.elo_calculation import calculatePoints
+    from modules.extract_data import order_data
+    from modules.replay import build_name_resolver, is_rated_game, rewind_players
+    from modules.save_data import _apply_player_updates
+
+    eloDatabase = copy.deepcopy(eloDatabase)
+    indexes = [index for index, entry in enumerate(game_results) if is_rated_game(entry)]
+    rewind_players(eloDatabase, game_results, indexes, build_name_resolver(eloDatabase))
+
+    rows = {}
+    for index in indexes:
+        updatedDictionary = calculatePoints(order_data(game_results[index]['consensus_data'], eloDatabase))
+        add_game(rows, game_pairs(updatedDictionary))
+        _apply_player_updates(updatedDictionary, eloDatabase)
+    return rows, len(indexes)
+
+
+def rebuild_pair_stats(json_file_path=ELO_JSON_DATABASE_PATH, game_results_path=GAME_RESULTS_JSON_PATH):
+    """
+    Recomputes the statistics of the Elo database at `json_file_path` from the game ledger: on first use,
+    and after `replay` changed the ratings. Games are then added one by one as they are rated.
+
+    **Returns:**
+    - The `PairStats`.
+    """
+    stats = PairStats(pair_stats_folder_for(json_file_path))
+    # Under the Elo database's lock, so no game is rated between reading the ledger and writing the statistics
+    with players_database(json_file_path).exclusive() as (eloDatabase, _):
+        game_results, _ = game_results_database(game_results_path).read()
+        rows, games = compute_pair_stats(eloDatabase, game_results)
+        stats.replace(rows, games)
+    logger.info(f"Computed the head-to-head and teammate statistics of {games} game(s).")
+    return stats
+
+
+def load_pair_stats(json_file_path=ELO_JSON_DATABASE_PATH, game_results_path=GAME_RESULTS_JSON_PATH):
+    """Returns the `PairStats` of the Elo database at `json_file_path`, computing them first if there are none yet."""
+    stats = PairStats(pair_stats_folder_for(json_file_path))
+    if not stats.exists():
+        return rebuild_pair_stats(json_file_path, game_results_path)
+    return stats
+
+
+def update_pair_stats(json_file_path, updatedDictionaries):
+    """
+    Adds games rated by `calculatePoints` to the statistics of the Elo database at `json_file_path`.
+
+    Nothing is written while there are no statistics yet: they are then computed from the whole ledger on
+    first use (see `load_pair_stats`), which includes these games.
+    """
+    stats = PairStats(pair_stats_folder_for(json_file_path))
+    if stats.exists():
+        stats.add_games([game_pairs(updatedDictionary) for updatedDictionary in updatedDictionaries])
+
+
+def log_pair_stats(name, ranked):
+    """Logs the best and worst partners and opponents of `name` (as returned by `ranked_pairs` per relation) as tables."""
+    titles = {('teammates', 'best'): "Best partners", ('teammates', 'worst'): "Worst partners",
+              ('opponents', 'best'): "Easiest opponents", ('opponents', 'worst'): "Toughest opponents"}
+    for relation in RELATIONS:
+        for side in ('best', 'worst'):
+            logger.info(f"{titles[(relation, side)]} of {name}:")
+            logger.info(f"{'Player Name':<20} {'Games':>6} {'Won':>5} {'Lost':>5} {'Win %':>6} {'Elo +/-':>8}")
+            for row in ranked[relation][side]:
+                logger.info(f"{row['name']:<20} {row['games']:>6} {row['wins']:>5} {row['losses']:>5} "
+                            f"{row['win_rate'] * 100:>6.1f} {row['elo_delta']:>+8.1f}")
+            if not ranked[relation][side]:
+                logger.info("(none with enough games)")
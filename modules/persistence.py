@@ -0,0 +1,257 @@
+import json
+import threading
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, FLUSH_EVERY_N_GAMES, FLUSH_INTERVAL_SECONDS
+from modules.database import players_database, game_results_database, pair_stats_folder_for, VersionConflictError
+from modules.metrics import timed
+from modules.pair_stats import PairStats
+
+
+class _TrackedFile:
+    """In-memory copy of one database file, the version it is based on and the mutations not yet committed."""
+
+    def __init__(self, database, data, version):
+        self.database = database
+        self.data = data
+        self.version = version
+        self.pending = []
+
+    def replace_data(self, fresh):
+        # Update in place so references held by the ingest loop stay valid
+        if isinstance(self.data, dict):
+            self.data.clear()
+            self.data.update(fresh)
+        else:
+            self.data[:] = fresh
+
+
+class WriteBehindStore:
+    """
+    Keeps the Elo database and the game results ledger in memory and flushes them to disk in the background.
+
+    Changes are applied with `update_players(mutation)` and `append_game_result(entry)`, rated games are
+    queued for the head-to-head and teammate statistics with `add_pair_stats(teams)`, and `record_game()` is
+    called once a game has been fully applied. A background thread commits both files whenever
+    `flush_every_n_games` games are pending or `flush_interval_seconds` have passed, and `close()` performs a
+    final flush on shutdown.
+
+    Commits go through `Database`, so they are atomic, locked and versioned. If another process (a rename,
+    another ingest worker) committed in the meantime, the pending mutations are replayed on top of the latest
+    data instead of overwriting it. The statistics are written after the ratings, by adding the pending games
+    to the rows of their players (see `PairStats.add_games`).
+
+    **Example:**
+
+    ```python
+    store = WriteBehindStore.open()
+    store.start()
+    try:
+        ...  # process games, e.g. prepareData(updatedPlayerDictionary, store.elo_database, store=store)
+    finally:
+        store.close()
+    ```
+    """
+
+    def __init__(self, elo_database, game_results, elo_database_path=ELO_JSON_DATABASE_PATH,
+                 game_results_path=GAME_RESULTS_JSON_PATH, flush_every_n_games=FLUSH_EVERY_N_GAMES,
+                 flush_interval_seconds=FLUSH_INTERVAL_SECONDS, elo_database_version=0, game_results_version=0):
+        self.elo_database_path = elo_database_path
+        self.game_results_path = game_results_path
+        self.flush_every_n_games = max(1, int(flush_every_n_games))
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._players = _TrackedFile(players_database(elo_database_path), elo_database, elo_database_version)
+        self._games = _TrackedFile(game_results_database(game_results_path), game_results, game_results_version)
+        self._pair_stats = PairStats(pair_stats_folder_for(elo_database_path))
+        self._pending_pair_stats = []
+
+        self.lock = threading.RLock()  # Guards the in-memory data and the pending mutations
+        self._flush_lock = threading.Lock()  # Serializes flushes from the background thread and close()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending_games = 0
+
+    @classmethod
+    def open(cls, elo_database_path=ELO_JSON_DATABASE_PATH, game_results_path=GAME_RESULTS_JSON_PATH, **kwargs):
+        """
+        Loads both files (with their versions) and returns a store based on them. The head-to-head and
+        teammate statistics are computed from the ledger first if there are none yet.
+        """
+        if not PairStats(pair_stats_folder_for(elo_database_path)).exists():
+            from modules.pair_stats import rebuild_pair_stats
+
+            rebuild_pair_stats(elo_database_path, game_results_path)
+        elo_database, elo_version = players_database(elo_database_path).read()
+        game_results, games_version = game_results_database(game_results_path).read()
+        logger.info(f"Elo database loaded from '{elo_database_path}' (version {elo_version})")
+        return cls(elo_database, game_results, elo_database_path, game_results_path,
+                   elo_database_version=elo_version, game_results_version=games_version, **kwargs)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def elo_database(self):
+        return self._players.data
+
+    @property
+    def game_results(self):
+        return self._games.data
+
+    @property
+    def pending_games(self):
+        return self._pending_games
+
+    def start(self):
+        """Starts the background flush thread (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+            self._thread.start()
+
+    def update_players(self, mutation):
+        """
+        Applies `mutation(elo_database)` in memory and keeps it for replay if the next commit conflicts.
+
+        `mutation` may be called again later on a fresher copy of the database, so it must only change
+        the data it is given.
+        """
+        with self.lock:
+            mutation(self._players.data)
+            self._players.pending.append(mutation)
+
+    def add_pair_stats(self, teams):
+        """Queues a rated game (as returned by `game_pairs`) for the head-to-head and teammate statistics."""
+        with self.lock:
+            self._pending_pair_stats.append(teams)
+
+    def append_game_result(self, game_entry):
+        """Appends an entry to the in-memory game results ledger."""
+        with self.lock:
+            self._games.data.append(game_entry)
+            self._games.pending.append(lambda game_results: game_results.append(game_entry))
+
+    def record_game(self):
+        """Counts one fully applied game and wakes the flusher once the batch size is reached."""
+        with self.lock:
+            self._pending_games += 1
+            batch_full = self._pending_games >= self.flush_every_n_games
+        if batch_full:
+            self._wake.set()
+
+    def flush(self):
+        """
+        Commits the in-memory state if anything changed since the last flush.
+
+        The data is serialized while holding `lock` so the snapshot is consistent; the disk writes happen
+        after the lock is released so the ingest loop is not blocked on I/O. Only when another process
+        committed in the meantime is the lock held while the pending mutations are replayed.
+        """
+        with self._flush_lock, timed("flush"):
+            # Write the ledger first so a game is never rated without being recorded
+            with self.lock:
+                flushed_games = self._pending_games
+            committed = self._flush_file(self._games)
+            committed = self._flush_file(self._players) or committed
+            self._flush_pair_stats()
+            with self.lock:
+                self._pending_games -= flushed_games
+
+        if committed:
+            logger.debug(f"Flushed {flushed_games} pending game(s) to '{self.elo_database_path}' and '{self.game_results_path}'.")
+        return committed
+
+    def refresh(self):
+        """
+        Reloads a file that another process committed to since it was loaded or last flushed, so a
+        long-running process sees e.g. renames made with the name management tool. Files with pending
+        updates are left alone: their next flush merges the other process's changes anyway.
+
+        **Returns:**
+        - True if either file was reloaded.
+        """
+        reloaded = False
+        with self._flush_lock:
+            for tracked in (self._games, self._players):
+                with self.lock:
+                    if tracked.pending:
+                        continue
+                    known_version = tracked.version
+                if tracked.database.current_version() == known_version:
+                    continue
+                fresh, version = tracked.database.read()
+                with self.lock:
+                    if not tracked.pending:
+                        tracked.replace_data(fresh)
+                        tracked.version = version
+                        reloaded = True
+        if reloaded:
+            logger.debug(f"Reloaded '{self.elo_database_path}' / '{self.game_results_path}' after a commit by another process.")
+        return reloaded
+
+    def close(self):
+        """Stops the background thread and flushes any remaining updates."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _flush_file(self, tracked):
+        with self.lock:
+            if not tracked.pending:
+                return False
+            payload = json.loads(json.dumps(tracked.data))
+            flushed = len(tracked.pending)
+            base_version = tracked.version
+
+        try:
+            new_version = tracked.database.commit(payload, base_version)
+            with self.lock:
+                tracked.version = new_version
+                del tracked.pending[:flushed]
+            return True
+        except VersionConflictError:
+            logger.info(f"'{tracked.database.path}' was changed by another process, merging pending updates.")
+
+        with self.lock:
+            for _ in range(tracked.database.retries + 1):
+                fresh, version = tracked.database.read()
+                for mutation in tracked.pending:
+                    mutation(fresh)
+                try:
+                    tracked.version = tracked.database.commit(fresh, version)
+                    break
+                except VersionConflictError:
+                    continue
+            else:
+                raise VersionConflictError(f"Could not merge pending updates into '{tracked.database.path}'")
+            tracked.replace_data(fresh)
+            tracked.pending.clear()
+        return True
+
+    def _flush_pair_stats(self):
+        with self.lock:
+            games = list(self._pending_pair_stats)
+        # Without statistics yet, they are computed from the ledger on first use, these games included
+        if games and self._pair_stats.exists():
+            self._pair_stats.add_games(games)
+        with self.lock:
+            del self._pending_pair_stats[:len(games)]
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.flush_interval_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Background flush failed, will retry: {e}")
@@ -0,0 +1,234 @@
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+from statistics import median
+from contextlib import contextmanager
+from datetime import datetime
+from loguru import logger
+
+from configs.app_config import PROFILES_FOLDER, PROFILE_TOP_FUNCTIONS, PROFILE_OUTLIER_FACTOR, PROFILE_OUTLIER_MIN_SECONDS
+from modules.database import atomic_write_bytes
+
+# Stages that measure a person rather than the code: never flagged as outliers
+HUMAN_STAGES = ("user_review",)
+
+_current = None  # The RunProfiler of the running ingest, None while profiling is disabled
+
+
+class RunProfiler:
+    """
+    cProfile traces of one ingest run: one per image and, within each image, one per stage (the stages
+    timed with `modules.metrics.timed`: scoreboard detection, LLM requests, consensus, saves, ...).
+
+    A single profiler is active at a time: entering a stage pauses the profile of the enclosing image
+    (or stage) and resumes it on exit, so each function call is counted in the innermost stage only.
+    Each image gets a folder `<run>/<image>/` with one `<stage>.prof` per stage and `image.prof` with
+    everything, to open with `python -m pstats` or a viewer such as snakeviz. Stages running on other
+    threads (the background flush) are not profiled.
+
+    Profiling slows the code down, so the durations it records are only meaningful relative to each
+    other, e.g. to find the images that are much slower than the others (see `find_outliers`).
+
+    **Example:**
+
+    ```python
+    profiler = RunProfiler("profiles")
+    profiler.start_image("game_1.png")
+    with profiler.stage("detect_scoreboard"):
+        cropped_image = detect_scoreboard(image_path)
+    profiler.end_image()
+    summary = profiler.export()
+    ```
+    """
+
+    def __init__(self, directory=PROFILES_FOLDER, top_functions=PROFILE_TOP_FUNCTIONS,
+                 outlier_factor=PROFILE_OUTLIER_FACTOR, outlier_min_seconds=PROFILE_OUTLIER_MIN_SECONDS):
+        self.started = datetime.now()
+        self.directory = os.path.join(directory, self.started.strftime('%Y%m%d_%H%M%S'))
+        self.top_functions = top_functions
+        self.outlier_factor = outlier_factor
+        self.outlier_min_seconds = outlier_min_seconds
+        self.images = []  # One {'image_file', 'profile_folder', 'stages': {stage: seconds}} per profiled image
+        self._thread = threading.get_ident()
+        self._stack = []  # The profiles of the running image and its open stages, innermost last
+        self._image = None
+        self._image_profile = None  # Code of the running image outside any stage
+        self._stage_profiles = {}
+        self._image_started = None
+        self._run_stats = None
+
+    def _push(self, profile):
+        if self._stack:
+            self._stack[-1].disable()
+        self._stack.append(profile)
+        profile.enable()
+
+    def _pop(self):
+        self._stack.pop().disable()
+        if self._stack:
+            self._stack[-1].enable()
+
+    def start_image(self, image_file):
+        if self._image is not None:
+            self.end_image()
+        self._image = {'image_file': image_file, 'profile_folder': None, 'stages': {}}
+        self._image_profile = cProfile.Profile()
+        self._stage_profiles = {}
+        self._image_started = time.perf_counter()
+        self._push(self._image_profile)
+
+    @contextmanager
+    def stage(self, name):
+        if self._image is None or threading.get_ident() != self._thread:
+            yield
+            return
+        # A stage that runs several times per image (e.g. one LLM request per attempt) adds up in one profile
+        profile = self._stage_profiles.setdefault(name, cProfile.Profile())
+        start = time.perf_counter()
+        self._push(profile)
+        try:
+            yield
+        finally:
+            self._pop()
+            stages = self._image['stages']
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+    def end_image(self):
+        """Stops profiling the running image and writes its profiles."""
+        if self._image is None:
+            return
+        while self._stack:
+            self._pop()
+        image = self._image
+        image['stages']['image'] = time.perf_counter() - self._image_started
+        self._image = None
+
+        folder = os.path.join(self.directory, os.path.splitext(os.path.basename(image['image_file']))[0])
+        os.makedirs(folder, exist_ok=True)
+        for name, profile in self._stage_profiles.items():
+            profile.dump_stats(os.path.join(folder, f"{name}.prof"))
+        image_stats = pstats.Stats()
+        for profile in (self._image_profile, *self._stage_profiles.values()):
+            profile.create_stats()
+            if profile.stats:  # pstats refuses a profile that recorded no call
+                image_stats.add(profile)
+        image_stats.dump_stats(os.path.join(folder, "image.prof"))
+        image['profile_folder'] = folder
+        self.images.append(image)
+
+        if self._run_stats is None:
+            self._run_stats = image_stats
+        else:
+            self._run_stats.add(image_stats)
+        self._image_profile, self._stage_profiles = None, {}
+
+    def hot_functions(self):
+        """
+        Returns the `top_functions` functions of the run with the most time spent in their own code, each as
+        a `{'function', 'calls', 'own_seconds', 'cumulative_seconds'}` dictionary.
+        """
+        if self._run_stats is None:
+            return []
+        self._run_stats.sort_stats("tottime")
+        functions = []
+        for function in self._run_stats.fcn_list[:self.top_functions]:
+            _, calls, own_seconds, cumulative_seconds, _ = self._run_stats.stats[function]
+            functions.append({'function': pstats.func_std_string(function), 'calls': calls,
+                              'own_seconds': own_seconds, 'cumulative_seconds': cumulative_seconds})
+        return functions
+
+    def export(self):
+        """
+        Ends the running image, then writes `run.prof` (every image together), `summary.txt` (the hot
+        functions, as printed by pstats) and `summary.json` (the stage durations of every image, the
+        median of each stage, the outliers and the hot functions) to the run folder, and logs the outliers.
+
+        **Returns:**
+        - The summary written to `summary.json`.
+        """
+        self.end_image()
+        os.makedirs(self.directory, exist_ok=True)
+        outliers, medians = find_outliers(self.images, self.outlier_factor, self.outlier_min_seconds)
+        summary = {
+            'run_started': self.started.isoformat(timespec='seconds'),
+            'profile_folder': self.directory,
+            'outlier_factor': self.outlier_factor,
+            'median_seconds': medians,
+            'outliers': outliers,
+            'hot_functions': self.hot_functions(),
+            'images': self.images,
+        }
+        if self._run_stats is not None:
+            self._run_stats.dump_stats(os.path.join(self.directory, "run.prof"))
+            report = io.StringIO()
+            self._run_stats.stream = report
+            self._run_stats.sort_stats("tottime").print_stats(self.top_functions)
+            atomic_write_bytes(os.path.join(self.directory, "summary.txt"), report.getvalue().encode("utf-8"))
+        atomic_write_bytes(os.path.join(self.directory, "summary.json"), json.dumps(summary, indent=4).encode("utf-8"))
+
+        logger.info(f"Profiled {len(self.images)} image(s), profiles written to '{self.directory}'.")
+        for outlier in outliers:
+            logger.warning(f"Outlier: '{outlier['image_file']}' spent {outlier['seconds']:.2f}s in {outlier['stage']}, "
+                           f"{outlier['ratio']:.1f}x the median ({outlier['median_seconds']:.2f}s)")
+        return summary
+
+
+def find_outliers(images, factor=PROFILE_OUTLIER_FACTOR, min_seconds=PROFILE_OUTLIER_MIN_SECONDS):
+    """
+    Finds the images whose duration of a stage is more than `factor` times the median duration of that
+    stage over the images (the whole image counts as the "image" stage). Durations under `min_seconds`
+    and the stages in `HUMAN_STAGES` are ignored.
+
+    **Parameters:**
+    - `images` (list): `{'image_file', 'stages': {stage: seconds}}` dictionaries, as in `RunProfiler.images`.
+
+    **Returns:**
+    - The outliers, slowest relative to the median first, as `{'image_file', 'stage', 'seconds', 'median_seconds', 'ratio'}`.
+    - The median duration of each stage.
+    """
+    durations = {}
+    for image in images:
+        for stage, seconds in image['stages'].items():
+            durations.setdefault(stage, []).append(seconds)
+    medians = {stage: median(values) for stage, values in sorted(durations.items())}
+
+    outliers = []
+    for image in images:
+        for stage, seconds in image['stages'].items():
+            stage_median = medians[stage]
+            if stage in HUMAN_STAGES or seconds < min_seconds or not stage_median or seconds <= factor * stage_median:
+                continue
+            outliers.append({'image_file': image['image_file'], 'stage': stage, 'seconds': seconds,
+                             'median_seconds': stage_median, 'ratio': seconds / stage_median})
+    outliers.sort(key=lambda outlier: outlier['ratio'], reverse=True)
+    return outliers, medians
+
+
+def enable(directory=PROFILES_FOLDER):
+    """Starts profiling a new run and returns its `RunProfiler`."""
+    global _current
+    _current = RunProfiler(directory)
+    return _current
+
+
+def disable():
+    """Stops profiling and returns the `RunProfiler` of the run, or None if profiling was not enabled."""
+    global _current
+    profiler, _current = _current, None
+    return profiler
+
+
+def start_image(image_file):
+    """Starts the profile of `image_file` in the current run (nothing while profiling is disabled)."""
+    if _current is not None:
+        _current.start_image(image_file)
+
+
+def end_image():
+    """Ends and writes the profile of the running image (nothing while profiling is disabled)."""
+    if _current is not None:
+        _current.end_image()
@@ -0,0 +1,365 @@
+import sys
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit, parse_qs
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, RATING_SERVICE_HOST, RATING_SERVICE_PORT, MATCHMAKING_OBJECTIVE
+from modules.persistence import WriteBehindStore
+from modules.name_index import NameIndex
+from modules.elo_calculation import gamePrediction
+from modules.team_balancer import top_splits
+from modules.lobby_partitioner import partition_lobbies
+from modules.save_data import ingest_game, rating_changes, _find_player_record
+from modules.replay import is_rated_game
+from modules.service_client import RatingServiceError
+from modules.leaderboard import Leaderboard
+
+# Run from root directory with: python -m modules.rating_service [port]
+
+MAX_REQUEST_BYTES = 16 * 1024 * 1024  # Largest request body accepted (a game with its extraction attempts is far smaller)
+
+
+class RatingService:
+    """
+    Keeps the player registry in memory and answers rating queries from it.
+
+    The Elo database and the game results ledger are held by a `WriteBehindStore`, so submitted games are
+    applied in memory and flushed to disk in the background exactly like the ingest loop does. Lookups go
+    through dictionaries and an incrementally sorted `Leaderboard`, so query handlers take microseconds.
+    A submitted game only updates the entries of its players; everything is rebuilt, in a worker thread,
+    only when another process (e.g. the name management tool) committed to the files.
+
+    The handlers only deal with Python values; `serve` exposes them over HTTP.
+
+    **Example:**
+
+    ```python
+    with WriteBehindStore.open() as store:
+        service = RatingService(store)
+        print(service.leaderboard(limit=3))
+        print(service.predict({'Team A': ['Ann', 'Bob'], 'Team B': ['Cid', 'Dee']}))
+    ```
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()  # Matchmaking runs in a worker thread while the event loop applies games
+        self.address = None  # (host, port) once served
+        self._submitted = set()  # Players of the games submitted while a rebuild runs
+        self._install(self._build())
+
+    def _build(self):
+        """Builds every lookup from the database, without touching the current ones (runs in a worker thread)."""
+        players = list(self.store.elo_database.get('Players', []))
+        by_name = {player['PlayerName']: player for player in players}
+        past_name_owners = {}
+        for player in players:
+            for past_name in player.get('past names', []):
+                past_name_owners.setdefault(past_name, []).append(player)
+        return by_name, past_name_owners, Leaderboard.from_database({'Players': players}), NameIndex.from_database({'Players': players})
+
+    def _install(self, lookups):
+        self._by_name, self._past_name_owners, self._leaderboard, self.name_index = lookups
+
+    def _update_players(self, names):
+        """Updates the lookups of the players of a submitted game, instead of rebuilding them all."""
+        for name in names:
+            player = self._by_name.get(name) or _find_player_record(self.store.elo_database, name)  # Scans only for new players
+            if player is None:
+                continue
+            self._by_name[player['PlayerName']] = player
+            for past_name in player.get('past names', []):  # Misread names saved by the game
+                owners = self._past_name_owners.setdefault(past_name, [])
+                if not any(owner is player for owner in owners):
+                    owners.append(player)
+            self._leaderboard.update(player['PlayerName'], player.get('Starting Elo', 1200))
+
+    async def refresh(self):
+        """
+        Picks up commits made by other processes since the last request. The files are reloaded and the
+        lookups rebuilt in a worker thread, so the event loop keeps answering from the current ones.
+        """
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self.store.refresh):
+            return
+        self._submitted.clear()
+        lookups = await loop.run_in_executor(None, self._build)
+        with self.lock:
+            self._install(lookups)
+            # Games submitted during the rebuild may be missing from it
+            self._update_players(self._submitted)
+
+    def find_player(self, name):
+        """Returns the database record of the player called, or previously called, `name` (or None)."""
+        player = self._by_name.get(name)
+        if player is None:
+            # Like find_name: a past name only identifies a player if nobody else uses or used it
+            owners = self._past_name_owners.get(name)
+            player = owners[0] if owners and len(owners) == 1 else None
+        return player
+
+    def rating(self, name):
+        player = self.find_player(name)
+        return player.get('Starting Elo', 1200) if player else 1200  # New players start at 1200, as in order_data
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'players': len(self._by_name),
+            'games': len(self.store.game_results),
+            'pending_games': self.store.pending_games
+        }
+
+    def leaderboard(self, limit=None):
+        """Returns the `limit` highest rated players (all players if `limit` is None)."""
+        top = self._leaderboard.top(None if limit is None else int(limit))
+        return {'players': [self._entry(name, rank) for rank, (name, _) in enumerate(top, start=1)]}
+
+    def _entry(self, name, rank):
+        # The fields of `rank_players`
+        player = self._by_name[name]
+        return {'PlayerName': name, 'Starting Elo': player.get('Starting Elo', 1200), 'games played': player.get('games played', 0),
+                'Games Won': player.get('Games Won', 0), 'Games Lost': player.get('Games Lost', 0), 'Rank': rank}
+
+    def player(self, name):
+        """Returns the full record of a player with their `Rank`."""
+        player = self.find_player(name)
+        if player is None:
+            raise RatingServiceError(f"Player '{name}' not found", status=404)
+        return dict(player, Rank=self._leaderboard.rank(player['PlayerName']))
+
+    def predict(self, teams):
+        """
+        Predicts the outcome of a game between two teams given as `{team name: [player names]}`.
+
+        **Returns:**
+        - `{team name: {'winProbability', 'players': [{'name', 'elo', 'winProbability'}]}}`, as computed by `gamePrediction`.
+        """
+        if not isinstance(teams, dict) or len(teams) != 2:
+            raise RatingServiceError("'teams' must map exactly two team names to lists of player names")
+        playerDictionary = {team_name: {'players': [[name, self.rating(name)] for name in names]}
+                            for team_name, names in teams.items()}
+        if not all(team['players'] for team in playerDictionary.values()):
+            raise RatingServiceError("Both teams need at least one player")
+        prediction = gamePrediction(playerDictionary)
+        return {
+            team_name: {
+                'winProbability': team['winProbability'],
+                'players': [{'name': name, 'elo': elo, 'winProbability': probability} for name, elo, probability in team['players']]
+            }
+            for team_name, team in prediction.items()
+        }
+
+    def matchmake(self, players, k=1, pinned_a=(), pinned_b=(), team_size=None, together=(), apart=()):
+        """
+        Splits the named players into the `k` best pairs of teams (see `top_splits`) or, with a `team_size`,
+        into several lobbies (see `partition_lobbies`). Teams are returned as lists of player names.
+        """
+        if not players or len(set(players)) != len(players):
+            raise RatingServiceError("'players' must be a list of distinct player names")
+        with self.lock:
+            unknown = [name for name in players if self.find_player(name) is None]
+            ratings = [self.rating(name) for name in players]
+        if unknown:
+            raise RatingServiceError(f"Unknown player(s): {', '.join(unknown)}", status=404)
+
+        position = {name: i for i, name in enumerate(players)}
+
+        def indexes(names):
+            missing = [name for name in names if name not in position]
+            if missing:
+                raise RatingServiceError(f"Not in 'players': {', '.join(missing)}")
+            return [position[name] for name in names]
+
+        def named(split):
+            return dict(split, team_a=[players[i] for i in split['team_a']], team_b=[players[i] for i in split['team_b']])
+
+        try:
+            if team_size:
+                result = partition_lobbies(ratings, int(team_size), together=[indexes(group) for group in together],
+                                           apart=[tuple(indexes(pair)) for pair in apart], objective=MATCHMAKING_OBJECTIVE)
+                return dict(result, lobbies=[named(lobby) for lobby in result['lobbies']],
+                            bench=[players[i] for i in result['bench']])
+            if len(players) % 2:
+                raise RatingServiceError("Odd number of players, cannot split evenly into two teams")
+            splits = top_splits(ratings, int(k), indexes(pinned_a), indexes(pinned_b), objective=MATCHMAKING_OBJECTIVE)
+        except ValueError as e:
+            raise RatingServiceError(str(e))
+        return {'splits': [named(split) for split in splits]}
+
+    def submit_game(self, game, user_corrections=None, image_file="", hold=False):
+        """
+        Records and rates a reviewed game (see `modules.save_data.ingest_game`), or with `hold` only
+        records it for review.
+
+        **Returns:**
+        - The `game_id` and every player's rating before and after the game (none for a held game).
+        """
+        if not isinstance(game, dict) or not isinstance(game.get('teams'), dict):
+            raise RatingServiceError("'game' must be a game result with 'teams'")
+        if not hold and not is_rated_game({'consensus_data': game}):
+            raise RatingServiceError("Only games between two teams with victory points can be rated")
+        if not all(isinstance(team.get('players'), list) and all(isinstance(p, dict) and p.get('name') for p in team['players'])
+                   for team in game['teams'].values()):
+            raise RatingServiceError("Every player needs a 'name'")
+
+        with self.lock:
+            game_entry, updatedPlayerDictionary = ingest_game(game, user_corrections or [], image_file or "",
+                                                             self.store.elo_database, self.name_index, store=self.store, hold=bool(hold))
+            if updatedPlayerDictionary is not None:
+                names = [player[0] for team in updatedPlayerDictionary.values() for player in team['players']]
+                self._update_players(names)
+                self._submitted.update(names)
+        return {
+            'game_id': game_entry['game_id'],
+            'status': game_entry.get('status', 'committed'),
+            'players': rating_changes(updatedPlayerDictionary) if updatedPlayerDictionary is not None else []
+        }
+
+
+def _routes(service):
+    """Maps `(method, path)` to a function of `(query, body)`, and whether it runs in a worker thread."""
+    def first(query, key, default=None):
+        return query.get(key, [default])[0]
+
+    return {
+        ("GET", "/health"): (lambda query, body: service.health(), False),
+        ("GET", "/leaderboard"): (lambda query, body: service.leaderboard(first(query, 'limit')), False),
+        ("GET", "/player"): (lambda query, body: service.player(first(query, 'name', '')), False),
+        ("POST", "/predict"): (lambda query, body: service.predict(body.get('teams')), False),
+        # Splitting a large pool can take up to MULTI_LOBBY_TIME_BUDGET_SECONDS: keep the event loop free meanwhile
+        ("POST", "/matchmake"): (lambda query, body: service.matchmake(
+            body.get('players') or [], body.get('k') or 1, body.get('pinned_a') or [], body.get('pinned_b') or [],
+            body.get('team_size'), body.get('together') or [], body.get('apart') or []), True),
+        ("POST", "/games"): (lambda query, body: service.submit_game(
+            body.get('game'), body.get('user_corrections'), body.get('image_file'), body.get('hold', False)), False),
+    }
+
+
+async def handle_request(service, routes, method, target, body):
+    """
+    Runs one request against the service and returns `(status, response)`.
+    """
+    url = urlsplit(target)
+    route = routes.get((method, url.path))
+    if route is None:
+        return 404, {'error': f"No endpoint {method} {url.path}"}
+    handler, blocking = route
+
+    try:
+        payload = json.loads(body) if body else {}
+        if not isinstance(payload, dict):
+            raise RatingServiceError("The request body must be a JSON object")
+        query = parse_qs(url.query)
+        await service.refresh()
+        if blocking:
+            result = await asyncio.get_running_loop().run_in_executor(None, handler, query, payload)
+        else:
+            result = handler(query, payload)
+        return 200, result
+    except json.JSONDecodeError as e:
+        return 400, {'error': f"Invalid JSON: {e}"}
+    except RatingServiceError as e:
+        return e.status, {'error': str(e)}
+    except (TypeError, ValueError) as e:
+        return 400, {'error': str(e)}
+    except Exception as e:
+        logger.exception(f"{method} {url.path} failed")
+        return 500, {'error': f"{type(e).__name__}: {e}"}
+
+
+async def _handle_connection(service, routes, reader, writer):
+    # Minimal HTTP/1.1 with keep-alive: the clients are our own tools, which send Content-Length bodies
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_REQUEST_BYTES:
+                status, response = 413, {'error': f"Request body larger than {MAX_REQUEST_BYTES} bytes"}
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length) if length else b""
+                start = time.perf_counter()
+                status, response = await handle_request(service, routes, method.upper(), target, body)
+                logger.debug(f"{method} {target} -> {status} in {(time.perf_counter() - start) * 1000:.3f} ms")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+            payload = json.dumps(response).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host=RATING_SERVICE_HOST, port=RATING_SERVICE_PORT, ready=None):
+    """
+    Serves `service` over HTTP until cancelled.
+
+    **Endpoints** (JSON in and out):
+    - `GET /health`, `GET /leaderboard?limit=10`, `GET /player?name=Ann`
+    - `POST /predict` with `{"teams": {"Team A": ["Ann", "Bob"], "Team B": ["Cid", "Dee"]}}`
+    - `POST /matchmake` with `{"players": [...], "k": 3, "pinned_a": [...], "pinned_b": [...]}`, or with
+      `"team_size"`, `"together"` and `"apart"` to split the players into several lobbies
+    - `POST /games` with `{"game": {...}, "user_corrections": {...}, "image_file": "...", "hold": false}`
+
+    `ready`, if given, is a `threading.Event` set once the server is listening; `service.address` then
+    holds the bound `(host, port)` (useful with port 0).
+    """
+    routes = _routes(service)
+    server = await asyncio.start_server(lambda reader, writer: _handle_connection(service, routes, reader, writer), host, port)
+    service.address = server.sockets[0].getsockname()[:2]
+    logger.info(f"Rating service listening on http://{service.address[0]}:{service.address[1]} ({len(service.store.elo_database.get('Players', []))} players in memory)")
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def run_service(port=RATING_SERVICE_PORT, host=RATING_SERVICE_HOST):
+    """Loads the database files and serves them until interrupted, flushing pending updates on the way out."""
+    store = WriteBehindStore.open(ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH)
+    store.start()
+    try:
+        asyncio.run(serve(RatingService(store), host, port))
+    except KeyboardInterrupt:
+        logger.info("Rating service stopped.")
+    finally:
+        # Flush any pending updates before exiting
+        store.close()
+
+
+def main():
+    # Configure Loguru
+    logger.remove()
+    logger.add(sys.stdout, level="INFO", colorize=True, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>")
+
+    run_service(int(sys.argv[1]) if len(sys.argv) > 1 else RATING_SERVICE_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from loguru import logger
+
+from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH
+from modules.database import players_database, game_results_database
+from modules.elo_calculation import calculatePoints
+from modules.extract_data import order_data
+from modules.save_data import _apply_player_updates, _find_player_record
+
+
+def build_name_resolver(eloDatabase):
+    """
+    Returns a function mapping a scanned name to the current name of its player.
+
+    Matches `find_name`: current names map to themselves, a past name owned by exactly one player maps to
+    that player, and anything else is returned unchanged. Lookups are O(1), which matters when every
+    entry of the ledger has to be resolved.
+    """
+    current_names = {player['PlayerName'] for player in eloDatabase.get('Players', [])}
+    past_name_owners = {}
+    for player in eloDatabase.get('Players', []):
+        for past_name in player.get('past names', []):
+            past_name_owners.setdefault(past_name, set()).add(player['PlayerName'])
+
+    def resolve(name):
+        if name in current_names:
+            return name
+        owners = past_name_owners.get(name)
+        if owners and len(owners) == 1:
+            return next(iter(owners))
+        return name
+
+    return resolve
+
+
+def is_rated_game(game_entry):
+    """
+    Returns True if the ledger entry is a two-team game with victory points that was rated, i.e. not
+    held or rejected after a headless ingest (see `modules.held_games`).
+    """
+    if game_entry.get('status', 'committed') != 'committed':
+        return False
+    teams = game_entry.get('consensus_data', {}).get('teams', {})
+    return len(teams) == 2 and all(team.get('victory_points') is not None for team in teams.values())
+
+
+def game_outcomes(game_entry, resolve):
+    """
+    Returns `{player name: won}` for a rated ledger entry, using the same rule as `prepareData`:
+    a player wins only if their team scored strictly more victory points.
+    """
+    teams = game_entry['consensus_data']['teams']
+    points = {team_name: team['victory_points'] for team_name, team in teams.items()}
+    outcomes = {}
+    for team_name, team in teams.items():
+        won = all(points[team_name] > other for name, other in points.items() if name != team_name)
+        for player in team.get('players', []):
+            if player.get('name') is not None:
+                outcomes[resolve(player['name'])] = won
+    return outcomes
+
+
+def affected_games(game_results, seed_players, resolve, start_index=0):
+    """
+    Finds the games whose ratings change when the ratings of `seed_players` change.
+
+    Walks the ledger forward from `start_index`: a game that includes an affected player must be
+    replayed, and every player in it becomes affected from then on (their later ratings depend on
+    it). Games before the first affected game, or that never meet an affected player, are skipped.
+
+    **Returns:**
+    - A tuple `(indexes, affected_players)` with the ledger indexes to replay, in order.
+    """
+    affected = set(seed_players)
+    indexes = []
+    for index in range(start_index, len(game_results)):
+        entry = game_results[index]
+        if not is_rated_game(entry):
+            continue
+        players = set(game_outcomes(entry, resolve))
+        if players & affected:
+            indexes.append(index)
+            affected |= players
+    return indexes, affected
+
+
+def rewind_players(eloDatabase, game_results, indexes, resolve):
+    """
+    Removes the effect of the games at `indexes` from every player who took part in them.
+
+    Because every game of an affected player after their first replayed game is itself replayed, the
+    games to remove are always the most recent ones of each player: their Elo History is truncated,
+    their rating reset to the last remaining entry (1200 if none) and their counters decreased.
+    """
+    removed = {}
+    for index in indexes:
+        for name, won in game_outcomes(game_results[index], resolve).items():
+            games, wins = removed.get(name, (0, 0))
+            removed[name] = (games + 1, wins + (1 if won else 0))
+
+    for name, (games, wins) in removed.items():
+        player = _find_player_record(eloDatabase, name)
+        if player is None:
+            continue
+        history = player.get('Elo History', [])
+        player['Elo History'] = history[:max(0, len(history) - games)]
+        player['Starting Elo'] = player['Elo History'][-1] if player['Elo History'] else 1200
+        player['games played'] = max(0, player.get('games played', 0) - games)
+        player['Games Won'] = max(0, player.get('Games Won', 0) - wins)
+        player['Games Lost'] = max(0, player.get('Games Lost', 0) - (games - wins))
+    return removed
+
+
+def replay_games(eloDatabase, game_results, indexes):
+    """
+    Re-rates the games at `indexes` in order against the current state of `eloDatabase`.
+
+    Each game goes through the same `order_data` -> `calculatePoints` -> player update path as the ingest.
+    """
+    for index in indexes:
+        playerDictionary = order_data(game_results[index]['consensus_data'], eloDatabase)
+        updatedPlayerDictionary = calculatePoints(playerDictionary)
+        _apply_player_updates(updatedPlayerDictionary, eloDatabase)
+    logger.info(f"Replayed {len(indexes)} of {len(game_results)} game(s).")
+    return eloDatabase
+
+
+def replay_from(eloDatabase, game_results, seed_players, resolve=None, start_index=0):
+    """
+    Recomputes the ratings affected by a change to `seed_players`, replaying only the games that depend on them.
+
+    **Returns:**
+    - The list of replayed ledger indexes.
+    """
+    resolve = resolve or build_name_resolver(eloDatabase)
+    indexes, _ = affected_games(game_results, seed_players, resolve, start_index)
+    rewind_players(eloDatabase, game_results, indexes, resolve)
+    replay_games(eloDatabase, game_results, indexes)
+    return indexes
+
+
+def rebuild_ratings(json_file_path=ELO_JSON_DATABASE_PATH, game_results_path=GAME_RESULTS_JSON_PATH, players=None, start_index=0):
+    """
+    Recomputes ratings from the game ledger, e.g. after a game was corrected by hand in the ledger.
+
+    Replays every game from `start_index` on, or, if `players` are given, only the games that depend on
+    them (see `replay_from`). The Elo database is updated under its exclusive lock, so concurrent
+    ingests wait instead of committing in between.
+
+    **Returns:**
+    - The list of replayed ledger indexes.
+    """
+    game_results, _ = game_results_database(game_results_path).read()
+    with players_database(json_file_path).exclusive() as (eloDatabase, commit_players):
+        resolve = build_name_resolver(eloDatabase)
+        if players:
+            seed_players = {resolve(name) for name in players}
+        else:
+            seed_players = {name for entry in game_results[start_index:] if is_rated_game(entry)
+                            for name in game_outcomes(entry, resolve)}
+        indexes = replay_from(eloDatabase, game_results, seed_players, resolve, start_index)
+        commit_players(eloDatabase)
+    return indexes
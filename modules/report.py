@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import html
+import hashlib
+from datetime import datetime
+from loguru import logger
+
+from configs.app_config import (ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, CROPPED_SCOREBOARDS_FOLDER, REPORT_FOLDER,
+                                REPORT_RECENT_GAMES, REPORT_THUMBNAIL_WIDTH)
+from modules.database import players_database, game_results_database, atomic_write_bytes, atomic_write_json
+from modules.leaderboard_snapshot import rank_players
+from modules.replay import build_name_resolver, is_rated_game
+
+# Bump when the pages change, so the next publish re-renders every page instead of only the changed ones
+REPORT_LAYOUT_VERSION = 1
+STATE_FILE = "report_state.json"
+
+STYLE = """
+body { font-family: system-ui, sans-serif; margin: 2em auto; max-width: 960px; color: #222; }
+nav a { margin-right: 1em; }
+table { border-collapse: collapse; width: 100%; margin: 1em 0; }
+th, td { padding: 4px 8px; border-bottom: 1px solid #ddd; text-align: left; }
+td.number, th.number { text-align: right; }
+.game { border: 1px solid #ddd; border-radius: 6px; padding: 1em; margin: 1em 0; display: flex; gap: 1em; }
+.game img { max-width: 320px; height: auto; }
+.winner { font-weight: bold; }
+.muted { color: #888; }
+svg .curve { fill: none; stroke: #b33; stroke-width: 2; }
+svg .axis { stroke: #999; stroke-width: 1; }
+svg text { font-size: 11px; fill: #555; }
+"""
+
+
+def player_page(name):
+    """Returns the file name of a player's page: a readable slug plus a hash, so any name gets a distinct, safe file."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-").lower()[:40] or "player"
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}.html"
+
+
+def player_signature(player):
+    """Returns a digest of everything a player's page shows from their record: the page is re-rendered when it changes."""
+    return hashlib.sha1(json.dumps(player, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def rating_chart_svg(history, width=640, height=200, margin=36):
+    """
+    Draws a rating history (one rating per game) as an inline SVG line chart, with the lowest and
+    highest rating on the vertical axis and the number of games on the horizontal one.
+    """
+    if not history:
+        return '<p class="muted">No rated games yet.</p>'
+    low, high = min(history), max(history)
+    span = (high - low) or 1
+    step = (width - 2 * margin) / max(len(history) - 1, 1)
+    points = " ".join(f"{margin + i * step:.1f},{height - margin - (elo - low) / span * (height - 2 * margin):.1f}"
+                      for i, elo in enumerate(history))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<line class="axis" x1="{margin}" y1="{height - margin}" x2="{width - margin}" y2="{height - margin}"/>'
+            f'<line class="axis" x1="{margin}" y1="{margin}" x2="{margin}" y2="{height - margin}"/>'
+            f'<text x="2" y="{margin + 4}">{high:g}</text><text x="2" y="{height - margin + 4}">{low:g}</text>'
+            f'<text x="{width - margin}" y="{height - margin + 16}" text-anchor="end">{len(history)} games</text>'
+            f'<polyline class="curve" points="{points}"/></svg>')
+
+
+def _page(title, body, depth=0):
+    prefix = "../" * depth
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<link rel="stylesheet" href="{prefix}style.css"></head><body>'
+            f'<nav><a href="{prefix}index.html">Leaderboard</a><a href="{prefix}games.html">Recent games</a></nav>'
+            f'<h1>{html.escape(title)}</h1>{body}'
+            f'<p class="muted">Generated {datetime.now().strftime("%Y-%m-%d %H:%M")}</p></body></html>\n')
+
+
+def _player_link(name, resolve, known, depth=0):
+    current = resolve(name)
+    if current not in known:
+        return html.escape(name)
+    return f'<a href="{"../" * depth}players/{player_page(current)}">{html.escape(name)}</a>'
+
+
+def _team_tables(game_entry, resolve, known, depth=0):
+    consensus_data = game_entry['consensus_data']
+    tables = []
+    for team_name, team in consensus_data.get('teams', {}).items():
+        css = ' class="winner"' if team_name == consensus_data.get('winner') else ''
+        rows = "".join(f'<tr><td>{_player_link(player["name"], resolve, known, depth)}</td>'
+                       f'<td class="number">{html.escape(str(player.get("score")))}</td></tr>'
+                       for player in team.get('players', []))
+        tables.append(f'<table><tr><th{css}>{html.escape(team_name)}</th>'
+                      f'<th class="number">{html.escape(str(team.get("victory_points")))} VP</th></tr>{rows}</table>')
+    return "".join(tables)
+
+
+def thumbnail(image_file, output_folder, cropped_folder=CROPPED_SCOREBOARDS_FOLDER, width=REPORT_THUMBNAIL_WIDTH):
+    """
+    Returns the path (relative to the report) of the thumbnail of a game's cropped scoreboard, creating it
+    the first time, or None if the scoreboard was not kept (see `detect_scoreboard`).
+    """
+    stem = os.path.splitext(image_file)[0]
+    relative_path = f"thumbnails/{stem}.jpg"
+    path = os.path.join(output_folder, relative_path)
+    if os.path.exists(path):
+        return relative_path
+    source = os.path.join(cropped_folder, f"{stem}_upscaled.png")
+    if not os.path.exists(source):
+        return None
+
+    from PIL import Image  # Only needed for the games that have no thumbnail yet
+
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        image.thumbnail((width, width))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(path, format="JPEG", quality=80)
+    return relative_path
+
+
+def render_player(player, games):
+    """
+    Renders a player's page: their record, their rating curve and their games, newest first.
+
+    **Parameters:**
+    - `games` (list): `(game_entry, team_name)` of every rated game of the player, in ledger order.
+    """
+    history = player.get('Elo History', [])
+    past_names = ", ".join(html.escape(name) for name in player.get('past names', [])) or "none"
+    rows = []
+    for game_entry, team_name in reversed(games):
+        consensus_data = game_entry['consensus_data']
+        result = "Won" if team_name == consensus_data.get('winner') else "Lost"
+        opponents = ", ".join(name for name in consensus_data['teams'] if name != team_name)
+        rows.append(f'<tr><td>{html.escape(game_entry.get("date", ""))} {html.escape(game_entry.get("time", "")[:5])}</td>'
+                    f'<td>{html.escape(team_name)}</td><td>{html.escape(opponents)}</td><td>{result}</td></tr>')
+    body = (f'<p>Rating <b>{player.get("Starting Elo", 1200):g}</b> (peak {max(history, default=player.get("Starting Elo", 1200)):g}) · '
+            f'{player.get("games played", 0)} games · {player.get("Games Won", 0)} won · {player.get("Games Lost", 0)} lost · '
+            f'past names: {past_names}</p>'
+            f'{rating_chart_svg(history)}'
+            f'<h2>Games</h2><table><tr><th>Date</th><th>Team</th><th>Against</th><th>Result</th></tr>{"".join(rows)}</table>')
+    return _page(player['PlayerName'], body, depth=1)
+
+
+def render_leaderboard(eloDatabase, resolve, known):
+    rows = "".join(f'<tr><td class="number">{player["Rank"]}</td><td>{_player_link(player["PlayerName"], resolve, known)}</td>'
+                   f'<td class="number">{player["Starting Elo"]:g}</td><td class="number">{player["games played"]}</td>'
+                   f'<td class="number">{player["Games Won"]}</td><td class="number">{player["Games Lost"]}</td></tr>'
+                   for player in rank_players(eloDatabase))
+    body = ('<table><tr><th class="number">Rank</th><th>Player</th><th class="number">Rating</th>'
+            f'<th class="number">Games</th><th class="number">W</th><th class="number">L</th></tr>{rows}</table>')
+    return _page("Leaderboard", body)
+
+
+def render_recent_games(games, resolve, known, output_folder, cropped_folder):
+    blocks = []
+    for game_entry in reversed(games):
+        image = thumbnail(game_entry.get('image_file', ""), output_folder, cropped_folder)
+        picture = f'<img src="{html.escape(image, quote=True)}" alt="{html.escape(game_entry["image_file"])}">' if image else '<p class="muted">No scoreboard image</p>'
+        blocks.append(f'<div class="game"><div>{picture}</div><div><h3>{html.escape(game_entry.get("date", ""))} '
+                      f'{html.escape(game_entry.get("time", "")[:5])}</h3>{_team_tables(game_entry, resolve, known)}</div></div>')
+    return _page("Recent games", "".join(blocks))
+
+
+def publish_report(output_folder=REPORT_FOLDER, json_file_path=ELO_JSON_DATABASE_PATH, game_results_path=GAME_RESULTS_JSON_PATH,
+                   cropped_folder=CROPPED_SCOREBOARDS_FOLDER, recent_games=REPORT_RECENT_GAMES, full=False):
+    """
+    Publishes the static report: `index.html` (the leaderboard), `games.html` (the most recent rated games
+    with thumbnails of their scoreboards) and one page per player under `players/` with their rating curve
+    and games.
+
+    The report is incremental: the digest of every player's record is kept in `report_state.json`, and only
+    the pages of the players whose record changed since the last publish (those who played the new games,
+    or whose ratings a replay changed) are rendered again, as are the two summary pages. Thumbnails are only
+    created once. A rename or removed player re-renders everything, since other pages link to them.
+
+    **Returns:**
+    - `{'players_rendered', 'players_removed', 'players', 'games'}`: the names of the re-rendered and removed
+      player pages and the number of players and rated games.
+    """
+    eloDatabase, _ = players_database(json_file_path).read()
+    game_results, _ = game_results_database(game_results_path).read()
+    state_path = os.path.join(output_folder, STATE_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    if state.get('layout_version') != REPORT_LAYOUT_VERSION:
+        full = True
+
+    players = {player['PlayerName']: player for player in eloDatabase.get('Players', [])}
+    signatures = {name: player_signature(player) for name, player in players.items()}
+    previous = state.get('players', {})
+    removed = sorted(set(previous) - set(signatures))
+    if removed:
+        full = True  # Renamed or removed players are linked from other players' pages
+    changed = [name for name in signatures if full or previous.get(name) != signatures[name]]
+
+    resolve = build_name_resolver(eloDatabase)
+    rated_games = [entry for entry in game_results if is_rated_game(entry)]
+    games_of = {name: [] for name in changed}
+    for game_entry in rated_games:
+        for team_name, team in game_entry['consensus_data']['teams'].items():
+            for player in team.get('players', []):
+                name = resolve(player['name'])
+                if name in games_of:
+                    games_of[name].append((game_entry, team_name))
+
+    players_folder = os.path.join(output_folder, "players")
+    os.makedirs(players_folder, exist_ok=True)
+    for name in changed:
+        page = render_player(players[name], games_of[name])
+        atomic_write_bytes(os.path.join(players_folder, player_page(name)), page.encode("utf-8"))
+    for name in removed:
+        path = os.path.join(players_folder, player_page(name))
+        if os.path.exists(path):
+            os.remove(path)
+
+    atomic_write_bytes(os.path.join(output_folder, "style.css"), STYLE.encode("utf-8"))
+    atomic_write_bytes(os.path.join(output_folder, "index.html"), render_leaderboard(eloDatabase, resolve, players).encode("utf-8"))
+    recent = rated_games[-recent_games:] if recent_games else []
+    atomic_write_bytes(os.path.join(output_folder, "games.html"),
+                       render_recent_games(recent, resolve, players, output_folder, cropped_folder).encode("utf-8"))
+    atomic_write_json(state_path, {'layout_version': REPORT_LAYOUT_VERSION, 'players': signatures})
+
+    logger.info(f"Published the report to '{output_folder}': {len(changed)} of {len(players)} player page(s) rendered, "
+                f"{len(removed)} removed, {len(rated_games)} rated game(s).")
+    return {'players_rendered': changed, 'players_removed': removed, 'players': len(players), 'games': len(rated_games)}
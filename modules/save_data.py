@@ -1,79 +1,151 @@
-import pandas as pd
 import json
 import os
 import json
 from datetime import datetime  
 from loguru import logger
 from configs.app_config import ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH
-
-def prepareData(updatedDictionary, eloDatabase):
+from modules.database import players_database, game_results_database
+from modules.attempt_deltas import store_attempts
+from modules.elo_calculation import calculatePoints
+from modules.extract_data import order_data
+from modules.metrics import timed
+from modules.pair_stats import game_pairs, update_pair_stats
+
+def prepareData(updatedDictionary, eloDatabase, store=None, leaderboard=None):
     """
     Updates the eloDatabase dictionary with the new Elo ratings and game counts
     from the updatedDictionary.
+
+    If a `WriteBehindStore` is passed as `store`, the update is applied in memory and left for
+    the store's background thread to commit. Otherwise it is committed to the database file
+    immediately through `Database`, on top of whatever other processes have written.
+    A `Leaderboard` passed as `leaderboard` is moved along with the new ratings. The game is also
+    added to the head-to-head and teammate statistics (see `modules.pair_stats`).
+    """
+    def apply_updates(database):
+        _apply_player_updates(updatedDictionary, database)
+
+    if store is not None:
+        store.update_players(apply_updates)
+        store.add_pair_stats(game_pairs(updatedDictionary))
+        store.record_game()
+    else:
+        # Save updated database to JSON file, and the statistics under the same lock (as `rebuild_pair_stats`
+        # does), so a rebuild can not run in between and miss or double count the game
+        with players_database(ELO_JSON_DATABASE_PATH).exclusive() as (committed, commit_players):
+            apply_updates(committed)
+            commit_players(committed)
+            update_pair_stats(ELO_JSON_DATABASE_PATH, [updatedDictionary])
+        eloDatabase.clear()
+        eloDatabase.update(committed)
+
+    if leaderboard is not None:
+        leaderboard.update_from_game(updatedDictionary)
+
+    return eloDatabase
+
+def _find_player_record(eloDatabase, playerName):
+    """
+    Returns the database record for playerName, following past names if the player was renamed in the meantime.
     """
+    player_data = next((p for p in eloDatabase["Players"] if p["PlayerName"] == playerName), None)
+    if player_data is None:
+        renamed = [p for p in eloDatabase["Players"] if playerName in p.get("past names", [])]
+        if len(renamed) == 1:
+            player_data = renamed[0]
+    return player_data
+
+def _apply_player_updates(updatedDictionary, eloDatabase):
+    """
+    Applies the outcome of one rated game to eloDatabase (in memory only).
+
+    Ratings are applied as the change computed by calculatePoints rather than as absolute values,
+    so replaying the update on a database that another process has modified in the meantime
+    (see `WriteBehindStore`) keeps both sets of changes.
+    """
+    team_points = {team_name: team_data.get('Points') or 0 for team_name, team_data in updatedDictionary.items()}
+
     # After processing the data, the Elo database is updated
     for team_name in updatedDictionary.keys():
-        
+        # calculatePoints counts a win only for the team with strictly more points
+        other_points = [points for name, points in team_points.items() if name != team_name]
+        gameWon = 1 if other_points and team_points[team_name] > max(other_points) else 0
+
         players = updatedDictionary[team_name]['players']
         for player in players:
             playerName = player[0]
-            newPlayerElo = player[6]
-            gamesPlayed = player[2] + 1  # Increment games played 
-            gamesWon = player[3]
-            gamesLost = player[4]
-
-            if eloDatabase != []:
-                # Check if the player exists in the eloDatabase
-                player_data = next((p for p in eloDatabase["Players"] if p["PlayerName"] == playerName), None)
-
-                if player_data:
-                    # Update Elo and games played for existing player
-                    player_data['Starting Elo'] = newPlayerElo
-                    player_data['games played'] = gamesPlayed
-                    player_data['Games Won'] = gamesWon
-                    player_data['Games Lost'] = gamesLost
-
-
-                    # Append new Elo to Elo History
-                    player_data['Elo History'].append(newPlayerElo)
-            
-                else:
-                    # Add new player to the database
-                    new_player_data = {
-                        'PlayerName': playerName,
-                        'Starting Elo': newPlayerElo,
-                        'games played': gamesPlayed,
-                        'past names': [],  # Or handle if you need specific logic for past names
-                        'Elo History': [newPlayerElo],  # Initialize Elo History with the first Elo value
-                        'Games Won':  gamesWon,  
-                        'Games Lost': gamesLost
-                    }
-                    eloDatabase["Players"].append(new_player_data)
-                    logger.info(f"Added new player to database: {playerName}")
+            eloChange = player[6] - player[1]
+
+            # Check if the player exists in the eloDatabase
+            player_data = _find_player_record(eloDatabase, playerName)
+
+            if player_data:
+                # Update Elo and games played for existing player
+                player_data['Starting Elo'] = player_data.get('Starting Elo', player[1]) + eloChange
+                player_data['games played'] = player_data.get('games played', 0) + 1
+                player_data['Games Won'] = player_data.get('Games Won', 0) + gameWon
+                player_data['Games Lost'] = player_data.get('Games Lost', 0) + (1 - gameWon)
+
+                # Append new Elo to Elo History
+                player_data.setdefault('Elo History', []).append(player_data['Starting Elo'])
             else:
+                # Add new player to the database
+                newPlayerElo = player[6]
                 new_player_data = {
                     'PlayerName': playerName,
                     'Starting Elo': newPlayerElo,
-                    'games played': gamesPlayed,
+                    'games played': player[2] + 1,  # Increment games played
                     'past names': [],  # Or handle if you need specific logic for past names
                     'Elo History': [newPlayerElo],  # Initialize Elo History with the first Elo value
-                    'Games Won':  gamesWon,  
-                    'Games Lost': gamesLost  
-                    }
-                
+                    'Games Won':  gameWon,
+                    'Games Lost': 1 - gameWon
+                }
                 eloDatabase["Players"].append(new_player_data)
                 logger.info(f"Added new player to database: {playerName}")
 
+def register_aliases(aliases, eloDatabase, store=None):
+    """
+    Adds scanned names that were auto-mapped to a player (see `modules.name_index.resolve_name`) to that
+    player's past names, so the mapping is exact from then on and replaying the game ledger resolves the
+    names the same way the ingest did.
 
-    # Save updated database to JSON file
-    with open(ELO_JSON_DATABASE_PATH, "w") as file:
-        json.dump(eloDatabase, file, indent=4)
-
+    **Parameters:**
+    - `aliases` (dict): Maps each scanned name to the current name of its player.
+    """
+    aliases = dict(aliases)  # The store may replay the mutation after the caller reuses its dictionary
+
+    def add_aliases(database):
+        current_names = {p["PlayerName"] for p in database["Players"]}
+        for scanned_name, player_name in aliases.items():
+            player_data = _find_player_record(database, player_name)
+            if player_data is None or scanned_name in current_names:
+                continue
+            past_names = player_data.setdefault("past names", [])
+            if scanned_name not in past_names:
+                past_names.append(scanned_name)
+
+    if not aliases:
+        return eloDatabase
+    if store is not None:
+        store.update_players(add_aliases)
+    else:
+        committed, _ = players_database(ELO_JSON_DATABASE_PATH).update(add_aliases)
+        eloDatabase.clear()
+        eloDatabase.update(committed)
     return eloDatabase
 
-def process_and_save_game_data(game_result_dictionary, user_corrections, image_file):
+def process_and_save_game_data(game_result_dictionary, user_corrections, image_file, store=None, status=None):
     """
     Processes the game data and saves it into a JSON file.
+
+    The per-attempt extraction data is not stored verbatim: `store_attempts` encodes it as
+    diffs against the consensus result, inline or in a compressed side-file.
+
+    A `status` other than None (e.g. "held" for a game recorded by a headless ingest without being
+    rated) is stored in the entry; entries without one are rated games.
+
+    If a `WriteBehindStore` is passed as `store`, the entry is appended to its in-memory ledger
+    and committed by the store's next flush instead of rewriting the file here.
     """
 
     """""
@@ -81,36 +153,87 @@ def process_and_save_game_data(game_result_dictionary, user_corrections, image_f
     """""
     # Prepare game entry data
     current_time = datetime.now()
+    consensus_data = {k: v for k, v in game_result_dictionary.items() if k not in ('attempts_data', 'llm_usage')}
     game_entry = {
         "game_id": current_time.isoformat(timespec='milliseconds'),
         "date": current_time.strftime('%Y-%m-%d'),
         "time": current_time.strftime('%H:%M:%S.%f')[:-3],  # up to milliseconds
         "image_file": os.path.basename(image_file),
-        "consensus_data": game_result_dictionary,
+        "consensus_data": consensus_data,
         "user_corrections": user_corrections
     }
+    if status is not None:
+        game_entry["status"] = status
+    if game_result_dictionary.get('llm_usage'):
+        game_entry["llm_usage"] = game_result_dictionary['llm_usage']  # Token, byte and latency accounting (see modules/llm_usage.py)
 
-    # Load existing game data
-    if os.path.exists(GAME_RESULTS_JSON_PATH):
-        try:
-            with open(GAME_RESULTS_JSON_PATH, 'r') as file:
-                game_results = json.load(file)
-        except json.JSONDecodeError:
-            logger.error("Error: 'GAME_RESULTS_JSON_PATH' is corrupted. Overwriting file.")
-            game_results = []
-    else:
-        game_results = []
+    # Store the raw extraction attempts as diffs against the consensus (see ATTEMPTS_STORAGE in app_config.py)
+    store_attempts(game_entry, game_result_dictionary.get('attempts_data'))
 
-    # Append new game entry
-    game_results.append(game_entry)
+    if store is not None:
+        store.append_game_result(game_entry)
+        logger.info(f"Game result queued for '{store.game_results_path}'.")
+        return game_entry
 
-    # Save updated game data
+    # Append new game entry and save updated game data
     try:
-        with open(GAME_RESULTS_JSON_PATH, 'w') as file:
-            json.dump(game_results, file, indent=2)
+        game_results_database(GAME_RESULTS_JSON_PATH).update(lambda game_results: game_results.append(game_entry))
         logger.info(f"Game results saved to '{GAME_RESULTS_JSON_PATH}'.")
     except IOError as e:
         logger.error(f"Failed to save game results: {e}")
 
+    return game_entry
 
 
+def ingest_game(game_result_dictionary, user_corrections, image_file, eloDatabase, name_index=None, store=None, hold=False, leaderboard=None):
+    """
+    Records a reviewed game in the ledger and rates it: every step of the ingest after the user corrections.
+
+    Used by the ingest loop and by the rating service (see `modules.rating_service`), so a game submitted
+    to the service is rated exactly like one ingested locally. With `hold`, the game is only recorded,
+    with the status "held", and is rated once it is reviewed (see `modules.held_games`).
+
+    **Parameters:**
+    - `game_result_dictionary` (dict): The corrected game result (`teams`, `winner`, optionally `attempts_data`).
+    - `user_corrections` (list): The corrections made during review.
+    - `image_file` (str): The image the game was read from.
+    - `eloDatabase` (dict): The Elo database to rate against (the store's in-memory copy when `store` is given).
+    - `name_index` (NameIndex): Optional fuzzy index used to catch misread names (see `order_data`).
+    - `leaderboard` (Leaderboard): Optional leaderboard kept in order with the new ratings (see `modules.leaderboard`).
+
+    **Returns:**
+    - A tuple `(game_entry, updatedPlayerDictionary)` with the ledger entry and the rated players
+      (None for a held game).
+    """
+    if hold:
+        with timed("save_game"):
+            game_entry = process_and_save_game_data(game_result_dictionary, user_corrections, image_file, store=store, status="held")
+        if store is not None:
+            store.record_game()
+        return game_entry, None
+
+    # Process and save game data (queues the game result data for the next flush)
+    with timed("save_game"):
+        game_entry = process_and_save_game_data(game_result_dictionary, user_corrections, image_file, store=store)
+
+    # Order and calculate points (orders the game result data and calculates the ELO points for each player)
+    with timed("rate_game"):
+        playerDictionary = order_data(game_result_dictionary, eloDatabase, name_index)
+        updatedPlayerDictionary = calculatePoints(playerDictionary)
+
+    # Prepare and save updated Elo database (queues the updated Elo database for the next flush)
+    with timed("save_players"):
+        eloDatabase = prepareData(updatedPlayerDictionary, eloDatabase, store=store, leaderboard=leaderboard)
+
+    # Save misread names that were matched to a known player as past names of that player
+    if name_index is not None:
+        register_aliases(name_index.auto_mapped, eloDatabase, store=store)
+        name_index.auto_mapped.clear()
+
+    return game_entry, updatedPlayerDictionary
+
+
+def rating_changes(updatedPlayerDictionary):
+    """Returns every player's team and rating before and after a game rated by `calculatePoints`."""
+    return [{'name': player[0], 'team': team_name, 'elo_before': player[1], 'elo_after': player[6]}
+            for team_name, team in updatedPlayerDictionary.items() for player in team['players']]
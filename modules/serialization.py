@@ -0,0 +1,110 @@
+import json
+
+# Optional dependencies, only needed for the corresponding DATABASE_FORMAT:
+#   pip install msgpack zstandard
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class JsonSerializer:
+    """
+    Plain JSON. `indent=None` writes compact JSON (no whitespace); any other value pretty-prints it.
+    """
+
+    def __init__(self, indent=None):
+        self.name = "json" if indent is None else "json-pretty"
+        self.indent = indent
+
+    def dumps(self, data):
+        if self.indent is None:
+            return json.dumps(data, separators=(",", ":")).encode("utf-8")
+        return json.dumps(data, indent=self.indent).encode("utf-8")
+
+    def loads(self, payload):
+        return json.loads(payload)
+
+
+class MsgpackSerializer:
+    """
+    MessagePack: a binary encoding of the same data, smaller and faster to parse than JSON.
+    """
+
+    name = "msgpack"
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError("DATABASE_FORMAT 'msgpack' requires the 'msgpack' package (pip install msgpack)")
+        self._msgpack = msgpack
+
+    def dumps(self, data):
+        return self._msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, payload):
+        return self._msgpack.unpackb(payload, raw=False)
+
+
+class ZstdSerializer:
+    """
+    A zstd-compressed snapshot of another format (MessagePack if installed, otherwise compact JSON).
+    """
+
+    name = "zstd"
+
+    def __init__(self, level=3):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("DATABASE_FORMAT 'zstd' requires the 'zstandard' package (pip install zstandard)")
+        self._zstd = zstandard
+        self.level = level
+        try:
+            self.inner = MsgpackSerializer()
+        except ImportError:
+            self.inner = JsonSerializer()
+
+    def dumps(self, data):
+        return self._zstd.ZstdCompressor(level=self.level).compress(self.inner.dumps(data))
+
+    def loads(self, payload):
+        return loads_auto(self._zstd.ZstdDecompressor().decompress(payload))
+
+
+def get_serializer(name):
+    """
+    Returns the serializer for a DATABASE_FORMAT value: "json", "json-pretty", "msgpack" or "zstd".
+    """
+    if name == "json":
+        return JsonSerializer()
+    if name == "json-pretty":
+        return JsonSerializer(indent=4)
+    if name == "msgpack":
+        return MsgpackSerializer()
+    if name == "zstd":
+        return ZstdSerializer()
+    raise ValueError(f"Unknown database format '{name}' (expected json, json-pretty, msgpack or zstd)")
+
+
+def detect_format(payload):
+    """
+    Guesses the format of a serialized database from its first bytes.
+
+    **Returns:**
+    - "zstd", "msgpack" or "json".
+    """
+    if payload.startswith(ZSTD_MAGIC):
+        return "zstd"
+    first = payload.lstrip()[:1]
+    if first in (b"{", b"["):
+        return "json"
+    if first and (0x80 <= first[0] <= 0x9f or first[0] in (0xdc, 0xdd, 0xde, 0xdf)):
+        return "msgpack"
+    return "json"
+
+
+def loads_auto(payload):
+    """
+    Deserializes a database snapshot in any supported format, detecting the format automatically.
+    """
+    return get_serializer(detect_format(payload)).loads(payload)
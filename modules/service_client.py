@@ -0,0 +1,137 @@
+import json
+import socket
+import http.client
+from urllib.parse import urlencode
+from loguru import logger
+
+from configs.app_config import RATING_SERVICE_HOST, RATING_SERVICE_PORT, RATING_SERVICE_TIMEOUT_SECONDS
+
+
+class RatingServiceError(Exception):
+    """Raised when the rating service rejects a request; `status` is the HTTP status code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceUnavailable(Exception):
+    """Raised when the rating service can not be reached."""
+
+
+class RatingServiceClient:
+    """
+    Client for the local rating service (see `modules.rating_service`).
+
+    Keeps one HTTP connection open, so each request costs a round trip on the loopback interface
+    instead of loading the database files. Only uses the standard library, so tools that talk to the
+    service start quickly.
+
+    **Example:**
+
+    ```python
+    client = connect_to_service()
+    if client is not None:
+        for player in client.leaderboard(10):
+            print(player['Rank'], player['PlayerName'], player['Starting Elo'])
+    ```
+    """
+
+    def __init__(self, host=RATING_SERVICE_HOST, port=RATING_SERVICE_PORT, timeout=RATING_SERVICE_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection = None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def request(self, method, path, payload=None, **query):
+        """
+        Sends one request and returns the decoded JSON response.
+
+        **Raises:**
+        - `ServiceUnavailable` if the service can not be reached.
+        - `RatingServiceError` if the service answered with an error.
+        """
+        query = {key: value for key, value in query.items() if value is not None}
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        # A kept-alive connection may have been closed by the service in the meantime: retry once on a new
+        # one. Other failures are not retried, the service may already have recorded a submitted game.
+        for attempt in range(2):
+            reused = self._connection is not None
+            if not reused:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._connection.request(method, path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                status, raw = response.status, response.read()
+                break
+            except (ConnectionError, socket.timeout, http.client.HTTPException, OSError) as e:
+                self.close()
+                if not (reused and isinstance(e, (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError))):
+                    raise ServiceUnavailable(f"Rating service at {self.host}:{self.port} is not reachable: {e}") from e
+
+        result = json.loads(raw) if raw else None
+        if status >= 400:
+            message = result.get('error') if isinstance(result, dict) else None
+            raise RatingServiceError(message or f"HTTP {status}", status)
+        return result
+
+    def health(self):
+        return self.request("GET", "/health")
+
+    def leaderboard(self, limit=None):
+        """Returns the players sorted by rating, as dictionaries with `Rank`, `PlayerName`, `Starting Elo`, ..."""
+        return self.request("GET", "/leaderboard", limit=limit)['players']
+
+    def player(self, name):
+        """Returns the record of the player called (or previously called) `name`."""
+        return self.request("GET", "/player", name=name)
+
+    def predict(self, teams):
+        """Predicts a game between `teams` (`{team name: [player names]}`), like `gamePrediction`."""
+        return self.request("POST", "/predict", {'teams': teams})
+
+    def matchmake(self, players, k=1, pinned_a=(), pinned_b=(), team_size=None, together=(), apart=()):
+        """
+        Splits `players` (names) into teams, like `top_splits` or, with a `team_size`, `partition_lobbies`.
+        Teams in the result are lists of player names.
+        """
+        payload = {'players': list(players), 'k': k, 'pinned_a': list(pinned_a), 'pinned_b': list(pinned_b),
+                   'team_size': team_size, 'together': [list(group) for group in together],
+                   'apart': [list(pair) for pair in apart]}
+        return self.request("POST", "/matchmake", payload)
+
+    def submit_game(self, game_result_dictionary, user_corrections=None, image_file="", hold=False):
+        """Records and rates a reviewed game, or with `hold` only records it (see `modules.save_data.ingest_game`)."""
+        payload = {'game': game_result_dictionary, 'user_corrections': user_corrections or [], 'image_file': image_file, 'hold': hold}
+        return self.request("POST", "/games", payload)
+
+
+def connect_to_service(host=RATING_SERVICE_HOST, port=RATING_SERVICE_PORT, timeout=RATING_SERVICE_TIMEOUT_SECONDS):
+    """
+    Returns a `RatingServiceClient` if the rating service is running, or None, in which case the
+    caller works on the database files directly.
+    """
+    probe = RatingServiceClient(host, port, timeout=1.0)  # Short timeout: tools must not hang when it is not running
+    try:
+        probe.health()
+    except (ServiceUnavailable, RatingServiceError, ValueError):
+        return None
+    finally:
+        probe.close()
+    logger.debug(f"Using the rating service at {host}:{port}")
+    return RatingServiceClient(host, port, timeout)
@@ -0,0 +1,261 @@
+import os
+import sys
+import math
+import random
+import argparse
+from datetime import date, datetime, timedelta
+from loguru import logger
+
+from modules.database import players_database, game_results_database, atomic_write_json
+from modules.elo_calculation import calculatePoints
+from modules.extract_data import order_data
+from modules.save_data import _apply_player_updates
+
+# Run from root directory with: python -m modules.synthetic_league --players 500 --games 5000 --seed 1 --output league
+# (add --render 20 to also draw the scoreboards of the last 20 games, with their expected results)
+
+FACTION_PAIRS = [
+    ("USA", "Wehrmacht"), ("Soviet army", "Wehrmacht"), ("Commonwealth", "Wehrmacht"), ("USA", "Imperial Japan"),
+    ("Guards Army", "Kampfgruppe Ost"), ("Commonwealth", "Waffen-SS"), ("ALLIES", "AXIS"), ("Team A", "Team B"),
+]
+NAME_PREFIXES = ["Shadow", "Iron", "Red", "Ghost", "Panzer", "Storm", "Lone", "Silent", "Grim", "Frost",
+                 "Steel", "Night", "Wolf", "Eagle", "Tank", "Sniper", "Dusty", "Major", "Lucky", "Crazy"]
+NAME_SUFFIXES = ["Falcon", "Wolf", "Hunter", "Rider", "Bear", "Fox", "Viper", "Hawk", "Dog", "Ace",
+                 "Jack", "Sarge", "Gunner", "Medic", "Scout", "Raven", "Tiger", "Moose", "Pilot", "Boots"]
+# Characters an OCR or a language model typically confuses on these scoreboards
+MISREADS = {'O': '0', '0': 'O', 'l': '1', '1': 'l', 'I': 'l', 'S': '5', '5': 'S', 'B': '8', 'e': 'c', 'rn': 'm'}
+
+
+class SyntheticLeague:
+    """
+    A reproducible league: players with a latent skill, their rating history and the game ledger.
+
+    Games are generated in order and rated as they are generated, through the same `order_data` ->
+    `calculatePoints` -> player update path as the ingest, so the ratings in `elo_database` are what this
+    project would compute from `game_results` (replaying the ledger gives the same result). Along the way:
+
+    - players play with a frequency that follows a heavy-tailed distribution (a few regulars, many occasional players);
+    - the stronger team (by mean latent skill) wins with a logistic probability;
+    - scanned names are sometimes misread (the alias is then saved as a past name, like a confirmed auto-mapping);
+    - players sometimes rename themselves (the old name becomes a past name, like `change_player_name`).
+
+    **Example:**
+
+    ```python
+    league = SyntheticLeague(num_players=200, seed=1)
+    league.play(1000)
+    league.write("league")  # league/players_data.json and league/game_results.json
+    ```
+    """
+
+    def __init__(self, num_players, seed=0, min_team_size=2, max_team_size=8, alias_rate=0.02, rename_rate=0.002,
+                 start_date=date(2023, 1, 6), skill_spread=1.5):
+        self.rng = random.Random(seed)
+        self.min_team_size = min_team_size
+        self.max_team_size = min(max_team_size, num_players // 2)
+        self.alias_rate = alias_rate
+        self.rename_rate = rename_rate
+        self.skill_spread = skill_spread
+        self.used_names = set()
+        self.players = [{'name': self._new_name(), 'skill': self.rng.gauss(0, 1), 'activity': self.rng.paretovariate(1.2)}
+                        for _ in range(num_players)]
+        self.elo_database = {'Players': []}
+        self.game_results = []
+        self.renames = []  # (game index, old name, new name)
+        self._night = start_date
+        self._night_games = 0
+
+    def _new_name(self):
+        while True:
+            name = self.rng.choice(NAME_PREFIXES) + self.rng.choice(NAME_SUFFIXES)
+            if self.rng.random() < 0.5:
+                name += str(self.rng.randint(1, 999))
+            if name not in self.used_names:
+                self.used_names.add(name)
+                return name
+
+    def _misread(self, name):
+        candidates = [(index, key) for key in MISREADS for index in range(len(name)) if name.startswith(key, index)]
+        if not candidates:
+            return None
+        index, key = self.rng.choice(candidates)
+        alias = name[:index] + MISREADS[key] + name[index + len(key):]
+        return alias if alias not in self.used_names else None
+
+    def _record(self, name):
+        return next((record for record in self.elo_database['Players'] if record['PlayerName'] == name), None)
+
+    def _scanned_name(self, player):
+        """The name as read from the scoreboard: usually right, sometimes one of its misreads."""
+        if self.rng.random() >= self.alias_rate:
+            return player['name']
+        alias = self._misread(player['name'])
+        record = self._record(player['name'])
+        if alias is None or record is None:
+            return player['name']
+        self.used_names.add(alias)
+        record.setdefault('past names', []).append(alias)  # Saved when the misread was matched to the player
+        return alias
+
+    def _next_timestamp(self):
+        if self._night_games >= self.rng.randint(3, 8):
+            self._night += timedelta(days=self.rng.choice((2, 3, 4, 7)))
+            self._night_games = 0
+        played = datetime.combine(self._night, datetime.min.time()) + timedelta(hours=19, minutes=50 * self._night_games,
+                                                                               seconds=self.rng.randint(0, 59))
+        self._night_games += 1
+        return played
+
+    def _pick_players(self, count):
+        """Draws `count` different players, regulars more often than occasional players."""
+        chosen, pool = [], list(self.players)
+        for _ in range(count):
+            total = sum(player['activity'] for player in pool)
+            pick = self.rng.random() * total
+            for index, player in enumerate(pool):
+                pick -= player['activity']
+                if pick <= 0:
+                    break
+            chosen.append(pool.pop(index))
+        return chosen
+
+    def _team_result(self, players):
+        return [{'name': self._scanned_name(player), 'score': max(0, round(self.rng.gauss(300 + 120 * player['skill'], 90)))}
+                for player in players]
+
+    def play_game(self):
+        """Generates, records and rates one game; returns its ledger entry."""
+        team_size = self.rng.randint(self.min_team_size, self.max_team_size)
+        players = self._pick_players(2 * team_size)
+        team_a, team_b = players[:team_size], players[team_size:]
+        advantage = sum(player['skill'] for player in team_a) / team_size - sum(player['skill'] for player in team_b) / team_size
+        a_wins = self.rng.random() < 1 / (1 + math.exp(-self.skill_spread * advantage))
+
+        winner_points = self.rng.randint(100, 500)
+        loser_points = round(winner_points * self.rng.uniform(0.05, 0.9))
+        names = self.rng.choice(FACTION_PAIRS)
+        teams = {}
+        for team_name, team_players, points in ((names[0], team_a, winner_points if a_wins else loser_points),
+                                                (names[1], team_b, loser_points if a_wins else winner_points)):
+            results = sorted(self._team_result(team_players), key=lambda player: player['score'], reverse=True)
+            teams[team_name] = {'victory_points': points, 'players': results}
+        consensus_data = {'teams': teams, 'winner': names[0] if a_wins else names[1]}
+
+        played = self._next_timestamp()
+        game_entry = {
+            "game_id": played.isoformat(timespec='milliseconds'),
+            "date": played.strftime('%Y-%m-%d'),
+            "time": played.strftime('%H:%M:%S.%f')[:-3],
+            "image_file": f"{played.strftime('%Y%m%d%H%M%S')}_1.png",
+            "consensus_data": consensus_data,
+            "user_corrections": {}
+        }
+        self.game_results.append(game_entry)
+
+        updatedPlayerDictionary = calculatePoints(order_data(consensus_data, self.elo_database))
+        _apply_player_updates(updatedPlayerDictionary, self.elo_database)
+
+        if self.rng.random() < self.rename_rate:
+            self.rename(self.rng.choice(players))
+        return game_entry
+
+    def rename(self, player):
+        """Gives `player` a new name; the old one becomes a past name, like `change_player_name`."""
+        old_name, new_name = player['name'], self._new_name()
+        player['name'] = new_name
+        record = self._record(old_name)
+        if record is not None:
+            record['PlayerName'] = new_name
+            record.setdefault('past names', []).append(old_name)
+        self.renames.append((len(self.game_results), old_name, new_name))
+
+    def play(self, num_games):
+        for index in range(num_games):
+            self.play_game()
+            if (index + 1) % 1000 == 0:
+                logger.info(f"Generated {index + 1} of {num_games} games.")
+        return self
+
+    def write(self, directory):
+        """Writes `players_data.json` and `game_results.json` to `directory` and returns their paths."""
+        os.makedirs(directory, exist_ok=True)
+        players_path = os.path.join(directory, "players_data.json")
+        game_results_path = os.path.join(directory, "game_results.json")
+        for path, database, data in ((game_results_path, game_results_database(game_results_path), self.game_results),
+                                     (players_path, players_database(players_path), self.elo_database)):
+            database.commit(data, database.current_version())
+        return players_path, game_results_path
+
+    def render(self, directory, count):
+        """
+        Draws the scoreboards of the last `count` games into `directory/images` and writes the correct results
+        to `directory/expected_results`, in the layout of `test_image_sets` (see benchmarks/bench_accuracy.py).
+        """
+        for game_entry in self.game_results[-count:]:
+            stem = os.path.splitext(game_entry['image_file'])[0]
+            render_scoreboard(game_entry['consensus_data'], os.path.join(directory, "images", game_entry['image_file']))
+            os.makedirs(os.path.join(directory, "expected_results"), exist_ok=True)
+            atomic_write_json(os.path.join(directory, "expected_results", f"{stem}.json"), game_entry['consensus_data'], indent=4)
+
+
+def render_scoreboard(consensus_data, path, size=(1920, 1080)):
+    """
+    Draws a game result like an end-of-game screenshot: a light scoreboard panel, with one section per team
+    (team name, total score, victory points, then one row per player), on a dark background.
+    """
+    from PIL import Image, ImageDraw, ImageFont  # Only needed when rendering
+
+    def font(points):
+        try:
+            return ImageFont.load_default(size=points)
+        except TypeError:  # Pillow < 10.1 has a single bitmap font
+            return ImageFont.load_default()
+
+    width, height = size
+    image = Image.new("RGB", size, (28, 30, 26))
+    draw = ImageDraw.Draw(image)
+    left, top, right, bottom = int(width * 0.15), int(height * 0.12), int(width * 0.85), int(height * 0.88)
+    draw.rectangle((left, top, right, bottom), fill=(214, 210, 196))
+
+    title, row = font(30), font(24)
+    columns = (left + 40, right - 420, right - 200)
+    y = top + 25
+    for header, x in zip(("Player", "Score", "Victory P."), columns):
+        draw.text((x, y), header, fill=(40, 40, 40), font=title)
+    for team_name, team in consensus_data['teams'].items():
+        y += 55
+        total = sum(player['score'] or 0 for player in team['players'])
+        for text, x in zip((team_name, str(total), str(team['victory_points'])), columns):
+            draw.text((x, y), text, fill=(90, 20, 20), font=title)
+        for player in team['players']:
+            y += 34
+            draw.text((columns[0] + 30, y), player['name'], fill=(20, 20, 20), font=row)
+            draw.text((columns[1], y), str(player['score']), fill=(20, 20, 20), font=row)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    image.save(path, format="PNG")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic league for load testing")
+    parser.add_argument("--players", type=int, default=500, help="Number of players (default: 500)")
+    parser.add_argument("--games", type=int, default=5000, help="Number of games (default: 5000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same league")
+    parser.add_argument("--output", default="synthetic_league", help="Directory to write the league to")
+    parser.add_argument("--render", type=int, default=0, metavar="N", help="Also draw the scoreboards of the last N games")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stdout, level="INFO", colorize=True, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>")
+
+    league = SyntheticLeague(args.players, seed=args.seed)
+    league.play(args.games)
+    players_path, game_results_path = league.write(args.output)
+    if args.render:
+        league.render(args.output, args.render)
+    logger.info(f"Wrote {len(league.elo_database['Players'])} players to '{players_path}' and {len(league.game_results)} games "
+                f"to '{game_results_path}' ({len(league.renames)} renames).")
+
+
+if __name__ == "__main__":
+    main()
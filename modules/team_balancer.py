@@ -0,0 +1,568 @@
+import math
+import heapq
+import bisect
+from math import comb
+from itertools import combinations, islice
+
+import numpy as np
+from loguru import logger
+
+# Solvers that split a lobby into two teams of equal size whose rating totals are as close as possible.
+#
+# - "dp": exact. Dynamic programming over (team size, rating total), with the reachable totals of each
+#   team size kept as the bits of one Python integer, so adding a player is one shift-and-or per size.
+#   Needs integer ratings (Elo ratings always are) and is used while the bitsets stay small.
+# - "mitm": exact. Meet in the middle: enumerates the subsets of each half of the lobby and matches them
+#   with a binary search. Works with fractional ratings, up to MITM_MAX_PLAYERS players.
+# - "kk": heuristic. Balanced Karmarkar-Karp differencing followed by a swap-based local search. Near
+#   optimal (usually a difference of 0 or 1 for real lobbies) for any number of players.
+#
+# With an even number of players every solver keeps player 0 on team A, so each split is only
+# considered once rather than twice.
+#
+# With the "win_probability" objective, splits are instead ranked by how close team A's predicted win
+# probability is to 50%, using the same model as `gamePrediction` (see `split_win_probabilities`).
+
+MITM_MAX_PLAYERS = 32
+DP_MAX_WORK = 2 ** 28  # Upper bound on the bits shifted (and kept for the walk back) by the DP
+PROBABILITY_EXHAUSTIVE_MAX_SPLITS = 200_000  # Lobbies with more splits than this use a local search
+PROBABILITY_BATCH_SIZE = 16_384  # Splits evaluated per matrix product
+RANDOM_CHANCE_FACTOR = 1000  # Same as `rcf` in `playerProbability`
+
+
+def balance_teams(ratings, method="auto", objective="rating_sum"):
+    """
+    Splits players into two teams of equal size (team A gets the smaller half if the count is odd)
+    minimizing the difference of their rating totals.
+
+    **Parameters:**
+    - `ratings` (list of numbers): The rating of each player.
+    - `method` (str): "dp", "mitm", "kk" or "auto" (the fastest exact solver that applies, else "kk").
+    - `objective` (str): "rating_sum", or "win_probability" to pick the split whose predicted outcome is
+      closest to 50/50 instead (see `balance_by_win_probability`; `method` is then ignored).
+
+    **Returns:**
+    - A dictionary with the player indexes of `team_a` and `team_b`, their rating `difference`
+      (team A total minus team B total), team A's predicted `win_probability` and the `method` used.
+
+    **Example:**
+
+    ```python
+    split = balance_teams([1500, 1320, 1275, 1210, 1190, 1100])
+    print(split)
+    # Output:
+    # {'team_a': [0, 4, 5], 'team_b': [1, 2, 3], 'difference': -15, 'win_probability': 0.4963, 'method': 'dp'}
+    ```
+    """
+    if objective == "win_probability":
+        return balance_by_win_probability(ratings)
+    if objective != "rating_sum":
+        raise ValueError(f"Unknown matchmaking objective '{objective}', expected 'rating_sum' or 'win_probability'")
+    if method == "auto":
+        method = _pick_method(ratings)
+    solvers = {"dp": _solve_dp, "mitm": _solve_mitm, "kk": _solve_kk}
+    if method not in solvers:
+        raise ValueError(f"Unknown balancing method '{method}', expected one of {', '.join(solvers)}")
+
+    team_a = solvers[method](ratings) if ratings else []
+    return _describe_split(ratings, team_a, method)
+
+
+def _describe_split(ratings, team_a, method, probabilities=None):
+    team_a = sorted(team_a)
+    in_team_a = set(team_a)
+    team_b = [i for i in range(len(ratings)) if i not in in_team_a]
+    difference = sum(ratings[i] for i in team_a) - sum(ratings[i] for i in team_b)
+    if probabilities is None:
+        probabilities = win_probability_matrix(ratings)
+    mask = np.zeros((1, len(ratings)))
+    mask[0, team_a] = 1
+    win_probability = round(float(split_win_probabilities(probabilities, mask)[0]), 4) if team_a and team_b else 0.5
+    logger.debug(f"Balanced {len(ratings)} players with '{method}': difference {difference}, win probability {win_probability}")
+    return {'team_a': team_a, 'team_b': team_b, 'difference': difference, 'win_probability': win_probability, 'method': method}
+
+
+def win_probability_matrix(ratings):
+    """
+    Returns the matrix `P` where `P[i, j]` is the probability of player i beating player j.
+
+    Matches `playerProbability(ratings[j], ratings[i])` entry for entry, including its rounding to 4 places.
+    """
+    ratings = np.asarray(ratings, dtype=float)
+    return np.round(1 / (1 + np.power(10.0, (ratings[None, :] - ratings[:, None]) / RANDOM_CHANCE_FACTOR)), 4)
+
+
+def split_win_probabilities(probabilities, masks):
+    """
+    Evaluates many candidate splits at once.
+
+    Team A's win probability is the mean of `P[i, j]` over every pair of a team A player i and a team B
+    player j, as in `gamePrediction`. For all splits together that is one matrix product.
+
+    **Parameters:**
+    - `probabilities` (ndarray): The output of `win_probability_matrix`.
+    - `masks` (ndarray): One row per split, with 1 for the players on team A and 0 for team B.
+
+    **Returns:**
+    - An array with team A's win probability for each split.
+    """
+    masks = np.asarray(masks, dtype=float)
+    others = 1 - masks
+    pair_totals = np.einsum('kj,kj->k', masks @ probabilities, others)
+    return pair_totals / (masks.sum(axis=1) * others.sum(axis=1))
+
+
+def balance_by_win_probability(ratings):
+    """
+    Finds the split whose predicted team A win probability is closest to 0.5.
+
+    Lobbies with up to PROBABILITY_EXHAUSTIVE_MAX_SPLITS possible splits are evaluated exhaustively in
+    batches. Larger lobbies start from the best rating-sum split and apply the best single swap between
+    the teams until none brings the prediction closer to 0.5; the effect of every possible swap is
+    computed at once from per-player row and column totals, so each step costs O(n^2).
+
+    **Returns:**
+    - The same dictionary as `balance_teams`, with `method` "exhaustive" or "swap search".
+    """
+    n = len(ratings)
+    size = n // 2
+    probabilities = win_probability_matrix(ratings)
+    if size == 0:
+        return _describe_split(ratings, [], "exhaustive", probabilities)
+
+    if _split_count(n) <= PROBABILITY_EXHAUSTIVE_MAX_SPLITS:
+        best_team = _exhaustive_probability_splits(probabilities, 1)[0]
+        return _describe_split(ratings, best_team, "exhaustive", probabilities)
+
+    team_a = balance_teams(ratings)['team_a']
+    return _describe_split(ratings, _improve_probability_by_swaps(probabilities, team_a), "swap search", probabilities)
+
+
+def _split_count(n, pinned_a=(), pinned_b=()):
+    """Returns the number of distinct splits of n players with the given players pinned to each team."""
+    free = n - len(pinned_a) - len(pinned_b)
+    if not pinned_a and not pinned_b and n % 2 == 0 and n:
+        return comb(n - 1, n // 2 - 1)
+    return comb(free, n // 2 - len(pinned_a)) if 0 <= n // 2 - len(pinned_a) <= free else 0
+
+
+def _exhaustive_probability_splits(probabilities, k, pinned_a=(), pinned_b=()):
+    """
+    Evaluates every split (in batches of PROBABILITY_BATCH_SIZE) and returns the team A of the `k` whose
+    predicted win probability is closest to 0.5, best first.
+    """
+    n = len(probabilities)
+    size = n // 2
+    pinned = set(pinned_a) | set(pinned_b)
+    if not pinned and n % 2 == 0:
+        pinned_a, pinned = (0,), {0}  # Teams are interchangeable: fix player 0 on team A
+    free = [i for i in range(n) if i not in pinned]
+    candidates = (tuple(pinned_a) + rest for rest in combinations(free, size - len(pinned_a)))
+
+    best_gaps, best_teams = np.empty(0), np.empty((0, size), dtype=np.intp)
+    while True:
+        batch = np.array(list(islice(candidates, PROBABILITY_BATCH_SIZE)), dtype=np.intp).reshape(-1, size)
+        if not len(batch):
+            break
+        masks = np.zeros((len(batch), n))
+        masks[np.arange(len(batch))[:, None], batch] = 1
+        gaps = np.abs(split_win_probabilities(probabilities, masks) - 0.5)
+        best_gaps = np.concatenate([best_gaps, gaps])
+        best_teams = np.concatenate([best_teams, batch])
+        if len(best_gaps) > k:
+            keep = np.argpartition(best_gaps, k - 1)[:k]
+            best_gaps, best_teams = best_gaps[keep], best_teams[keep]
+    order = np.argsort(best_gaps, kind="stable")
+    return [best_teams[i].tolist() for i in order]
+
+
+def _improve_probability_by_swaps(probabilities, team_a, max_passes=200, locked=()):
+    n = len(probabilities)
+    in_a = np.zeros(n, dtype=bool)
+    in_a[team_a] = True
+    movable = np.ones(n, dtype=bool)
+    movable[list(locked)] = False
+    pairs = in_a.sum() * (n - in_a.sum())
+    for _ in range(max_passes):
+        a, b = np.flatnonzero(in_a), np.flatnonzero(~in_a)
+        total = probabilities[np.ix_(a, b)].sum()
+        row_b = probabilities[:, ~in_a].sum(axis=1)  # P[i, B] for every player i
+        column_a = probabilities[in_a, :].sum(axis=0)  # P[A, j] for every player j
+        diagonal = np.diag(probabilities)
+        # Swapping a and b: remove a's row over B and b's column over A (P[a, b] was in both), then add
+        # b's row over B without b, a's column over A without a, and the new pair (b, a)
+        new_total = (total - row_b[a][:, None] - column_a[b][None, :] + probabilities[np.ix_(a, b)]
+                     + (row_b[b] - diagonal[b])[None, :] + (column_a[a] - diagonal[a])[:, None]
+                     + probabilities[np.ix_(b, a)].T)
+        gaps = np.abs(new_total / pairs - 0.5)
+        gaps[~movable[a], :] = np.inf  # Pinned players never move
+        gaps[:, ~movable[b]] = np.inf
+        best = np.unravel_index(int(np.argmin(gaps)), gaps.shape)
+        if gaps[best] >= abs(total / pairs - 0.5) - 1e-12:
+            break
+        in_a[a[best[0]]], in_a[b[best[1]]] = False, True
+    return np.flatnonzero(in_a).tolist()
+
+
+def _pick_method(ratings):
+    n = len(ratings)
+    if n and all(float(r).is_integer() for r in ratings):
+        rating_range = int(max(ratings)) - int(min(ratings)) + 1
+        if n * (n // 2) * (n // 2) * rating_range <= DP_MAX_WORK:
+            return "dp"
+    if n <= MITM_MAX_PLAYERS:
+        return "mitm"
+    return "kk"
+
+
+def _solve_dp(ratings):
+    """
+    Exact solver for integer ratings.
+
+    Ratings are shifted so the lowest is 0 (every team has the same size, so this does not change which
+    split is best). `reachable[c]` has bit `s` set if some `c` players seen so far total `s`; the layers
+    are kept per player to walk back from the best total to the players that make it up.
+    """
+    n = len(ratings)
+    size = n // 2
+    if size == 0:
+        return []
+    lowest = min(int(r) for r in ratings)
+    values = [int(r) - lowest for r in ratings]
+    # With an even count the teams are interchangeable, so player 0 is fixed on team A
+    fixed = n % 2 == 0
+
+    reachable = [0] * (size + 1)
+    reachable[0] = 0 if fixed else 1
+    reachable[1] = 1 << values[0]
+    layers = [reachable]
+    for i in range(1, n):
+        value = values[i]
+        reachable = list(reachable)
+        for count in range(min(i, size - 1), -1, -1):
+            if reachable[count]:
+                reachable[count + 1] |= reachable[count] << value
+        layers.append(reachable)
+
+    # Best total: the reachable total closest to the ideal one, on either side. In shifted ratings the
+    # ideal total of team A is (overall total - 2 * lowest * size) / 2; `ideal2` is twice that.
+    sums = layers[-1][size]
+    ideal2 = sum(int(r) for r in ratings) - 2 * lowest * size
+    half = ideal2 // 2
+    below = sums & ((1 << (half + 1)) - 1) if half >= 0 else 0
+    above = sums >> (half + 1) if half >= 0 else sums
+    start = half + 1 if half >= 0 else 0
+    candidates = []
+    if below:
+        candidates.append(below.bit_length() - 1)
+    if above:
+        candidates.append(start + ((above & -above).bit_length() - 1))
+    best = min(candidates, key=lambda total: (abs(2 * total - ideal2), total))
+
+    # Walk back through the layers: a player is on team A if the total is not reachable without them
+    team_a = []
+    count, target = size, best
+    for i in range(n - 1, 0, -1):
+        if count and not (layers[i - 1][count] >> target) & 1:
+            team_a.append(i)
+            count -= 1
+            target -= values[i]
+    if count:
+        team_a.append(0)
+    return team_a
+
+
+def _subset_sums(indexes, ratings):
+    """Returns `{count: [(total, mask), ...]}` for every subset of `indexes` (masks use positions in `indexes`)."""
+    by_count = {0: [(0, 0)]}
+    for position, index in enumerate(indexes):
+        bit = 1 << position
+        for count in sorted(by_count, reverse=True):
+            by_count.setdefault(count + 1, []).extend((total + ratings[index], mask | bit) for total, mask in by_count[count])
+    return by_count
+
+
+def _solve_mitm(ratings):
+    """Exact solver for any ratings: pairs subsets of the two halves of the lobby by binary search."""
+    n = len(ratings)
+    size = n // 2
+    if size == 0:
+        return []
+    total = sum(ratings)
+    # With an even count player 0 is fixed on team A and left out of the enumeration
+    fixed = n % 2 == 0
+    base_total, base_count = (ratings[0], 1) if fixed else (0, 0)
+    left = list(range(1 if fixed else 0, n // 2))
+    right = list(range(n // 2, n))
+    left_sums = _subset_sums(left, ratings)
+    right_sums = {count: sorted(entries) for count, entries in _subset_sums(right, ratings).items()}
+
+    best = None
+    for left_count, left_entries in left_sums.items():
+        right_entries = right_sums.get(size - base_count - left_count)
+        if not right_entries:
+            continue
+        right_totals = [entry[0] for entry in right_entries]
+        for left_total, left_mask in left_entries:
+            # The ideal right total brings team A to exactly half of the overall total
+            ideal = total / 2 - base_total - left_total
+            position = bisect.bisect_left(right_totals, ideal)
+            for candidate in (position - 1, position):
+                if 0 <= candidate < len(right_entries):
+                    right_total, right_mask = right_entries[candidate]
+                    gap = abs(total - 2 * (base_total + left_total + right_total))
+                    if best is None or gap < best[0]:
+                        best = (gap, left_mask, right_mask)
+                        if gap == 0:
+                            break
+
+    _, left_mask, right_mask = best
+    team_a = [0] if fixed else []
+    team_a += [index for position, index in enumerate(left) if left_mask >> position & 1]
+    team_a += [index for position, index in enumerate(right) if right_mask >> position & 1]
+    return team_a
+
+
+def _solve_kk(ratings, max_passes=50):
+    """
+    Heuristic solver for large lobbies.
+
+    Balanced Karmarkar-Karp: players sorted by rating are paired off (one of each pair per team), then
+    the two partial splits with the largest differences are repeatedly combined so that their
+    differences cancel out. Pairwise swaps between the teams then improve the result until no swap helps.
+    """
+    n = len(ratings)
+    if n < 2:
+        return []
+    order = sorted(range(n), key=lambda i: ratings[i], reverse=True)
+
+    # Each heap entry is a partial split: (-difference, tie breaker, higher side, lower side)
+    heap = []
+    for k in range(0, n - 1, 2):
+        high, low = order[k], order[k + 1]
+        heapq.heappush(heap, (-(ratings[high] - ratings[low]), k, [high], [low]))
+    if n % 2:
+        # The odd player goes to team B; team A is the smaller half
+        heapq.heappush(heap, (-ratings[order[-1]], n, [], [order[-1]]))
+    while len(heap) > 1:
+        difference_1, key, high_1, low_1 = heapq.heappop(heap)
+        difference_2, _, high_2, low_2 = heapq.heappop(heap)
+        # Put the larger side of one split with the smaller side of the other
+        heapq.heappush(heap, (difference_1 - difference_2, key, high_1 + low_2, low_1 + high_2))
+    _, _, high, low = heap[0]
+    team_a, team_b = sorted((high, low), key=len)
+    team_a, team_b = _improve_by_swaps(ratings, team_a, team_b, max_passes)
+    return team_b if len(team_a) == len(team_b) and 0 in team_b else team_a
+
+
+def _improve_by_swaps(ratings, team_a, team_b, max_passes=50):
+    """
+    Local search: repeatedly applies the single swap between the teams that reduces the difference the most.
+
+    Team B is kept sorted by rating, so the best partner for each team A player is found by binary search.
+    """
+    team_a, team_b = list(team_a), list(team_b)
+    difference = sum(ratings[i] for i in team_a) - sum(ratings[i] for i in team_b)
+    for _ in range(max_passes):
+        if difference == 0:
+            break
+        team_b.sort(key=lambda i: ratings[i])
+        b_ratings = [ratings[i] for i in team_b]
+        best = None
+        for a_position, a in enumerate(team_a):
+            # Swapping a and b changes the difference by 2 * (rating[b] - rating[a]); aim for -difference
+            ideal = ratings[a] - difference / 2
+            position = bisect.bisect_left(b_ratings, ideal)
+            for b_position in (position - 1, position):
+                if 0 <= b_position < len(team_b):
+                    new_difference = difference + 2 * (b_ratings[b_position] - ratings[a])
+                    if abs(new_difference) < abs(difference) and (best is None or abs(new_difference) < abs(best[0])):
+                        best = (new_difference, a_position, b_position)
+        if best is None:
+            break
+        difference, a_position, b_position = best
+        team_a[a_position], team_b[b_position] = team_b[b_position], team_a[a_position]
+    return team_a, team_b
+
+
+def top_splits(ratings, k=5, pinned_a=(), pinned_b=(), objective="rating_sum"):
+    """
+    Returns the `k` best distinct splits, best first, optionally with players pinned to a team.
+
+    For the "rating_sum" objective this is a branch and bound over the players sorted by rating,
+    assigning one player per level. A branch is dropped as soon as a lower bound on its final
+    difference can not beat the k-th best split found so far, and the more promising branch is
+    explored first, so only a tiny fraction of the C(n, n/2) splits is ever visited. For integer
+    ratings the bound is exact (see `_exact_bound`); otherwise it uses the fact that the remaining team
+    A players total between the weakest and the strongest of the rest (see `_interval_bound`).
+
+    For the "win_probability" objective the splits are evaluated exhaustively (vectorized, see
+    `balance_by_win_probability`) while there are at most PROBABILITY_EXHAUSTIVE_MAX_SPLITS of them.
+    Larger lobbies start from the best rating-sum splits, improve each one with the same swap search
+    as `balance_teams` (pinned players never move) and keep the distinct results closest to 50%. This
+    is close to, but not guaranteed to be, the exact top k.
+
+    **Parameters:**
+    - `ratings` (list of numbers): The rating of each player.
+    - `k` (int): Number of splits to return.
+    - `pinned_a`, `pinned_b` (lists of player indexes): Players that must be on team A / team B.
+
+    **Returns:**
+    - A list of up to `k` dictionaries as returned by `balance_teams`, each with its `rank`.
+
+    **Example:**
+
+    ```python
+    for split in top_splits([1500, 1320, 1275, 1210, 1190, 1100], k=3, pinned_b=[1]):
+        print(split['rank'], split['team_a'], split['difference'])
+    # Output:
+    # 1 [0, 4, 5] -15
+    # 2 [0, 3, 5] 25
+    # 3 [0, 2, 5] 155
+    ```
+    """
+    n = len(ratings)
+    pinned_a, pinned_b = list(pinned_a), list(pinned_b)
+    if set(pinned_a) & set(pinned_b):
+        raise ValueError("A player can not be pinned to both teams")
+    if len(pinned_a) > n // 2 or len(pinned_b) > n - n // 2:
+        raise ValueError(f"Too many pinned players for teams of {n // 2} and {n - n // 2}")
+    if objective not in ("rating_sum", "win_probability"):
+        raise ValueError(f"Unknown matchmaking objective '{objective}', expected 'rating_sum' or 'win_probability'")
+
+    probabilities = win_probability_matrix(ratings)
+    if objective == "win_probability":
+        if _split_count(n, pinned_a, pinned_b) <= PROBABILITY_EXHAUSTIVE_MAX_SPLITS:
+            teams, method = _exhaustive_probability_splits(probabilities, k, pinned_a, pinned_b), "exhaustive"
+        else:
+            teams, method = [], "branch and bound + swap search"
+            for seed in _branch_and_bound(ratings, 4 * k, pinned_a, pinned_b):
+                team_a = _improve_probability_by_swaps(probabilities, seed, locked=pinned_a + pinned_b)
+                if not pinned_a and not pinned_b and n % 2 == 0 and 0 not in team_a:
+                    team_a = [i for i in range(n) if i not in team_a]  # Same split seen from team B
+                if team_a not in teams:
+                    teams.append(team_a)
+    else:
+        teams, method = _branch_and_bound(ratings, k, pinned_a, pinned_b), "branch and bound"
+
+    splits = [_describe_split(ratings, team_a, method, probabilities) for team_a in teams]
+    if objective == "win_probability":
+        splits.sort(key=lambda split: abs(split['win_probability'] - 0.5))
+    for rank, split in enumerate(splits[:k], start=1):
+        split['rank'] = rank
+    return splits[:k]
+
+
+def _branch_and_bound(ratings, k, pinned_a=(), pinned_b=()):
+    """Returns team A of the `k` splits with the smallest rating difference, best first (see `top_splits`)."""
+    n = len(ratings)
+    pinned = set(pinned_a) | set(pinned_b)
+    free = sorted((i for i in range(n) if i not in pinned), key=lambda i: -ratings[i])
+    values = [ratings[i] for i in free]
+    m = len(free)
+    prefix = [0]
+    for value in values:
+        prefix.append(prefix[-1] + value)
+
+    need_a = n // 2 - len(pinned_a)
+    start_difference = sum(ratings[i] for i in pinned_a) - sum(ratings[i] for i in pinned_b)
+    bound = _exact_bound(values, need_a) or _interval_bound(values, prefix)
+    best = []  # Max-heap of the k best leaves found so far: (-|difference|, -sequence, team A)
+    sequence = [0]
+
+    def worst():
+        return -best[0][0] if len(best) == k else float('inf')
+
+    def record(difference, team_a):
+        sequence[0] += 1
+        entry = (-abs(difference), -sequence[0], team_a)
+        if len(best) < k:
+            heapq.heappush(best, entry)
+        elif abs(difference) < worst():
+            heapq.heapreplace(best, entry)
+
+    def visit(i, difference, remaining_a, chosen):
+        if remaining_a == 0:
+            record(difference - (prefix[m] - prefix[i]), chosen)
+            return
+        if remaining_a == m - i:
+            record(difference + (prefix[m] - prefix[i]), chosen + free[i:])
+            return
+        if bound(i, difference, remaining_a) >= worst():
+            return
+        value = values[i]
+        branches = [(i + 1, difference + value, remaining_a - 1, chosen + [free[i]]),
+                    (i + 1, difference - value, remaining_a, chosen)]
+        # Explore the more promising branch first, so the bound of the k-th best split tightens quickly
+        branches.sort(key=lambda branch: bound(*branch[:3]) if 0 < branch[2] < m - branch[0] else 0)
+        for branch in branches:
+            visit(*branch)
+
+    if not pinned and n % 2 == 0 and m:
+        # Teams are interchangeable: the strongest player is fixed on team A
+        visit(1, start_difference + values[0], need_a - 1, list(pinned_a) + [free[0]])
+    else:
+        visit(0, start_difference, need_a, list(pinned_a))
+
+    return [team_a for _, _, team_a in sorted(best, key=lambda entry: (-entry[0], -entry[1]))]
+
+
+def _interval_bound(values, prefix):
+    """
+    Lower bound on the final |difference| for any ratings: the remaining team A players total somewhere
+    between the weakest and the strongest `remaining_a` of the rest (both O(1) with prefix sums).
+    """
+    m = len(values)
+
+    def bound(i, difference, remaining_a):
+        rest = prefix[m] - prefix[i]
+        low = difference + 2 * (prefix[m] - prefix[m - remaining_a]) - rest
+        high = difference + 2 * (prefix[i + remaining_a] - prefix[i]) - rest
+        return 0 if low <= 0 <= high else min(abs(low), abs(high))
+
+    return bound
+
+
+def _exact_bound(values, need_a):
+    """
+    Exact bound for integer ratings: `reachable[i][c]` holds (as bits, like `_solve_dp`) every total of
+    `c` players among `values[i:]`, so the best final difference still reachable is found with two bit
+    scans, and only branches that lead to one of the k best splits are ever expanded.
+    Returns None if the ratings are not integers or the bitsets would exceed DP_MAX_WORK.
+    """
+    m = len(values)
+    if not m or not all(float(v).is_integer() for v in values):
+        return None
+    lowest = int(min(values))
+    shifted = [int(v) - lowest for v in values]
+    if m * (need_a + 1) * (need_a + 1) * (max(shifted) + 1) > DP_MAX_WORK:
+        return None
+
+    reachable = [None] * (m + 1)
+    reachable[m] = [1] + [0] * need_a
+    for i in range(m - 1, -1, -1):
+        layer = list(reachable[i + 1])
+        for count in range(min(need_a, m - i), 0, -1):
+            if reachable[i + 1][count - 1]:
+                layer[count] |= reachable[i + 1][count - 1] << shifted[i]
+        reachable[i] = layer
+    suffix = [0] * (m + 1)
+    for i in range(m - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + int(values[i])
+
+    def bound(i, difference, remaining_a):
+        sums = reachable[i][remaining_a]
+        # Final difference = difference + 2 * (total of the remaining team A players) - rest; the ideal
+        # shifted total brings it to 0
+        offset = remaining_a * lowest
+        ideal = math.floor((suffix[i] - difference) / 2 - offset)
+        below = sums & ((1 << (ideal + 1)) - 1) if ideal >= 0 else 0
+        above = sums >> (ideal + 1) if ideal >= 0 else sums
+        candidates = []
+        if below:
+            candidates.append(below.bit_length() - 1)
+        if above:
+            candidates.append(max(ideal + 1, 0) + (above & -above).bit_length() - 1)
+        return min((abs(difference + 2 * (total + offset) - suffix[i]) for total in candidates), default=float('inf'))
+
+    return bound
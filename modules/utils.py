@@ -4,7 +4,9 @@ import json
 from loguru import logger
 
 from configs.llm_config import API_KEYS
-from configs.app_config import NUM_ATTEMPTS, IMAGE_FOLDER_PATH, ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, LOG_LEVEL
+from configs.app_config import NUM_ATTEMPTS, IMAGE_FOLDER_PATH, ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, LOG_LEVEL, FLUSH_EVERY_N_GAMES, FLUSH_INTERVAL_SECONDS, DATABASE_LOCK_TIMEOUT_SECONDS, DATABASE_COMMIT_RETRIES, DATABASE_FORMAT
+from modules.database import players_database, VersionConflictError
+from modules.leaderboard_snapshot import open_current_snapshot
 
 def print_game_results(game_result_dictionary, full_image_path=None):
     """
@@ -42,6 +44,11 @@ def validate_configuration():
     logger.info(f"ELO_JSON_DATABASE_PATH: {ELO_JSON_DATABASE_PATH}")
     logger.info(f"GAME_RESULTS_JSON_PATH: {GAME_RESULTS_JSON_PATH}")
     logger.info(f"LOG_LEVEL: {LOG_LEVEL}")
+    logger.info(f"FLUSH_EVERY_N_GAMES: {FLUSH_EVERY_N_GAMES}")
+    logger.info(f"FLUSH_INTERVAL_SECONDS: {FLUSH_INTERVAL_SECONDS}")
+    logger.info(f"DATABASE_FORMAT: {DATABASE_FORMAT}")
+    logger.info(f"DATABASE_LOCK_TIMEOUT_SECONDS: {DATABASE_LOCK_TIMEOUT_SECONDS}")
+    logger.info(f"DATABASE_COMMIT_RETRIES: {DATABASE_COMMIT_RETRIES}")
 
     image_path = IMAGE_FOLDER_PATH 
     if not os.path.exists(image_path):
@@ -70,7 +77,7 @@ def validate_configuration():
 
     return image_files, image_path
 
-def display_final_elo_scores(eloDatabaseJson):
+def display_final_elo_scores(eloDatabaseJson, leaderboard=None):
     """
     Displays the final ELO scores for each player in a formatted table.
 
@@ -79,6 +86,7 @@ def display_final_elo_scores(eloDatabaseJson):
 
     **Parameters:**
     - `eloDatabaseJson` (dict): A dictionary containing player data with ELO scores.
+    - `leaderboard` (Leaderboard): Optional leaderboard kept in order during the run, read instead of sorting the players.
 
     **Returns:**
     - None
@@ -89,11 +97,13 @@ def display_final_elo_scores(eloDatabaseJson):
         if eloDatabaseJson:
             logger.info(f"{'Player Name':<20} {'Elo Rating':>10}")
             logger.info("-" * 50)
-            sorted_players = sorted(eloDatabaseJson['Players'], 
-                                    key=lambda x: x['Starting Elo'], 
-                                    reverse=True)
-            for player in sorted_players:
-                logger.info(f"{player['PlayerName']:<20} {player['Starting Elo']:>10}")
+            if leaderboard is not None:
+                sorted_players = leaderboard.top()
+            else:
+                sorted_players = [(player['PlayerName'], player['Starting Elo']) for player in
+                                  sorted(eloDatabaseJson['Players'], key=lambda x: x['Starting Elo'], reverse=True)]
+            for player_name, elo in sorted_players:
+                logger.info(f"{player_name:<20} {elo:>10}")
         else:
             logger.error("No player data available.")
         logger.info("-" * 50 + "")
@@ -107,7 +117,8 @@ def load_elo_database(path):
     This function attempts to read a JSON file containing player ELO data. 
     If the file does not exist or an error occurs during reading, it initializes 
     an empty database structure. The function also ensures the file is created 
-    if it doesn't exist.
+    if it doesn't exist. Reads take the shared database lock, so they never observe
+    a half-finished commit from another process.
 
     **Parameters:**
     - `path` (str): The file path to the ELO database JSON file.
@@ -115,11 +126,11 @@ def load_elo_database(path):
     **Returns:**
     - A dictionary representing the ELO database, with player data.
     """
+    database = players_database(path)
     if os.path.exists(path):
         try:
-            with open(path, "r") as file:
-                eloDatabaseJson = json.load(file)
-                logger.info(f"Elo database loaded from '{path}'")
+            eloDatabaseJson, version = database.read()
+            logger.info(f"Elo database loaded from '{path}'")
         except Exception as e:
             logger.error(f"Error reading '{path}': {e}")
             # Initialize an empty JSON structure if there's an error
@@ -129,9 +140,34 @@ def load_elo_database(path):
         eloDatabaseJson = {"Players": []}
         logger.info(f"Elo database not found, initialized empty database in '{path}'")
 
-    # Ensure the file is created if it doesn't exist
-    if not os.path.exists(path):
-        with open(path, "w") as file:
-            json.dump(eloDatabaseJson, file, indent=4)
+        # Ensure the file is created if it doesn't exist
+        try:
+            database.commit(eloDatabaseJson, expected_version=0)
+        except VersionConflictError:
+            # Another process created it first
+            eloDatabaseJson, version = database.read()
+
+    return eloDatabaseJson
+
+def load_player_ratings(path):
+    """
+    Returns a dictionary mapping each player name to their current Elo rating.
+
+    Read-only tools only need the current ratings, so this reads the memory-mapped leaderboard
+    snapshot when it is up to date with the database at `path`, and only falls back to parsing
+    the full database (including every Elo history) when it is not.
 
-    return eloDatabaseJson
\ No newline at end of file
+    **Parameters:**
+    - `path` (str): The file path to the ELO database.
+
+    **Returns:**
+    - A dictionary of `{player name: Elo rating}`.
+    """
+    snapshot = open_current_snapshot(path)
+    if snapshot is not None:
+        with snapshot:
+            logger.debug(f"Player ratings read from leaderboard snapshot (database version {snapshot.database_version})")
+            return snapshot.ratings()
+
+    eloDatabaseJson = load_elo_database(path)
+    return {player['PlayerName']: player.get('Starting Elo', 1200) for player in eloDatabaseJson.get('Players', [])}
@@ -6,42 +6,160 @@ calculates updated Elo ratings for each player, and maintains a database of play
 
 Begin by configuring the application in the app_config.py and llm_config.py files.
 
+It is also the single entry point for the other tools (run from root directory):
+
+    python robz_elo_system.py                      Process the game score images in IMAGE_FOLDER_PATH (same as "ingest")
+    python robz_elo_system.py ingest --headless [--policy commit|hold|reject] [--output FILE]
+                                                   Process them without prompts, writing one JSON result per image
+    python robz_elo_system.py ingest --dry-run     Project the tokens, cost and time of processing the images
+    python robz_elo_system.py ingest --profile     Profile each image and stage, and flag the outlier images
+    python robz_elo_system.py review               Review the games held by a headless ingest
+    python robz_elo_system.py usage [--days N]     Show the LLM tokens and cost recorded per day
+    python robz_elo_system.py leaderboard [N]      Show the N highest rated players
+    python robz_elo_system.py matchmake            Split selected players into balanced teams
+    python robz_elo_system.py rename [OLD NEW]     Rename a player, or open the name management menu
+    python robz_elo_system.py replay [--player NAME] [--from-game INDEX]
+                                                   Recompute ratings from the game ledger
+    python robz_elo_system.py pairs NAME [--count N] [--min-games N] [--rebuild]
+                                                   Show a player's best and worst partners and opponents
+    python robz_elo_system.py games [--player NAME] [--team NAME] [--from DATE] [--to DATE] [--image FILE] [--fields LIST] [--limit N]
+                                                   Print the matching games of the ledger as JSON Lines
+    python robz_elo_system.py report [--output DIR] [--full]
+                                                   Publish the static HTML report (only the changed pages)
+    python robz_elo_system.py serve [--port PORT]  Run the local rating service
+
+Each subcommand imports only the modules it needs, so the commands that do not read images never load
+OpenCV, Pillow or the Anthropic client (see benchmarks/bench_startup.py).
 """
 
-import pandas as pd
 import os
 import sys
 import json
+import time
+import argparse
 from loguru import logger
 
-from modules.elo_calculation import calculatePoints
-from modules.extract_data import parse_game_score, implement_user_corrections, order_data
-from modules.save_data import process_and_save_game_data, prepareData
-from modules.utils import print_game_results, validate_configuration, display_final_elo_scores, load_elo_database
+from configs.app_config import NUM_ATTEMPTS, ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, LOGGING_FILE_PATH, LOG_LEVEL, RATING_SERVICE_PORT, HEADLESS_UNREVIEWED_POLICY, METRICS_ENABLED, REPORT_FOLDER, PAIR_STATS_COUNT, PAIR_STATS_MIN_GAMES
 
-from configs.app_config import NUM_ATTEMPTS, ELO_JSON_DATABASE_PATH, LOGGING_FILE_PATH, LOG_LEVEL
+LOG_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>"
 
 # Configure Loguru
 logger.remove()
-logger.add(LOGGING_FILE_PATH, rotation="5 MB", level="DEBUG", format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>")
-logger.add(sys.stdout, level=LOG_LEVEL, colorize=True, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> | <level>{message}</level>")
+logger.add(LOGGING_FILE_PATH, rotation="5 MB", level="DEBUG", format=LOG_FORMAT)
+console_sink = logger.add(sys.stdout, level=LOG_LEVEL, colorize=True, format=LOG_FORMAT)
 
 @logger.catch
-def main():
+def ingest(policy=None, output=None, metrics=METRICS_ENABLED, profile=False):
+    """
+    Processes the game score images in IMAGE_FOLDER_PATH. Interactive unless a `policy` for the unreviewed
+    games is given (see `process_images`). With `metrics`, the duration of every stage is recorded and
+    exported at the end of the run (see modules/metrics.py). With `profile`, every image and stage is
+    profiled into PROFILES_FOLDER and the slowest images are flagged (see modules/profiling.py).
+
+    **Returns:**
+    - The per-image results (see `process_images`).
+    """
+    from modules import metrics as stage_metrics
+    from modules import profiling
+
+    if metrics:
+        stage_metrics.enable()
+    if profile:
+        profiling.enable()
+    try:
+        return _ingest(policy, output)
+    finally:
+        run_metrics = stage_metrics.disable()
+        if run_metrics is not None:
+            run_metrics.export()
+        run_profiler = profiling.disable()
+        if run_profiler is not None:
+            run_profiler.export()
+
+def _ingest(policy, output):
+    from modules.llm_usage import log_usage
+    from modules.persistence import WriteBehindStore
+    from modules.service_client import connect_to_service
+    from modules.leaderboard import Leaderboard, log_rank_changes
+    from modules.utils import validate_configuration, display_final_elo_scores
 
     image_files, image_folder_path = validate_configuration()
 
-    # Filter image files 
+    # Filter image files
     image_files = [f for f in image_files if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
     total_files = len(image_files)
-    processed_files = 0  # Initialize counter (used to track the number of files processed)
 
+    # If the rating service is running it owns the database: submit the reviewed games to it instead
+    client = connect_to_service()
+    if client is not None:
+        logger.info(f"Submitting games to the rating service at {client.host}:{client.port}")
+        with client:
+            results = process_images(image_files, image_folder_path, client=client, policy=policy, output=output)
+            display_final_elo_scores({'Players': client.leaderboard()})
+        log_usage(run_usage(results), "LLM USAGE OF THIS RUN")
+        return results
+
+    # Load the Elo database and game results, keep them in memory and flush them in the background (see FLUSH_* in app_config.py)
+    store = WriteBehindStore.open(ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH)
+    eloDatabaseJson = store.elo_database
+    leaderboard = Leaderboard.from_database(eloDatabaseJson)  # Kept in order as games are rated, for the final scores and rank changes
+    store.start()
+    try:
+        results = process_images(image_files, image_folder_path, store, policy=policy, output=output, leaderboard=leaderboard)
+    finally:
+        # Flush any pending updates before exiting
+        store.close()
+
+    # Display final ELO scores and how the ranks of the players of this run moved
+    display_final_elo_scores(eloDatabaseJson, leaderboard)
+    changes = leaderboard.rank_changes()
+    if changes:
+        logger.info("=== RANK CHANGES OF THIS RUN ===")
+        log_rank_changes(changes)
+    log_usage(run_usage(results), "LLM USAGE OF THIS RUN")
+    return results
+
+def run_usage(results):
+    """Adds up the API calls of every image of a run (see modules/llm_usage.py)."""
+    from modules.llm_usage import summarize
+
+    return summarize(record for result in results for record in result['llm_usage'])
+
+def process_images(image_files, image_folder_path, store=None, client=None, policy=None, output=None, leaderboard=None):
+    """
+    Parses, corrects and rates each image in turn, applying the results to the in-memory `store`,
+    or submitting them to the rating service through `client`.
+
+    Without a `policy`, every game is shown for review first. With one, nothing is asked and the
+    unreviewed games are handled by the policy (see HEADLESS_UNREVIEWED_POLICY in app_config.py):
+    "commit" rates them, "hold" records them in the ledger unrated until they are reviewed with
+    `python robz_elo_system.py review`, and "reject" records nothing. A `leaderboard` is kept in order
+    with the games rated locally.
+
+    **Returns:**
+    - One dictionary per image with its `image_file`, `status` ("committed", "held", "rejected" or "error"),
+      `game_id`, `game`, `rating_changes`, `llm_usage` (one record per API call) and `error`. Each one is also written to `output` (a text file)
+      as a line of JSON, as soon as the image is done.
+    """
+    from modules.extract_data import parse_game_score, implement_user_corrections
+    from modules.save_data import ingest_game, rating_changes
+    from modules.service_client import RatingServiceError
+    from modules.replay import is_rated_game
+    from modules.name_index import NameIndex
+    from modules.utils import print_game_results
+    from modules.metrics import timed, record
+    from modules import profiling
+
+    eloDatabaseJson = store.elo_database if store is not None else None
+    name_index = NameIndex.from_database(eloDatabaseJson) if store is not None else None  # Fuzzy index used to catch misread player names
     skip_edit_prompt = False  # Initialize skip_edit_prompt variable (used to skip the edit prompt if the game result is already correct)
-    
-    # Load the Elo database (loads the Elo database from a JSON file)
-    eloDatabaseJson = load_elo_database(ELO_JSON_DATABASE_PATH)
+    processed_files = 0  # Initialize counter (used to track the number of files processed)
+    results = []
 
     for image_file in image_files:
+        result = {'image_file': image_file, 'status': "error", 'game_id': None, 'game': None, 'rating_changes': [], 'llm_usage': [], 'error': None}
+        image_started = time.perf_counter()
+        profiling.start_image(image_file)
         try:
             processed_files += 1  # Increment counter (used to track the number of files processed)
             full_image_path = os.path.join(image_folder_path, image_file)
@@ -52,33 +170,325 @@ def main():
             logger.debug(json.dumps(game_result_dictionary, indent=4))
 
             if game_result_dictionary:
+                result['game'] = {k: v for k, v in game_result_dictionary.items() if k not in ('attempts_data', 'llm_usage')}
+                result['llm_usage'] = game_result_dictionary.get('llm_usage', [])
 
-                # Print game results (prints the game result data to the console)
-                print_game_results(game_result_dictionary, full_image_path)
-
-                # Implement user corrections, passing skip_edit_prompt (allows the user to correct the game result data if it is incorrect)
-                game_result_dictionary, user_corrections, skip_edit_prompt = implement_user_corrections(game_result_dictionary, skip_edit_prompt)
+                if policy is None:
+                    # Print game results (prints the game result data to the console)
+                    print_game_results(game_result_dictionary, full_image_path)
 
-                # Process and save game data (saves the game result data to a JSON file)
-                process_and_save_game_data(game_result_dictionary, user_corrections, image_file)
+                    # Implement user corrections, passing skip_edit_prompt (allows the user to correct the game result data if it is incorrect)
+                    with timed("user_review"):
+                        game_result_dictionary, user_corrections, skip_edit_prompt = implement_user_corrections(game_result_dictionary, skip_edit_prompt)
+                    result['game'] = {k: v for k, v in game_result_dictionary.items() if k not in ('attempts_data', 'llm_usage')}
+                elif policy == "reject":
+                    result['status'] = "rejected"
+                    continue
+                elif policy == "commit" and not is_rated_game({'consensus_data': game_result_dictionary}):
+                    result['error'] = "The game can not be rated without review (it needs two teams with victory points)"
+                    continue
+                else:
+                    user_corrections = {}
+                hold = policy == "hold"
 
-                # Order and calculate points (orders the game result data and calculates the ELO points for each player)
-                playerDictionary = order_data(game_result_dictionary, eloDatabaseJson)
-                updatedPlayerDictionary = calculatePoints(playerDictionary)
+                if client is not None:
+                    # Record and rate the game in the rating service, which matches misread names itself
+                    with timed("submit_game"):
+                        response = client.submit_game(game_result_dictionary, user_corrections, image_file, hold=hold)
+                    result.update(status=response['status'], game_id=response['game_id'], rating_changes=response['players'])
+                    continue
 
-                # Prepare and save updated Elo database (saves the updated Elo database to a JSON file)
-                eloDatabaseJson = prepareData(updatedPlayerDictionary, eloDatabaseJson)
+                # Record the game and rate it (both are queued for the next flush, see modules/save_data.py)
+                game_entry, updatedPlayerDictionary = ingest_game(game_result_dictionary, user_corrections, image_file,
+                                                                  eloDatabaseJson, name_index, store=store, hold=hold,
+                                                                  leaderboard=leaderboard)
+                result.update(status=game_entry.get('status', "committed"), game_id=game_entry['game_id'],
+                              rating_changes=rating_changes(updatedPlayerDictionary) if updatedPlayerDictionary is not None else [])
             else:
+                result['error'] = "Failed to parse game results"
                 logger.error(f"Failed to parse game results for '{image_file}'.")
                 continue
+        except RatingServiceError as e:
+            result['error'] = f"The rating service rejected the game: {e}"
+            logger.error(f"The rating service rejected '{image_file}': {e}")
+            continue
         except Exception as e:
+            result['error'] = str(e)
             logger.error(f"An error occurred while processing '{image_file}': {e}")
             continue  # Continue with the next file even if there's an error
+        finally:
+            profiling.end_image()
+            record("image", time.perf_counter() - image_started)
+            results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+
+    return results
+
+def review():
+    """Shows every held game for review, then rates the committed ones (see modules/held_games.py)."""
+    from modules.extract_data import implement_user_corrections
+    from modules.held_games import held_games, release_held_games
+    from modules.utils import print_game_results
+
+    entries = held_games(GAME_RESULTS_JSON_PATH)
+    if not entries:
+        logger.info("No held games to review.")
+        return
+
+    reviewed = []
+    for number, entry in enumerate(entries, start=1):
+        logger.info(f"Held game {number} of {len(entries)}: '{entry['image_file']}' ({entry['date']} {entry['time']})")
+        print_game_results(entry['consensus_data'])
+        consensus_data, user_corrections, _ = implement_user_corrections(entry['consensus_data'], False)
+
+        choice = ""
+        while choice not in ("c", "r", "s"):
+            choice = input("Commit (c), reject (r) or skip (s) this game? ").strip().lower()
+        if choice == "s":
+            continue
+        reviewed.append(dict(entry, consensus_data=consensus_data, user_corrections=user_corrections or entry.get('user_corrections'),
+                             status="committed" if choice == "c" else "rejected"))
+
+    release_held_games(reviewed, ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH)
+
+def show_leaderboard(count=None):
+    """
+    Logs the `count` highest rated players, from the rating service if it is running, else from the
+    leaderboard snapshot, else from the database itself.
+    """
+    from modules.service_client import connect_to_service
+    from modules.leaderboard_snapshot import open_current_snapshot, rank_players, log_leaderboard
+
+    client = connect_to_service()
+    if client is not None:
+        with client:
+            log_leaderboard(client.leaderboard(count))
+        return
+
+    snapshot = open_current_snapshot(ELO_JSON_DATABASE_PATH)
+    if snapshot is not None:
+        with snapshot:
+            log_leaderboard(snapshot.top(count))
+        return
+
+    from modules.utils import load_elo_database
+    players = rank_players(load_elo_database(ELO_JSON_DATABASE_PATH))
+    log_leaderboard(players if count is None else players[:count])
+
+def rename(old_name=None, new_name=None):
+    if old_name is None:
+        from modules.name_management import main as name_management_menu
+        name_management_menu()
+        return
+    if new_name is None:
+        logger.error("Error: Give both the current and the new name, or neither to open the name management menu.")
+        sys.exit(1)
+
+    from modules.name_management import change_player_name
+    change_player_name(ELO_JSON_DATABASE_PATH, old_name, new_name)
+
+def replay(players=None, start_index=0):
+    from modules.replay import rebuild_ratings
+    from modules.pair_stats import rebuild_pair_stats
+
+    indexes = rebuild_ratings(ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH, players=players, start_index=start_index)
+    logger.info(f"Recomputed ratings from {len(indexes)} game(s).")
+    # The rating changes of the replayed games are part of the statistics
+    rebuild_pair_stats(ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH)
+
+def show_pairs(name, count=PAIR_STATS_COUNT, min_games=PAIR_STATS_MIN_GAMES, rebuild=False):
+    """Logs a player's best and worst partners and opponents from the head-to-head and teammate statistics."""
+    from modules.pair_stats import RELATIONS, load_pair_stats, rebuild_pair_stats, ranked_pairs, log_pair_stats
+    from modules.utils import load_elo_database
+
+    if rebuild:
+        stats = rebuild_pair_stats(ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH)
+    else:
+        stats = load_pair_stats(ELO_JSON_DATABASE_PATH, GAME_RESULTS_JSON_PATH)
+    eloDatabase = load_elo_database(ELO_JSON_DATABASE_PATH)
+    log_pair_stats(name, {relation: ranked_pairs(stats, eloDatabase, name, relation, count, min_games) for relation in RELATIONS})
+
+def show_games(filters, fields=None, limit=None):
+    """Writes the ledger entries matching `filters` (see `GameIndex.query`) to stdout as JSON Lines, in ledger order."""
+    from itertools import islice
+    from modules.game_query import query_games
+
+    global console_sink
+    # Keep stdout for the games: the console log moves to stderr
+    logger.remove(console_sink)
+    console_sink = logger.add(sys.stderr, level=LOG_LEVEL, colorize=True, format=LOG_FORMAT)
+
+    games = query_games(GAME_RESULTS_JSON_PATH, ELO_JSON_DATABASE_PATH, fields=fields, **filters)
+    for game in islice(games, limit):
+        sys.stdout.write(json.dumps(game) + "\n")
+    games.close()
+
+def ingest_headless(policy, output_path="-", metrics=METRICS_ENABLED, profile=False):
+    """
+    Runs the ingest without prompts and writes the results as JSON Lines: one line per image, then a
+    `{"summary": {...}}` line with the number of images per status.
+
+    **Returns:**
+    - The exit code: 0 if every image was processed, 1 otherwise.
+    """
+    global console_sink
+    if output_path == "-":
+        # Keep stdout for the results: the console log moves to stderr
+        logger.remove(console_sink)
+        console_sink = logger.add(sys.stderr, level=LOG_LEVEL, colorize=True, format=LOG_FORMAT)
+
+    output = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    try:
+        results = ingest(policy=policy, output=output, metrics=metrics, profile=profile)
+        summary = {status: sum(1 for result in results or [] if result['status'] == status)
+                   for status in ("committed", "held", "rejected", "error")}
+        output.write(json.dumps({'summary': summary, 'llm_usage': run_usage(results or [])}) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if results is None or summary['error'] else 0
+
+def dry_run():
+    """
+    Projects the tokens, cost and time of processing the images in IMAGE_FOLDER_PATH, without calling the
+    API (see `estimate_run` in modules/llm_usage.py).
+    """
+    from configs.app_config import IMAGE_FOLDER_PATH
+    from modules.database import game_results_database
+    from modules.llm_usage import estimate_run
+
+    if not os.path.exists(IMAGE_FOLDER_PATH):
+        logger.error(f"Error: Image path '{IMAGE_FOLDER_PATH}' does not exist")
+        sys.exit(1)
+    image_files = sorted(f for f in os.listdir(IMAGE_FOLDER_PATH) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    game_results, _ = game_results_database(GAME_RESULTS_JSON_PATH).read()
+    estimate = estimate_run(image_files, IMAGE_FOLDER_PATH, NUM_ATTEMPTS, game_results)
+
+    logger.info(f"{'Image':<40} {'Tokens in':>10} {'Tokens out':>10} {'Payload (KB)':>12} {'Time (s)':>9} {'Cost ($)':>9}")
+    logger.info("-" * 95)
+    for image in estimate['images'] + [dict(estimate['total'], image_file="TOTAL")]:
+        logger.info(f"{image['image_file']:<40} {image['input_tokens']:>10} {image['output_tokens']:>10} "
+                    f"{image['payload_bytes'] / 1000:>12.1f} {image['seconds']:>9.1f} {image['cost']:>9.4f}")
+    basis = f"the median of {estimate['total']['history_calls']} recorded call(s)" if estimate['total']['history_calls'] else "LLM_ESTIMATED_* in app_config.py"
+    logger.info(f"{estimate['total']['calls']} call(s) with NUM_ATTEMPTS = {NUM_ATTEMPTS}; output tokens and latency from {basis}.")
+    return estimate
+
+def show_usage(days=None):
+    """Logs the LLM usage recorded in the game ledger, per day (the `days` most recent ones, default all)."""
+    from modules.database import game_results_database
+    from modules.llm_usage import usage_by_day, summarize
+
+    game_results, _ = game_results_database(GAME_RESULTS_JSON_PATH).read()
+    by_day = list(usage_by_day(game_results).items())
+    if days is not None:
+        by_day = by_day[-days:]
+    logger.info(f"{'Date':<12} {'Calls':>6} {'Failed':>7} {'Retries':>8} {'Tokens in':>10} {'Tokens out':>10} {'Payload (MB)':>12} {'Cost ($)':>9}")
+    logger.info("-" * 80)
+    for day, summary in by_day + [("TOTAL", summarize(record for entry in game_results for record in entry.get('llm_usage', [])))]:
+        logger.info(f"{day or '-':<12} {summary['calls']:>6} {summary['failed_calls']:>7} {summary['retries']:>8} {summary['input_tokens']:>10} "
+                    f"{summary['output_tokens']:>10} {summary['payload_bytes'] / 1_000_000:>12.2f} {summary['cost']:>9.4f}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Robz Elo rating system", formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="Without a command, the game score images are processed (same as 'ingest').")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    ingest_parser = commands.add_parser("ingest", help="Process the game score images in IMAGE_FOLDER_PATH")
+    ingest_parser.add_argument("--headless", action="store_true",
+                               help="Do not ask for review: write one JSON result per image and exit with 1 if any image failed")
+    ingest_parser.add_argument("--dry-run", action="store_true",
+                               help="Only project the tokens, cost and time of processing the images, without calling the API")
+    ingest_parser.add_argument("--metrics", action="store_true", default=METRICS_ENABLED,
+                               help="Export the duration of each stage at the end of the run (see METRICS_* in app_config.py)")
+    ingest_parser.add_argument("--profile", action="store_true",
+                               help="Profile each image and stage into PROFILES_FOLDER and flag the outlier images (see PROFILE_* in app_config.py)")
+    ingest_parser.add_argument("--policy", choices=("commit", "hold", "reject"), default=HEADLESS_UNREVIEWED_POLICY,
+                               help=f"What --headless does with the unreviewed games (default: {HEADLESS_UNREVIEWED_POLICY})")
+    ingest_parser.add_argument("--output", default="-", metavar="FILE",
+                               help="File the --headless results are written to, '-' for stdout (default)")
+
+    commands.add_parser("review", help="Review the games held by a headless ingest and rate the committed ones")
+
+    usage_parser = commands.add_parser("usage", help="Show the LLM tokens, payload and cost recorded per day")
+    usage_parser.add_argument("--days", type=int, help="Number of most recent days to show (default: all)")
+
+    leaderboard_parser = commands.add_parser("leaderboard", help="Show the highest rated players")
+    leaderboard_parser.add_argument("count", type=int, nargs="?", help="Number of players to show (default: all)")
+
+    commands.add_parser("matchmake", help="Split selected players into balanced teams")
+
+    rename_parser = commands.add_parser("rename", help="Rename a player, or open the name management menu without arguments")
+    rename_parser.add_argument("old_name", nargs="?", help="The player's current name")
+    rename_parser.add_argument("new_name", nargs="?", help="The player's new name")
+
+    replay_parser = commands.add_parser("replay", help="Recompute ratings from the game ledger")
+    replay_parser.add_argument("--player", action="append", dest="players", metavar="NAME",
+                               help="Only replay the games that depend on this player (repeatable)")
+    replay_parser.add_argument("--from-game", type=int, default=0, dest="start_index", metavar="INDEX",
+                               help="Ledger index of the first game to replay (default: 0)")
+
+    pairs_parser = commands.add_parser("pairs", help="Show a player's best and worst partners and opponents")
+    pairs_parser.add_argument("name", help="The player's current or past name")
+    pairs_parser.add_argument("--count", type=int, default=PAIR_STATS_COUNT, help=f"Number of players per list (default: {PAIR_STATS_COUNT})")
+    pairs_parser.add_argument("--min-games", type=int, default=PAIR_STATS_MIN_GAMES,
+                              help=f"Only list players met in at least this many games (default: {PAIR_STATS_MIN_GAMES})")
+    pairs_parser.add_argument("--rebuild", action="store_true", help="Recompute the statistics from the game ledger first")
+
+    games_parser = commands.add_parser("games", help="Print the games of the ledger matching all the given filters as JSON Lines")
+    games_parser.add_argument("--player", metavar="NAME", help="Games of this player, under any of their names")
+    games_parser.add_argument("--team", metavar="NAME", help="Games with this team or faction (any case)")
+    games_parser.add_argument("--from", dest="date_from", metavar="DATE", help="Games on or after this date (YYYY-MM-DD)")
+    games_parser.add_argument("--to", dest="date_to", metavar="DATE", help="Games on or before this date (YYYY-MM-DD)")
+    games_parser.add_argument("--image", dest="image_file", metavar="FILE", help="The game read from this scoreboard image")
+    games_parser.add_argument("--fields", type=lambda value: value.split(","), metavar="LIST",
+                              help="Comma-separated fields to print, e.g. date,image_file,consensus_data.winner (default: the whole entry)")
+    games_parser.add_argument("--limit", type=int, metavar="N", help="Print at most N games")
+
+    report_parser = commands.add_parser("report", help="Publish the static HTML report: leaderboard, player pages and recent games")
+    report_parser.add_argument("--output", default=REPORT_FOLDER, metavar="DIR", help=f"Folder to publish to (default: {REPORT_FOLDER})")
+    report_parser.add_argument("--full", action="store_true", help="Render every page, not only those of the players whose record changed")
 
-    # Display final ELO scores
-    display_final_elo_scores(eloDatabaseJson)
+    serve_parser = commands.add_parser("serve", help="Run the local rating service (see modules/rating_service.py)")
+    serve_parser.add_argument("--port", type=int, default=RATING_SERVICE_PORT, help=f"Port to listen on (default: {RATING_SERVICE_PORT})")
+    return parser
 
+def main(argv=None):
+    args = build_parser().parse_args(argv)
 
+    if args.command is None:
+        ingest()
+    elif args.command == "ingest" and args.dry_run:
+        dry_run()
+    elif args.command == "ingest" and not args.headless:
+        ingest(metrics=args.metrics, profile=args.profile)
+    elif args.command == "ingest":
+        sys.exit(ingest_headless(args.policy, args.output, args.metrics, args.profile))
+    elif args.command == "review":
+        review()
+    elif args.command == "usage":
+        show_usage(args.days)
+    elif args.command == "leaderboard":
+        show_leaderboard(args.count)
+    elif args.command == "matchmake":
+        from modules.matchmaker import main as matchmake
+        matchmake()
+    elif args.command == "rename":
+        rename(args.old_name, args.new_name)
+    elif args.command == "replay":
+        replay(args.players, args.start_index)
+    elif args.command == "pairs":
+        show_pairs(args.name, args.count, args.min_games, args.rebuild)
+    elif args.command == "games":
+        filters = {name: getattr(args, name) for name in ("player", "team", "date_from", "date_to", "image_file")}
+        show_games(filters, args.fields, args.limit)
+    elif args.command == "report":
+        from modules.report import publish_report
+        publish_report(args.output, full=args.full)
+    elif args.command == "serve":
+        from modules.rating_service import run_service
+        run_service(args.port)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,107 @@
+"""
+Tests for the delta encoding of per-attempt extraction data.
+
+It validates that every attempt can be reconstructed exactly from the consensus result, whether the
+diffs are stored inline in the ledger entry or in the compressed side-file, where games that share a
+game id keep their own records, and after the consensus result is replaced (corrections, merges).
+"""
+
+import os
+import sys
+import copy
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.attempt_deltas import encode_attempts, store_attempts, load_attempts_data, read_side_file, replace_consensus
+
+CONSENSUS = {
+    "winner": "Team Alpha",
+    "teams": {
+        "Team Alpha": {"victory_points": 15, "players": [{"name": "Alice", "score": 2000}, {"name": "Bob", "score": 1800}]},
+        "Team Beta": {"victory_points": 10, "players": [{"name": "Charlie", "score": 1900}, {"name": "David", "score": 1700}]}
+    }
+}
+
+ATTEMPTS = [
+    {'attempt': 1, 'parsed_data': CONSENSUS, 'error': None},
+    {'attempt': 2, 'parsed_data': {
+        "winner": "Team Alfa",
+        "teams": {
+            "Team Alfa": {"victory_points": 15, "players": [{"name": "Alyce", "score": 2000}, {"name": "Bob", "score": 1800}]},
+            "Team Beta": {"victory_points": 12, "players": [{"name": "Charlie", "score": 1900}, {"name": "Dave", "score": 1700},
+                                                             {"name": "Team Beta", "score": 3600}]}
+        }
+    }, 'error': None},
+    {'attempt': 3, 'parsed_data': {
+        "winner": "Team Alpha",
+        "teams": {"Team Alpha": {"victory_points": None, "players": [{"name": "Alice", "score": 2000}]}}
+    }, 'error': None},
+    {'attempt': 4, 'parsed_data': None, 'error': "Expecting value: line 1 column 1 (char 0)"},
+]
+
+
+class TestAttemptDeltas(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.side_file_path = os.path.join(self.tmp_dir, 'attempts_data.jsonl.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_entry(self, game_id):
+        return {"game_id": game_id, "consensus_data": dict(CONSENSUS), "user_corrections": {"edited": False, "edits": []}}
+
+    def test_identical_attempt_encodes_to_empty_diff(self):
+        encoded = encode_attempts(CONSENSUS, ATTEMPTS)
+        self.assertEqual(encoded[0]['diff'], [])
+        self.assertIsNone(encoded[3]['diff'])
+
+    def test_inline_round_trip(self):
+        entry = store_attempts(self.make_entry("2024-01-01T10:00:00.000"), ATTEMPTS, storage="inline")
+        self.assertNotIn('attempts_data', entry['consensus_data'])
+        self.assertEqual(load_attempts_data(entry), ATTEMPTS)
+
+    def test_side_file_round_trip(self):
+        first = store_attempts(self.make_entry("2024-01-01T10:00:00.000"), ATTEMPTS, "side_file", self.side_file_path)
+        second = store_attempts(self.make_entry("2024-01-01T11:00:00.000"), ATTEMPTS[:2], "side_file", self.side_file_path)
+        self.assertNotIn('attempts_delta', first)
+        self.assertEqual(load_attempts_data(first, side_file_path=self.side_file_path), ATTEMPTS)
+        self.assertEqual(load_attempts_data(second, side_file_path=self.side_file_path), ATTEMPTS[:2])
+
+    def test_side_file_keeps_games_with_the_same_id_apart(self):
+        # Game ids are millisecond timestamps, which two games of a fast run can share
+        first = store_attempts(self.make_entry("2024-01-01T10:00:00.000"), ATTEMPTS, "side_file", self.side_file_path)
+        second = store_attempts(self.make_entry("2024-01-01T10:00:00.000"), ATTEMPTS[1:3], "side_file", self.side_file_path)
+        self.assertNotEqual(first['attempts_id'], second['attempts_id'])
+        self.assertEqual(load_attempts_data(first, side_file_path=self.side_file_path), ATTEMPTS)
+        self.assertEqual(load_attempts_data(second, side_file_path=self.side_file_path), ATTEMPTS[1:3])
+
+    def test_replace_consensus_keeps_attempts(self):
+        corrected = copy.deepcopy(CONSENSUS)
+        corrected['teams']['Team Alpha']['players'][1]['name'] = "Bobby"
+        for storage in ("inline", "side_file", "full"):
+            entry = store_attempts(self.make_entry("2024-01-01T10:00:00.000"), copy.deepcopy(ATTEMPTS), storage, self.side_file_path)
+            replace_consensus(entry, corrected, side_file_path=self.side_file_path)
+            self.assertEqual(entry['consensus_data']['teams'], corrected['teams'])
+            self.assertEqual(load_attempts_data(entry, side_file_path=self.side_file_path), ATTEMPTS)
+
+    def test_side_file_rejects_duplicate_records(self):
+        # Records written before records had ids are keyed by game_id
+        for attempts in (ATTEMPTS, ATTEMPTS[:1]):
+            line = json.dumps({'game_id': "2024-01-01T10:00:00.000", 'attempts': encode_attempts(CONSENSUS, attempts)}) + "\n"
+            with gzip.open(self.side_file_path, "ab") as file:
+                file.write(line.encode("utf-8"))
+        with self.assertRaises(ValueError):
+            read_side_file(self.side_file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
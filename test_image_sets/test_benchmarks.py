@@ -0,0 +1,40 @@
+"""
+Tests for the benchmark suite.
+
+These tests run entirely offline on small synthetic data. They validate:
+1. That every rating and persistence case runs and reports a timing
+2. That only slowdowns beyond the tolerance (and above the timer noise) are flagged as regressions
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from benchmarks.bench_suite import run, compare
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_run(self):
+        results = run([200], images=0, repeat=1)
+        for case in ("order_data (200 players)", "calculatePoints (200 players)", "prepareData (200 players)",
+                     "load_elo_database (200 players)", "Leaderboard.update_from_game (200 players)",
+                     "compute_consensus (10 attempts)"):
+            self.assertGreater(results[case], 0)
+        self.assertNotIn("detect_scoreboard (per image)", results)
+
+    def test_compare(self):
+        baseline = {'fast': 0.0001, 'slow': 0.1, 'steady': 0.1}
+        rows = {row[0]: row for row in compare({'fast': 0.0003, 'slow': 0.2, 'steady': 0.11, 'new': 1.0}, baseline, 0.25)}
+        self.assertFalse(rows['fast'][4])  # 3x slower, but within the timer noise
+        self.assertTrue(rows['slow'][4])
+        self.assertFalse(rows['steady'][4])
+        self.assertEqual(rows['new'][2:], (None, None, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
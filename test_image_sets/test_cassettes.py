@@ -0,0 +1,105 @@
+"""
+Tests for the record/replay layer around the extraction client and the accuracy harness.
+
+These tests run entirely offline (recording goes through a fake API client) against temporary files. They validate:
+1. That a recorded cassette replays the same extraction, tokens and errors without a client
+2. That replaying a request that differs from the recorded one warns, or fails in strict mode
+3. That the harness scores team victory points, player names and player scores per field
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from PIL import Image
+
+from modules.cassettes import Cassette, CassetteClient, CassetteMiss
+from modules.extract_data import parse_game_score
+from benchmarks.bench_accuracy import score_fields, evaluate_image
+
+IMAGE_PATH = os.path.join(current_dir, 'images', 'set_1', 'test_image_1.jpg')
+EXPECTED_PATH = os.path.join(current_dir, 'expected_results', 'set_1', 'test_image_1.json')
+
+
+def fake_api_client(texts):
+    """Returns a stand-in for the Anthropic client answering `texts` in turn (exceptions are raised)."""
+    def create(**request):
+        text = texts.pop(0)
+        if isinstance(text, Exception):
+            raise text
+        message = SimpleNamespace(content=[SimpleNamespace(text=text)], model="claude-3-5-sonnet-20241022",
+                                  usage=SimpleNamespace(input_tokens=1600, output_tokens=300))
+        return SimpleNamespace(parse=lambda: message, retries_taken=0)
+    return SimpleNamespace(messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+
+
+def make_request(prompt="Read the scoreboard", image="aW1hZ2U="):
+    return {'model': "claude-3-5-sonnet-latest", 'max_tokens': 1024, 'messages': [{'role': "user", 'content': [
+        {'type': "image", 'source': {'type': "base64", 'media_type': "image/png", 'data': image}},
+        {'type': "text", 'text': prompt}]}]}
+
+
+class TestCassettes(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cassette_path = os.path.join(self.tmp_dir, 'set_1', 'test_image_1.json')
+        with open(EXPECTED_PATH) as file:
+            self.expected = json.load(file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record_and_replay(self):
+        client = fake_api_client([json.dumps(self.expected), TimeoutError("request timed out")])
+        recorder = CassetteClient(Cassette(self.cassette_path), mode="record", client=client)
+        image = Image.new('RGB', (64, 32))
+        parse = lambda client: parse_game_score(IMAGE_PATH, num_attempts=2, client=client)
+        with mock.patch('modules.extract_data.detect_scoreboard', return_value=image):
+            recorded = parse(recorder)
+            replayed = parse(CassetteClient(Cassette(self.cassette_path), mode="replay"))
+
+        self.assertEqual(replayed['teams'], self.expected['teams'])
+        self.assertEqual({k: v for k, v in replayed.items() if k != 'llm_usage'}, {k: v for k, v in recorded.items() if k != 'llm_usage'})
+        self.assertEqual([record['input_tokens'] for record in replayed['llm_usage']], [1600, 0])
+        self.assertEqual(replayed['attempts_data'][1]['error'], "request timed out")
+
+    def test_replay_mismatch(self):
+        cassette = Cassette(self.cassette_path)
+        CassetteClient(cassette, mode="record", client=fake_api_client(["{}"])).messages.with_raw_response.create(**make_request())
+
+        lenient = CassetteClient(Cassette(self.cassette_path), mode="replay")
+        self.assertEqual(lenient.messages.with_raw_response.create(**make_request(prompt="New prompt")).parse().content[0].text, "{}")
+        with self.assertRaises(CassetteMiss):
+            lenient.messages.with_raw_response.create(**make_request())  # Only one call was recorded
+
+        strict = CassetteClient(Cassette(self.cassette_path), mode="replay", strict=True)
+        with self.assertRaises(CassetteMiss):
+            strict.messages.with_raw_response.create(**make_request(prompt="New prompt"))
+
+    def test_score_fields(self):
+        actual = json.loads(json.dumps(self.expected))
+        team_a = actual['teams']['Team A']
+        team_a['victory_points'] += 1
+        team_a['players'][0]['name'] = "naej"  # Misread name
+        team_a['players'][1]['score'] = 0  # Misread score
+        fields = score_fields(actual, self.expected)
+        self.assertEqual(fields, {'team_vp': (1, 2), 'player_names': (7, 8), 'player_scores': (6, 8)})
+        self.assertEqual(score_fields(None, self.expected)['player_names'], (0, 8))
+
+        with mock.patch('modules.extract_data.detect_scoreboard', return_value=Image.new('RGB', (64, 32))):
+            missing = evaluate_image(IMAGE_PATH, EXPECTED_PATH, self.cassette_path)
+        self.assertIn("no recorded call", missing['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for the indexed queries over the game results ledger.
+
+These tests run entirely offline against temporary files. They validate:
+1. That queries by player (under any of their names), team, date range and image file, alone and combined,
+   return the same entries as filtering the whole ledger, with optional projection
+2. That the index only indexes new games after an append, and re-indexes the ledger after an earlier game changed
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.synthetic_league import SyntheticLeague
+from modules.game_query import GameIndex
+from modules.replay import build_name_resolver
+
+
+class TestGameQuery(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.league = SyntheticLeague(30, seed=4, rename_rate=0.02).play(200)
+        self.players_path, self.games_path = self.league.write(self.tmp_dir)
+        self.index = GameIndex(self.games_path, self.players_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_queries_match_filtering(self):
+        game_results = self.league.game_results
+        resolve = build_name_resolver(self.league.elo_database)
+        renamed = next(player for player in self.league.elo_database['Players'] if player.get('past names'))
+        team = next(iter(game_results[0]['consensus_data']['teams']))
+        dates = sorted({entry['date'] for entry in game_results})
+        date_from, date_to = dates[len(dates) // 4], dates[len(dates) // 2]
+
+        def plays(entry):
+            return any(resolve(player['name']) == renamed['PlayerName']
+                       for side in entry['consensus_data']['teams'].values() for player in side['players'])
+
+        by_player = [entry for entry in game_results if plays(entry)]
+        self.assertEqual(list(self.index.query(player=renamed['PlayerName'])), by_player)
+        self.assertEqual(list(self.index.query(player=renamed['past names'][0])), by_player)
+        self.assertEqual(list(self.index.query(team=team.upper())),
+                         [entry for entry in game_results if team in entry['consensus_data']['teams']])
+        self.assertEqual(list(self.index.query(player=renamed['PlayerName'], date_from=date_from, date_to=date_to)),
+                         [entry for entry in by_player if date_from <= entry['date'] <= date_to])
+        self.assertEqual(list(self.index.query(image_file=os.path.join("image_input", game_results[7]['image_file']),
+                                               fields=["game_id", "consensus_data.winner"])),
+                         [{'game_id': game_results[7]['game_id'], 'consensus_data.winner': game_results[7]['consensus_data'].get('winner')}])
+        self.assertEqual(list(self.index.query(date_from="2999-01-01")), [])
+
+    def test_incremental_index(self):
+        self.assertEqual(self.index.refresh(), 200)
+        self.assertEqual(self.index.refresh(), 0)
+
+        new_game = self.league.play_game()
+        self.league.write(self.tmp_dir)
+        self.assertEqual(GameIndex(self.games_path, self.players_path).refresh(), 1)  # Reads the saved index
+        self.assertEqual(list(self.index.query(image_file=new_game['image_file'])), [new_game])
+
+        self.league.game_results[0]['image_file'] = "corrected.png"
+        self.league.write(self.tmp_dir)
+        self.assertEqual(self.index.refresh(), 201)
+        self.assertEqual(list(self.index.query(image_file="corrected.png")), [self.league.game_results[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for the headless ingest and the review of held games.
+
+These tests run entirely offline (the image parsing is replaced by fixed results) against temporary files. They validate:
+1. That the "commit" policy rates games as read, reports the rating changes and fails the games it can not rate
+2. That the "hold" policy records games unrated, and that reviewing them rates the committed ones only,
+   keeping the recorded attempts of corrected games
+3. That the "reject" policy records nothing
+4. That each result is written as a line of JSON
+"""
+
+import os
+import io
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from robz_elo_system import process_images
+from modules.persistence import WriteBehindStore
+from modules.held_games import held_games, release_held_games
+from modules.replay import is_rated_game
+from modules.attempt_deltas import load_attempts_data
+
+
+def make_game(first, second, points=(10, 5)):
+    return {'teams': {
+        'Team A': {'victory_points': points[0], 'players': [{'name': name, 'score': 10} for name in first]},
+        'Team B': {'victory_points': points[1], 'players': [{'name': name, 'score': 5} for name in second]},
+    }, 'winner': 'Team A'}
+
+
+GAME_2 = make_game(["Alice", "Carol"], ["Bob", "Dave"], points=(8, None))  # Victory points not read
+GAME_2_ATTEMPTS = [{'attempt': 1, 'parsed_data': GAME_2, 'error': None}]
+
+GAMES = {
+    'game_1.png': make_game(["Alice", "Bob"], ["Carol", "Dave"]),
+    'game_2.png': dict(GAME_2, attempts_data=GAME_2_ATTEMPTS),
+    'game_3.png': None,  # Parsing failed
+}
+
+
+class TestHeadless(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.players_path = os.path.join(self.tmp_dir, 'players_data.json')
+        self.game_results_path = os.path.join(self.tmp_dir, 'game_results.json')
+        players = [{'PlayerName': name, 'Starting Elo': 1200, 'games played': 0, 'past names': [],
+                    'Elo History': [], 'Games Won': 0, 'Games Lost': 0} for name in ("Alice", "Bob", "Carol", "Dave")]
+        with open(self.players_path, 'w') as file:
+            json.dump({'Players': players}, file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def ingest(self, policy):
+        output = io.StringIO()
+        parse = lambda path, num_attempts=1: json.loads(json.dumps(GAMES[os.path.basename(path)]))
+        with mock.patch('modules.extract_data.parse_game_score', side_effect=parse), \
+             WriteBehindStore.open(self.players_path, self.game_results_path) as store:
+            results = process_images(sorted(GAMES), self.tmp_dir, store, policy=policy, output=output)
+        return results, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def read(self, path):
+        with open(path) as file:
+            return json.load(file)
+
+    def test_commit_policy(self):
+        results, lines = self.ingest("commit")
+        self.assertEqual(lines, results)
+        self.assertEqual([result['status'] for result in results], ["committed", "error", "error"])
+        self.assertEqual({change['name'] for change in results[0]['rating_changes']}, {"Alice", "Bob", "Carol", "Dave"})
+        alice = next(change for change in results[0]['rating_changes'] if change['name'] == "Alice")
+        self.assertGreater(alice['elo_after'], alice['elo_before'])
+        self.assertEqual(len(self.read(self.game_results_path)), 1)
+
+    def test_hold_policy_and_review(self):
+        results, _ = self.ingest("hold")
+        self.assertEqual([result['status'] for result in results], ["held", "held", "error"])
+        self.assertTrue(all(player['games played'] == 0 for player in self.read(self.players_path)['Players']))
+
+        reviewed = []
+        for entry in held_games(self.game_results_path):
+            if entry['image_file'] == 'game_2.png':
+                entry['consensus_data']['teams']['Team B']['victory_points'] = 6  # Corrected during review
+            reviewed.append(dict(entry, status="committed"))
+        counts = release_held_games(reviewed[1:], self.players_path, self.game_results_path)
+        self.assertEqual(counts, {'committed': 1, 'rejected': 0, 'held': 1})
+
+        game_results = self.read(self.game_results_path)
+        self.assertEqual(game_results[1]['consensus_data']['teams']['Team B']['victory_points'], 6)
+        self.assertEqual(load_attempts_data(game_results[1]), GAME_2_ATTEMPTS)  # Still what was read
+        self.assertEqual([entry['image_file'] for entry in game_results], ['game_1.png', 'game_2.png'])
+        self.assertEqual([is_rated_game(entry) for entry in game_results], [False, True])
+        players = {player['PlayerName']: player for player in self.read(self.players_path)['Players']}
+        self.assertEqual(players["Alice"]['games played'], 1)
+        self.assertEqual(players["Bob"]['Games Lost'], 1)
+
+    def test_reject_policy(self):
+        results, _ = self.ingest("reject")
+        self.assertEqual([result['status'] for result in results], ["rejected", "rejected", "error"])
+        self.assertFalse(os.path.exists(self.game_results_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
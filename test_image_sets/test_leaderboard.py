@@ -0,0 +1,86 @@
+"""
+Tests for the incrementally maintained leaderboard.
+
+These tests run entirely offline against temporary files. They validate:
+1. That after any sequence of rating changes the leaderboard is in the order `rank_players` sorts to,
+   with consistent ranks, lookups by rank and percentiles
+2. That committing games with `prepareData` keeps it in order and reports the rank changes of the run
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.leaderboard import Leaderboard
+from modules.leaderboard_snapshot import rank_players
+from modules.persistence import WriteBehindStore
+from modules.save_data import prepareData
+
+
+def make_player_dictionary(name, elo, starting_elo, games_played=1):
+    # Shape produced by calculatePoints: [name, starting elo, games played, games won, games lost, probability, new elo]
+    return {
+        'Team A': {'players': [[name, starting_elo, games_played, 1, 0, 0.5, elo]], 'Points': 10, 'winProbability': 0.5},
+        'Team B': {'players': [], 'Points': 5, 'winProbability': 0.5},
+    }
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_order_matches_sorting(self):
+        rng = random.Random(3)
+        ratings = {f"Player{i}": rng.randint(800, 1600) for i in range(300)}
+        leaderboard = Leaderboard(ratings, bucket_size=4)  # Small buckets, so they are split and emptied often
+        for _ in range(2000):
+            name = f"Player{rng.randrange(350)}"
+            if rng.random() < 0.1:
+                leaderboard.remove(name)
+                ratings.pop(name, None)
+            else:
+                ratings[name] = rng.randint(800, 1600)
+                leaderboard.update(name, ratings[name])
+
+        expected = rank_players({'Players': [{'PlayerName': name, 'Starting Elo': elo} for name, elo in ratings.items()]})
+        self.assertEqual(leaderboard.top(), [(player['PlayerName'], player['Starting Elo']) for player in expected])
+        self.assertEqual(leaderboard.top(3), leaderboard.top()[:3])
+        for player in expected[::37]:
+            self.assertEqual(leaderboard.rank(player['PlayerName']), player['Rank'])
+            self.assertEqual(leaderboard.at_rank(player['Rank']), (player['PlayerName'], player['Starting Elo']))
+        self.assertEqual(leaderboard.percentile(expected[0]['PlayerName']), 100.0)
+        self.assertEqual(leaderboard.at_percentile(0), leaderboard.at_rank(len(leaderboard)))
+        self.assertIsNone(leaderboard.rank("Nobody"))
+
+    def test_rank_changes(self):
+        players = [{'PlayerName': name, 'Starting Elo': elo} for name, elo in (("Ann", 1300), ("Bob", 1250), ("Cid", 1200), ("Dee", 1100))]
+        store = WriteBehindStore({'Players': players}, [], os.path.join(self.tmp_dir, 'players_data.json'),
+                                 os.path.join(self.tmp_dir, 'game_results.json'))
+        leaderboard = Leaderboard.from_database(store.elo_database)
+
+        prepareData(make_player_dictionary("Dee", 1280, 1100), store.elo_database, store=store, leaderboard=leaderboard)
+        prepareData(make_player_dictionary("Eve", 1260, 1200, games_played=0), store.elo_database, store=store, leaderboard=leaderboard)
+
+        self.assertEqual(leaderboard.top(), [(player['PlayerName'], player['Starting Elo']) for player in rank_players(store.elo_database)])
+        changes = {change['PlayerName']: change for change in leaderboard.rank_changes()}
+        self.assertEqual((changes['Dee']['rank_before'], changes['Dee']['rank_after'], changes['Dee']['change']), (4, 2, 2))
+        self.assertEqual((changes['Eve']['rank_before'], changes['Eve']['rank_after']), (None, 3))
+        self.assertEqual(leaderboard.rank_changes(["Bob"])[0]['change'], -2)  # Passed by both
+
+        leaderboard.start_run()
+        self.assertEqual(leaderboard.rank_changes(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
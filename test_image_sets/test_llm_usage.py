@@ -0,0 +1,103 @@
+"""
+Tests for the token, byte and cost accounting of the LLM extraction.
+
+These tests run entirely offline (the API client is replaced by a fake one) against temporary files. They validate:
+1. That parse_game_score records the tokens, payload, retries and latency of every call, including failed ones
+2. That the records are stored in the ledger entry next to the consensus data, not inside it
+3. That the records roll up per day, and that image token estimates follow the API's downscaling rule
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from PIL import Image
+
+from modules.extract_data import parse_game_score
+from modules.save_data import process_and_save_game_data
+from modules.llm_usage import usage_by_day, estimate_image_tokens, call_cost
+
+GAME = {'teams': {
+    'Team A': {'victory_points': 10, 'players': [{'name': "Alice", 'score': 10}]},
+    'Team B': {'victory_points': 5, 'players': [{'name': "Bob", 'score': 5}]},
+}, 'winner': 'Team A'}
+
+
+def fake_anthropic(responses):
+    """Returns a replacement for the Anthropic class whose raw `messages.create` returns `responses` in turn."""
+    def create(**kwargs):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = SimpleNamespace(messages=SimpleNamespace(with_raw_response=SimpleNamespace(create=create)))
+    return lambda api_key: client
+
+
+def raw_response(text, input_tokens, output_tokens, retries_taken=0):
+    message = SimpleNamespace(content=[SimpleNamespace(text=text)], model="claude-3-5-sonnet-20241022",
+                              usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens))
+    return SimpleNamespace(parse=lambda: message, retries_taken=retries_taken)
+
+
+class TestLlmUsage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_game_score_records_usage(self):
+        responses = [raw_response(json.dumps(GAME), 1500, 200, retries_taken=1),
+                     ConnectionError("connection reset"),
+                     raw_response("not json", 1500, 20)]
+        with mock.patch('modules.extract_data.detect_scoreboard', return_value=Image.new('RGB', (64, 32))), \
+             mock.patch('anthropic.Anthropic', fake_anthropic(responses)):
+            result = parse_game_score("scoreboard.png", num_attempts=3)
+
+        usage = result['llm_usage']
+        self.assertEqual([record['attempt'] for record in usage], [1, 2, 3])
+        self.assertEqual([record['input_tokens'] for record in usage], [1500, 0, 1500])
+        self.assertEqual(usage[0]['retries'], 1)
+        self.assertEqual(usage[0]['model'], "claude-3-5-sonnet-20241022")
+        self.assertAlmostEqual(usage[0]['cost'], call_cost(1500, 200))
+        self.assertEqual(usage[1]['error'], "connection reset")
+        self.assertIsNone(usage[2]['error'])  # The call succeeded, only its answer could not be used
+        self.assertTrue(all(record['payload_bytes'] > 0 for record in usage))
+        self.assertEqual(result['teams'], GAME['teams'])
+
+    def test_usage_is_stored_next_to_the_consensus(self):
+        records = [{'attempt': 1, 'input_tokens': 1000, 'output_tokens': 100, 'payload_bytes': 5000,
+                    'latency_seconds': 2.5, 'retries': 0, 'cost': call_cost(1000, 100), 'error': None}]
+        game_results_path = os.path.join(self.tmp_dir, 'game_results.json')
+        with mock.patch('modules.save_data.GAME_RESULTS_JSON_PATH', game_results_path):
+            entry = process_and_save_game_data(dict(GAME, llm_usage=records), {}, "scoreboard.png")
+        self.assertNotIn('llm_usage', entry['consensus_data'])
+        self.assertEqual(entry['llm_usage'], records)
+
+        game_results = [entry, dict(entry, llm_usage=records * 2), dict(entry, date="2000-01-01")]
+        days = usage_by_day(game_results)
+        self.assertEqual(list(days), ["2000-01-01", entry['date']])
+        self.assertEqual(days[entry['date']]['calls'], 3)
+        self.assertEqual(days[entry['date']]['input_tokens'], 3000)
+
+    def test_estimate_image_tokens(self):
+        self.assertEqual(estimate_image_tokens(750, 100), 100)
+        # Too large: scaled down to 1.15 megapixels (about 1534 tokens) whatever the original size
+        self.assertEqual(estimate_image_tokens(4000, 2500), estimate_image_tokens(8000, 5000))
+        self.assertLessEqual(estimate_image_tokens(4000, 2500), 1534)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for the per-stage latency metrics of the ingest.
+
+These tests run entirely offline against temporary files. They validate:
+1. That the percentiles interpolate between samples like the usual definition (numpy's default)
+2. That nothing is recorded while metrics are disabled
+3. That the export writes a Prometheus summary metric and a JSON summary per stage
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules import metrics
+from modules.metrics import StageMetrics, percentile
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        metrics.disable()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertAlmostEqual(percentile(values, 0.5), 50.5)
+        self.assertAlmostEqual(percentile(values, 0.95), 95.05)
+        self.assertAlmostEqual(percentile(values, 0.99), 99.01)
+        self.assertEqual(percentile([3.0], 0.99), 3.0)
+
+    def test_disabled_records_nothing(self):
+        self.assertIs(metrics.timed("detect_scoreboard"), metrics.timed("llm_request"))
+        with metrics.timed("detect_scoreboard"):
+            pass
+        metrics.record("image", 1.0)
+
+        run = metrics.enable()
+        with metrics.timed("detect_scoreboard"):
+            pass
+        metrics.record("image", 1.0)
+        self.assertIs(metrics.disable(), run)
+        self.assertEqual(len(run.samples("detect_scoreboard")), 1)
+        self.assertEqual(run.samples("image"), [1.0])
+
+    def test_export(self):
+        run = StageMetrics()
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            run.record("llm_request", seconds)
+        run.record("flush", 0.05)
+        prometheus_path = os.path.join(self.tmp_dir, "metrics.prom")
+        summary_path = os.path.join(self.tmp_dir, "metrics_summary.json")
+        run.export(prometheus_path, summary_path)
+
+        with open(summary_path) as file:
+            stages = json.load(file)['stages']
+        self.assertEqual(stages['llm_request']['count'], 4)
+        self.assertAlmostEqual(stages['llm_request']['p50'], 0.25)
+        self.assertAlmostEqual(stages['flush']['p99'], 0.05)
+
+        with open(prometheus_path) as file:
+            text = file.read()
+        self.assertIn("# TYPE robz_elo_stage_duration_seconds summary", text)
+        self.assertIn('robz_elo_stage_duration_seconds{stage="llm_request",quantile="0.5"} 0.250000', text)
+        self.assertIn('robz_elo_stage_duration_seconds_count{stage="llm_request"} 4', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Tests for player name resolution and name management.
+
+These tests run entirely offline against temporary files. They validate:
+1. That the fuzzy name index ranks close matches (including OCR slips such as swapped digits) first
+2. That unknown names are auto-mapped above the threshold and queued for review below it
+3. That order_data uses the index instead of creating duplicate players, and never maps a name to a
+   player who is already in the same game
+4. That bulk name imports apply every operation at once, or report conflicts and write nothing
+5. That merging two players replays only the affected games and gives the same ratings as a full rebuild,
+   keeps the recorded extraction attempts unchanged and recomputes the head-to-head and teammate statistics
+"""
+
+import os
+import sys
+import copy
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.name_index import NameIndex, edit_distance, resolve_name
+from modules.extract_data import order_data
+from modules.database import players_database, game_results_database, pair_stats_folder_for
+from modules.name_management import merge_players, bulk_update_names, load_name_operations
+from modules.replay import replay_games
+from modules.pair_stats import PairStats, compute_pair_stats
+from modules.attempt_deltas import store_attempts, load_attempts_data
+
+
+def make_database():
+    players = [
+        ('THE LONG SHLONG', ['THEAK47']),
+        ('ShadowFalcon', []),
+        ('Morszczuch', []),
+        ('JIMBO_177', []),
+        ('Taters', []),
+    ]
+    return {"Players": [
+        {'PlayerName': name, 'Starting Elo': 1250, 'games played': 10, 'past names': past_names,
+         'Elo History': [1250], 'Games Won': 5, 'Games Lost': 5}
+        for name, past_names in players
+    ]}
+
+
+class TestNameResolution(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.review_queue_path = os.path.join(self.tmp_dir, 'name_review_queue.json')
+        self.index = NameIndex.from_database(make_database())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_edit_distance_counts_transpositions_once(self):
+        self.assertEqual(edit_distance('theak74', 'theak47'), 1)
+        self.assertEqual(edit_distance('taters', 'tater'), 1)
+        self.assertEqual(edit_distance('ca', 'abc'), 2)
+
+    def test_candidates_are_ranked_by_score(self):
+        candidates = self.index.candidates('THEAK74')
+        self.assertEqual(candidates[0]['player'], 'THE LONG SHLONG')
+        self.assertEqual(candidates[0]['alias'], 'THEAK47')
+        self.assertEqual(self.index.candidates('ShadowFa1con')[0], {'player': 'ShadowFalcon', 'alias': 'ShadowFalcon', 'score': 1.0})
+        self.assertEqual(self.index.candidates('Completely Different'), [])
+
+    def test_resolution_policy(self):
+        player, _ = resolve_name('THEAK74', self.index, auto_map_threshold=0.85, review_threshold=0.6,
+                                 review_queue_path=self.review_queue_path)
+        self.assertEqual(player, 'THE LONG SHLONG')
+
+        player, candidates = resolve_name('Tatrz', self.index, auto_map_threshold=0.85, review_threshold=0.6,
+                                          review_queue_path=self.review_queue_path)
+        self.assertIsNone(player)
+        self.assertEqual(candidates[0]['player'], 'Taters')
+        with open(self.review_queue_path) as file:
+            self.assertEqual([entry['scanned_name'] for entry in json.load(file)], ['Tatrz'])
+
+    def test_order_data_maps_misread_names(self):
+        data = {'teams': {
+            'Team A': {'victory_points': 169, 'players': [{'name': 'THEAK74', 'score': 597}, {'name': 'Newcomer', 'score': 100}]},
+            'Team B': {'victory_points': 28, 'players': [{'name': 'JIMBO_l77', 'score': 416}]}
+        }}
+        playerDictionary = order_data(data, make_database(), self.index)
+        self.assertEqual([p[0] for p in playerDictionary['Team A']['players']], ['THE LONG SHLONG', 'Newcomer'])
+        self.assertEqual(playerDictionary['Team A']['players'][0][1], 1250)
+        self.assertEqual(playerDictionary['Team B']['players'][0][0], 'JIMBO_177')
+
+    def test_order_data_keeps_near_identical_names_apart(self):
+        eloDatabase = {"Players": [{'PlayerName': name, 'Starting Elo': 1250, 'games played': 10, 'past names': []}
+                                   for name in ('Player1', 'Bob', 'Cid')]}
+        index = NameIndex.from_database(eloDatabase)
+        self.assertEqual(index.candidates('Player2')[0]['player'], 'Player1')  # Would be auto-mapped on its own
+        data = {'teams': {
+            'Team A': {'victory_points': 100, 'players': [{'name': 'Player2'}, {'name': 'Bob'}]},
+            'Team B': {'victory_points': 50, 'players': [{'name': 'Player1'}, {'name': 'Cid'}]}
+        }}
+        playerDictionary = order_data(data, eloDatabase, index)
+        self.assertEqual([p[0] for p in playerDictionary['Team A']['players']], ['Player2', 'Bob'])
+        self.assertEqual(playerDictionary['Team A']['players'][0][1], 1200)
+        self.assertEqual(index.auto_mapped, {})
+
+    def test_bulk_name_import(self):
+        elo_path = os.path.join(self.tmp_dir, 'players_data.json')
+        players_database(elo_path).commit(make_database(), 0)
+        import_path = os.path.join(self.tmp_dir, 'names.csv')
+        with open(import_path, 'w') as file:
+            file.write("action,player,name\n"
+                       "rename,THE LONG SHLONG,Shlong\n"
+                       "alias,Shlong,THEAK74\n"
+                       "alias,Taters,Tatrz\n"
+                       "alias,Taters,Tatrz\n")
+
+        summary = bulk_update_names(elo_path, load_name_operations(import_path))
+        self.assertEqual(summary, {'renamed': 1, 'aliases_added': 2, 'unchanged': 1, 'conflicts': []})
+        database, _ = players_database(elo_path).read()
+        shlong = next(p for p in database['Players'] if p['PlayerName'] == 'Shlong')
+        self.assertEqual(shlong['past names'], ['THEAK47', 'THE LONG SHLONG', 'THEAK74'])
+
+        conflicting = [
+            {'action': 'rename', 'player': 'Taters', 'name': 'Morszczuch'},    # Name of another player
+            {'action': 'rename', 'player': 'ShadowFalcon', 'name': 'JIMBO_177'},  # Cycle with the next rename
+            {'action': 'rename', 'player': 'JIMBO_177', 'name': 'ShadowFalcon'},
+            {'action': 'alias', 'player': 'Shlong', 'name': 'M0rszczuch'},       # Alias claimed twice
+            {'action': 'alias', 'player': 'Morszczuch', 'name': 'M0rszczuch'},
+            {'action': 'alias', 'player': 'Taters', 'name': 'THEAK47'},        # Past name of another player
+        ]
+        summary = bulk_update_names(elo_path, conflicting)
+        self.assertEqual(len(summary['conflicts']), 4, summary['conflicts'])
+        self.assertIn("Rename cycle ShadowFalcon -> JIMBO_177 -> ShadowFalcon: apply it as separate imports.", summary['conflicts'])
+        unchanged, _ = players_database(elo_path).read()
+        self.assertEqual(unchanged, database)
+
+    def test_merge_players_replays_affected_games(self):
+        def game(team_a, team_b, points_a, points_b):
+            return {'game_id': f"game-{len(ledger)}", 'consensus_data': {'teams': {
+                'Team A': {'victory_points': points_a, 'players': [{'name': n, 'score': 100} for n in team_a]},
+                'Team B': {'victory_points': points_b, 'players': [{'name': n, 'score': 100} for n in team_b]}
+            }}}
+
+        ledger = []
+        for team_a, team_b, points_a, points_b in [
+            (['Bob', 'Cid'], ['Dee', 'Gus'], 120, 80),   # Before either merged player: not replayed
+            (['Eve', 'Fay'], ['Gus', 'Hal'], 90, 100),   # Never meets the merged player: not replayed
+            (['Ann', 'Cid'], ['Alt', 'Dee'], 100, 110),
+            (['Bob', 'Alt'], ['Ann', 'Eve'], 130, 70),
+            (['Gus', 'Hal'], ['Eve', 'Fay'], 60, 150),   # Eve is affected by now: replayed
+            (['Fay', 'Gus'], ['Hal', 'Cid'], 100, 95),
+        ]:
+            ledger.append(game(team_a, team_b, points_a, points_b))
+
+        # The extraction attempts of a game are stored as diffs against its consensus
+        attempts = [{'attempt': 1, 'parsed_data': copy.deepcopy(ledger[3]['consensus_data']), 'error': None},
+                    {'attempt': 2, 'parsed_data': copy.deepcopy(ledger[3]['consensus_data']), 'error': None}]
+        attempts[1]['parsed_data']['teams']['Team A']['players'][1]['name'] = 'Altt'
+        store_attempts(ledger[3], attempts, storage="inline")
+        self.assertEqual(load_attempts_data(ledger[3]), attempts)
+
+        eloDatabase = replay_games({"Players": []}, ledger, range(len(ledger)))
+        elo_path = os.path.join(self.tmp_dir, 'players_data.json')
+        games_path = os.path.join(self.tmp_dir, 'game_results.json')
+        players_database(elo_path).commit(eloDatabase, 0)
+        game_results_database(games_path).commit(ledger, 0)
+
+        outcome = merge_players(elo_path, 'Alt', 'Ann', games_path)
+        self.assertEqual(outcome, {'replayed_games': 4, 'rewritten_appearances': 2})
+
+        merged, _ = players_database(elo_path).read()
+        rewritten, _ = game_results_database(games_path).read()
+        self.assertNotIn('Alt', json.dumps(rewritten[3]['consensus_data']))
+        self.assertEqual(rewritten[3]['name_rewrites'], [{'from': 'Alt', 'to': 'Ann'}])
+        self.assertEqual(load_attempts_data(rewritten[3]), attempts)  # Still what each attempt read
+
+        # Same result as re-rating the whole rewritten ledger from scratch
+        rebuilt = replay_games({"Players": []}, rewritten, range(len(rewritten)))
+        by_name = lambda database: {p['PlayerName']: (p['Starting Elo'], p['games played'], p['Games Won'], p['Elo History'])
+                                    for p in database['Players']}
+        self.assertEqual(by_name(merged), by_name(rebuilt))
+        self.assertEqual(next(p for p in merged['Players'] if p['PlayerName'] == 'Ann')['past names'], ['Alt'])
+
+        # The head-to-head and teammate statistics no longer hold a row for the source
+        stats = PairStats(pair_stats_folder_for(elo_path))
+        rows, games = compute_pair_stats(merged, rewritten)
+        self.assertEqual(stats.games(), games)
+        self.assertEqual(stats.row('Alt'), {'name': 'Alt', 'teammates': {}, 'opponents': {}})
+        self.assertEqual(stats.row('Ann'), rows['Ann'])
+
+
+if __name__ == '__main__':
+    unittest.main()
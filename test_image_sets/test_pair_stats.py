@@ -0,0 +1,94 @@
+"""
+Tests for the head-to-head and teammate statistics.
+
+These tests run entirely offline against temporary files. They validate:
+1. That the statistics computed from the ledger count the same games and wins as a scan of the ledger,
+   with the players' past names merged
+2. That games rated through the write-behind store are added incrementally, giving the same statistics
+   as computing them again from the ledger
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.synthetic_league import SyntheticLeague
+from modules.database import players_database, game_results_database, pair_stats_folder_for
+from modules.elo_calculation import calculatePoints
+from modules.extract_data import order_data
+from modules.pair_stats import PairStats, load_pair_stats, compute_pair_stats, player_pairs, ranked_pairs
+from modules.persistence import WriteBehindStore
+from modules.replay import build_name_resolver, is_rated_game, game_outcomes
+from modules.save_data import prepareData
+
+
+class TestPairStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.league = SyntheticLeague(30, seed=11, max_team_size=4, rename_rate=0.02).play(150)
+        self.players_path, self.games_path = self.league.write(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_matches_ledger_scan(self):
+        stats = load_pair_stats(self.players_path, self.games_path)
+        self.assertTrue(os.path.isdir(pair_stats_folder_for(self.players_path)))
+        self.assertEqual(stats.games(), 150)
+
+        eloDatabase = self.league.elo_database
+        resolve = build_name_resolver(eloDatabase)
+        renamed = next(player for player in eloDatabase['Players'] if player.get('past names'))
+        name = renamed['PlayerName']
+        teammates, opponents = {}, {}
+        for entry in self.league.game_results:
+            if not is_rated_game(entry):
+                continue
+            outcomes = game_outcomes(entry, resolve)
+            if name not in outcomes:
+                continue
+            for team in entry['consensus_data']['teams'].values():
+                names = {resolve(player['name']) for player in team['players']}
+                counts = teammates if name in names else opponents
+                for other in names - {name}:
+                    games, wins = counts.get(other, (0, 0))
+                    counts[other] = (games + 1, wins + outcomes[name])
+
+        for relation, expected in (("teammates", teammates), ("opponents", opponents)):
+            pairs = player_pairs(stats, eloDatabase, name, relation)
+            self.assertEqual({other: (row['games'], row['wins']) for other, row in pairs.items()}, expected)
+            self.assertEqual(player_pairs(stats, eloDatabase, renamed['past names'][0], relation), pairs)
+
+        ranked = ranked_pairs(stats, eloDatabase, name, "opponents", count=3, min_games=2)
+        self.assertLessEqual(len(ranked['best']), 3)
+        self.assertTrue(all(row['games'] >= 2 for row in ranked['best'] + ranked['worst']))
+        self.assertGreaterEqual(ranked['best'][0]['win_rate'], ranked['worst'][0]['win_rate'])
+
+    def test_incremental_updates(self):
+        store = WriteBehindStore.open(self.players_path, self.games_path)  # Computes the statistics on first use
+        for _ in range(20):
+            game_entry = self.league.play_game()
+            store.append_game_result(game_entry)
+            updatedPlayerDictionary = calculatePoints(order_data(game_entry['consensus_data'], store.elo_database))
+            prepareData(updatedPlayerDictionary, store.elo_database, store=store)
+        store.close()
+
+        stats = PairStats(pair_stats_folder_for(self.players_path))
+        eloDatabase, _ = players_database(self.players_path).read()
+        game_results, _ = game_results_database(self.games_path).read()
+        rows, games = compute_pair_stats(eloDatabase, game_results)
+        self.assertEqual(stats.games(), games)
+        self.assertEqual(games, 170)
+        for name, row in rows.items():
+            self.assertEqual(stats.row(name), row)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+"""
+Tests for the database access layer and the write-behind persistence used by the ingest loop.
+
+These tests run entirely offline against temporary files. They validate:
+1. That atomic writes replace the destination file, keep its permissions and leave no temporary files behind
+2. That a failed write leaves the previous file untouched
+3. That the write-behind store batches games and flushes them on close
+4. That commits are compare-and-swap and concurrent writers never lose each other's changes
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+from unittest import mock
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.database import atomic_write_json, Database, VersionConflictError, players_database, snapshot_path_for, pair_stats_folder_for
+from modules.leaderboard_snapshot import open_current_snapshot
+from modules.utils import load_player_ratings
+from modules.persistence import WriteBehindStore
+from modules.serialization import get_serializer
+from modules.save_data import prepareData
+from modules.name_management import change_player_name
+
+
+def make_player_dictionary(name, elo, starting_elo=1200, games_played=0):
+    # Shape produced by calculatePoints: [name, starting elo, games played, games won, games lost, probability, new elo]
+    return {
+        'Team A': {'players': [[name, starting_elo, games_played, 1, 0, 0.5, elo]], 'Points': 10, 'winProbability': 0.5},
+        'Team B': {'players': [], 'Points': 5, 'winProbability': 0.5},
+    }
+
+
+def increment_counter(path, times):
+    database = Database(path, default_factory=lambda: {"counter": 0})
+    for _ in range(times):
+        database.update(lambda data: data.__setitem__("counter", data["counter"] + 1))
+
+
+class TestPersistence(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.players_path = os.path.join(self.tmp_dir, 'players_data.json')
+        self.games_path = os.path.join(self.tmp_dir, 'game_results.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_atomic_write_replaces_file(self):
+        atomic_write_json(self.players_path, {"Players": []})
+        atomic_write_json(self.players_path, {"Players": [{"PlayerName": "Alice"}]})
+        with open(self.players_path) as file:
+            self.assertEqual(json.load(file)["Players"][0]["PlayerName"], "Alice")
+        self.assertEqual(os.listdir(self.tmp_dir), ['players_data.json'])
+
+    @unittest.skipUnless(hasattr(os, "fchmod"), "POSIX file permissions")
+    def test_atomic_write_keeps_file_permissions(self):
+        reference = os.path.join(self.tmp_dir, 'reference.txt')
+        with open(reference, "w"):
+            pass
+        atomic_write_json(self.players_path, {"Players": []})
+        self.assertEqual(os.stat(self.players_path).st_mode & 0o777, os.stat(reference).st_mode & 0o777)  # Like open(path, "w")
+        os.chmod(self.players_path, 0o640)
+        atomic_write_json(self.players_path, {"Players": [{"PlayerName": "Alice"}]})
+        self.assertEqual(os.stat(self.players_path).st_mode & 0o777, 0o640)
+
+    def test_failed_write_keeps_previous_file(self):
+        atomic_write_json(self.players_path, {"Players": []})
+        with mock.patch('modules.database.os.replace', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                atomic_write_json(self.players_path, {"Players": [{"PlayerName": "Alice"}]})
+        with open(self.players_path) as file:
+            self.assertEqual(json.load(file), {"Players": []})
+        self.assertEqual(os.listdir(self.tmp_dir), ['players_data.json'])
+
+    def test_commit_rejects_stale_version(self):
+        database = Database(self.players_path)
+        data, version = database.read()
+        self.assertEqual(version, 0)
+        database.commit({"Players": [{"PlayerName": "Alice"}]}, version)
+        with self.assertRaises(VersionConflictError):
+            database.commit(data, version)
+        self.assertEqual(database.read(), ({"Players": [{"PlayerName": "Alice"}]}, 1))
+
+    def test_any_format_is_detected_on_load(self):
+        data = {"Players": [{"PlayerName": "Alice", "Elo History": [1210, 1190]}]}
+        for format_name in ["json", "json-pretty", "msgpack", "zstd"]:
+            with self.subTest(format=format_name):
+                try:
+                    serializer = get_serializer(format_name)
+                except ImportError as e:
+                    self.skipTest(str(e))
+                path = os.path.join(self.tmp_dir, f"players_{format_name}.db")
+                Database(path, serializer=serializer).commit(data, 0)
+                self.assertEqual(Database(path).read(), (data, 1))
+
+    def test_commit_publishes_leaderboard_snapshot(self):
+        snapshot_path = snapshot_path_for(self.players_path)
+        players = [
+            {'PlayerName': name, 'Starting Elo': elo, 'games played': 3, 'Games Won': 2, 'Games Lost': 1, 'Elo History': [elo]}
+            for name, elo in [('Taters', 1250), ('naej7', 1310), ('Dmitriy', 1190), ('ShadowFalcon', 1250)]
+        ]
+        database = players_database(self.players_path)
+        database.commit({"Players": players}, 0)
+
+        snapshot = open_current_snapshot(self.players_path, snapshot_path)
+        self.assertIsNotNone(snapshot)
+        with snapshot:
+            self.assertEqual([p['PlayerName'] for p in snapshot.top(3)], ['naej7', 'ShadowFalcon', 'Taters'])
+            self.assertEqual(snapshot.lookup('Dmitriy')['Rank'], 4)
+            self.assertEqual(snapshot.lookup('Taters')['Starting Elo'], 1250)
+            self.assertIsNone(snapshot.lookup('Nobody'))
+
+        # A commit that bypasses the snapshot makes it stale, so readers fall back to the database
+        Database(self.players_path).commit({"Players": players[:1]}, 1)
+        self.assertIsNone(open_current_snapshot(self.players_path, snapshot_path))
+
+    def test_databases_in_one_folder_keep_their_own_side_files(self):
+        other_path = os.path.join(self.tmp_dir, 'other_players.json')
+        self.assertNotEqual(snapshot_path_for(other_path), snapshot_path_for(self.players_path))
+        self.assertNotEqual(pair_stats_folder_for(other_path), pair_stats_folder_for(self.players_path))
+
+        # Next to the configured database (relative paths), both at version 1: each database's ratings
+        # still come from its own snapshot
+        player = {'games played': 1, 'Games Won': 1, 'Games Lost': 0, 'Elo History': []}
+        working_dir = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            players_database(self.players_path).commit({"Players": [dict(player, PlayerName='Ann', **{'Starting Elo': 1300})]}, 0)
+            players_database(other_path).commit({"Players": [dict(player, PlayerName='Bob', **{'Starting Elo': 1100})]}, 0)
+            self.assertEqual(load_player_ratings(self.players_path), {'Ann': 1300})
+            self.assertEqual(load_player_ratings(other_path), {'Bob': 1100})
+        finally:
+            os.chdir(working_dir)
+
+    def test_concurrent_processes_do_not_lose_updates(self):
+        context = multiprocessing.get_context()
+        workers = [context.Process(target=increment_counter, args=(self.players_path, 15)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        data, version = Database(self.players_path).read()
+        self.assertEqual(data["counter"], 60)
+        self.assertEqual(version, 60)
+
+    def test_store_merges_rename_committed_during_ingest(self):
+        Database(self.players_path).commit({"Players": [{
+            'PlayerName': 'THEAK74', 'Starting Elo': 1200, 'games played': 0, 'past names': [],
+            'Elo History': [], 'Games Won': 0, 'Games Lost': 0,
+        }]}, 0)
+        store = WriteBehindStore.open(self.players_path, self.games_path,
+                                      flush_every_n_games=100, flush_interval_seconds=3600)
+        prepareData(make_player_dictionary('THEAK74', 1225), store.elo_database, store=store)
+
+        # An admin renames the player while the game is still pending in memory
+        change_player_name(self.players_path, 'THEAK74', 'THE LONG SHLONG')
+
+        store.close()
+        data, _ = Database(self.players_path).read()
+        self.assertEqual(len(data['Players']), 1)
+        player = data['Players'][0]
+        self.assertEqual(player['PlayerName'], 'THE LONG SHLONG')
+        self.assertEqual(player['past names'], ['THEAK74'])
+        self.assertEqual(player['Starting Elo'], 1225)
+        self.assertEqual(player['Games Won'], 1)
+        self.assertEqual(store.elo_database, data)
+
+    def test_store_batches_and_flushes_on_close(self):
+        database = {"Players": []}
+        store = WriteBehindStore(database, [], self.players_path, self.games_path,
+                                 flush_every_n_games=100, flush_interval_seconds=3600)
+        store.start()
+        prepareData(make_player_dictionary('Alice', 1210), database, store=store)
+        prepareData(make_player_dictionary('Bob', 1190), database, store=store)
+        self.assertEqual(store.pending_games, 2)
+        self.assertFalse(os.path.exists(self.players_path))
+
+        store.close()
+        with open(self.players_path) as file:
+            names = [p['PlayerName'] for p in json.load(file)['Players']]
+        self.assertEqual(names, ['Alice', 'Bob'])
+        self.assertEqual(store.pending_games, 0)
+
+    def test_store_flushes_when_batch_is_full(self):
+        database = {"Players": []}
+        store = WriteBehindStore(database, [], self.players_path, self.games_path,
+                                 flush_every_n_games=1, flush_interval_seconds=3600)
+        store.start()
+        try:
+            prepareData(make_player_dictionary('Alice', 1210), database, store=store)
+            for _ in range(200):
+                if os.path.exists(self.players_path):
+                    break
+                store._stop.wait(0.01)
+            self.assertTrue(os.path.exists(self.players_path))
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
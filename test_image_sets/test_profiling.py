@@ -0,0 +1,80 @@
+"""
+Tests for the profiling mode of the ingest.
+
+These tests run entirely offline against temporary files. They validate:
+1. That a profiled run writes one profile per stage and per image, and a summary of the hot functions
+2. That only the images with a stage much slower than its median are flagged, never the user review
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules import metrics, profiling
+from modules.profiling import find_outliers
+
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.disable()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_profiled_run(self):
+        profiler = profiling.enable(self.tmp_dir)
+        for image_file, seconds in (("game_1.png", 0.01), ("game_2.png", 0.01), ("game_3.png", 0.2)):
+            profiling.start_image(image_file)
+            with metrics.timed("detect_scoreboard"):
+                busy_work(seconds)
+            for _ in range(2):
+                with metrics.timed("llm_request"):
+                    busy_work(0.01)
+            profiling.end_image()
+        self.assertIs(profiling.disable(), profiler)
+        summary = profiler.export()
+
+        folder = os.path.join(profiler.directory, "game_3")
+        self.assertEqual(sorted(os.listdir(folder)), ["detect_scoreboard.prof", "image.prof", "llm_request.prof"])
+        functions = {function[2] for function in pstats.Stats(os.path.join(folder, "detect_scoreboard.prof")).stats}
+        self.assertIn("busy_work", functions)
+        self.assertGreaterEqual(profiler.images[2]['stages']['llm_request'], 0.02)  # Both attempts add up
+
+        self.assertEqual([(outlier['image_file'], outlier['stage']) for outlier in summary['outliers']],
+                         [("game_3.png", "detect_scoreboard"), ("game_3.png", "image")])
+        self.assertIn("busy_work", " ".join(function['function'] for function in summary['hot_functions']))
+        with open(os.path.join(profiler.directory, "summary.json")) as file:
+            self.assertEqual(len(json.load(file)['images']), 3)
+        self.assertTrue(os.path.exists(os.path.join(profiler.directory, "summary.txt")))
+
+    def test_find_outliers(self):
+        images = [{'image_file': f"game_{i}.png", 'stages': {'llm_request': 2.0, 'encode_image': 0.01, 'user_review': 5.0}}
+                  for i in range(5)]
+        images[1]['stages'].update(llm_request=7.0, encode_image=0.05, user_review=60.0)
+        images[2]['stages'].update(llm_request=5.9)
+
+        outliers, medians = find_outliers(images, factor=3.0, min_seconds=0.1)
+        self.assertEqual(medians['llm_request'], 2.0)
+        self.assertEqual([(outlier['image_file'], outlier['stage'], outlier['ratio']) for outlier in outliers],
+                         [("game_1.png", "llm_request", 3.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for the local rating service and its client.
+
+These tests run entirely offline against temporary files and a service on a free local port. They validate:
+1. That the leaderboard, player lookup (including past names) and predictions come from the in-memory registry
+2. That matchmaking returns named teams and invalid requests are answered with an error status
+3. That a submitted game is rated like the ingest loop rates it and is flushed to both files
+4. That the service picks up commits made to the database by other processes
+"""
+
+import os
+import sys
+import json
+import shutil
+import asyncio
+import tempfile
+import threading
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.database import players_database
+from modules.persistence import WriteBehindStore
+from modules.rating_service import RatingService, serve
+from modules.service_client import RatingServiceClient, RatingServiceError, connect_to_service
+from modules.elo_calculation import gamePrediction, calculatePoints
+from modules.name_management import change_player_name
+
+
+def make_player(name, elo, past_names=()):
+    return {'PlayerName': name, 'Starting Elo': elo, 'games played': 10, 'past names': list(past_names),
+            'Elo History': [elo], 'Games Won': 5, 'Games Lost': 5}
+
+
+class TestRatingService(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.players_path = os.path.join(self.tmp_dir, 'players_data.json')
+        self.games_path = os.path.join(self.tmp_dir, 'game_results.json')
+        players = [make_player('Ann', 1500, ['ANN_OLD']), make_player('Bob', 1400), make_player('Cid', 1300), make_player('Dee', 1250)]
+        players_database(self.players_path).commit({'Players': players}, 0)
+
+        self.store = WriteBehindStore.open(self.players_path, self.games_path)
+        self.service = RatingService(self.store)
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.task = self.loop.create_task(serve(self.service, '127.0.0.1', 0, ready))
+            try:
+                self.loop.run_until_complete(self.task)
+            except asyncio.CancelledError:
+                pass
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        self.assertTrue(ready.wait(5))
+        self.client = RatingServiceClient(*self.service.address)
+
+    def tearDown(self):
+        self.client.close()
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(5)
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_queries(self):
+        self.assertIsNotNone(connect_to_service(*self.service.address))
+        leaderboard = self.client.leaderboard(2)
+        self.assertEqual([(p['Rank'], p['PlayerName']) for p in leaderboard], [(1, 'Ann'), (2, 'Bob')])
+        self.assertEqual(self.client.player('ANN_OLD')['PlayerName'], 'Ann')
+        with self.assertRaises(RatingServiceError) as error:
+            self.client.player('Nobody')
+        self.assertEqual(error.exception.status, 404)
+
+        prediction = self.client.predict({'Team A': ['Ann', 'Dee'], 'Team B': ['Bob', 'Cid']})
+        expected = gamePrediction({'Team A': {'players': [['Ann', 1500], ['Dee', 1250]]},
+                                   'Team B': {'players': [['Bob', 1400], ['Cid', 1300]]}})
+        self.assertAlmostEqual(prediction['Team A']['winProbability'], expected['Team A']['winProbability'])
+
+    def test_matchmake(self):
+        splits = self.client.matchmake(['Ann', 'Bob', 'Cid', 'Dee'], k=2, pinned_b=['Ann'])['splits']
+        self.assertEqual(len(splits), 2)
+        for split in splits:
+            self.assertIn('Ann', split['team_b'])
+            self.assertEqual(sorted(split['team_a'] + split['team_b']), ['Ann', 'Bob', 'Cid', 'Dee'])
+
+        with self.assertRaises(RatingServiceError):
+            self.client.matchmake(['Ann', 'Bob', 'Cid'])
+        with self.assertRaises(RatingServiceError):
+            self.client.matchmake(['Ann', 'Bob', 'Cid', 'Dee'], pinned_a=['Ann'], pinned_b=['Ann'])
+
+    def test_submit_game(self):
+        game = {'teams': {'Team A': {'victory_points': 12, 'players': [{'name': 'Ann', 'score': 30}, {'name': 'Dee', 'score': 20}]},
+                          'Team B': {'victory_points': 8, 'players': [{'name': 'Bob', 'score': 25}, {'name': 'Eve', 'score': 10}]}},
+                'winner': 'Team A'}
+        result = self.client.submit_game(game, image_file='game.png')
+
+        expected = calculatePoints({
+            'Team A': {'players': [['Ann', 1500, 10, 0, 0], ['Dee', 1250, 10, 0, 0]], 'Points': 12, 'winProbability': None},
+            'Team B': {'players': [['Bob', 1400, 10, 0, 0], ['Eve', 1200, 0, 0, 0]], 'Points': 8, 'winProbability': None}})
+        expected_elo = {player[0]: player[6] for team in expected.values() for player in team['players']}
+        self.assertEqual({p['name']: p['elo_after'] for p in result['players']}, expected_elo)
+        self.assertEqual(self.client.player('Eve')['Starting Elo'], expected_elo['Eve'])
+
+        with self.assertRaises(RatingServiceError):
+            self.client.submit_game({'teams': {'Team A': {'victory_points': None, 'players': []}}})
+
+        self.store.flush()
+        with open(self.games_path) as file:
+            self.assertEqual(json.load(file)[-1]['image_file'], 'game.png')
+        players, _ = players_database(self.players_path).read()
+        self.assertEqual({p['PlayerName']: p['Starting Elo'] for p in players['Players']}['Ann'], expected_elo['Ann'])
+
+    def test_picks_up_external_commits(self):
+        change_player_name(self.players_path, 'Bob', 'Robert')
+        self.assertEqual(self.client.player('Bob')['PlayerName'], 'Robert')
+        self.assertEqual(self.client.leaderboard(2)[1]['PlayerName'], 'Robert')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the static HTML report.
+
+These tests run entirely offline against temporary files. They validate:
+1. That a first publish renders the leaderboard, the recent games with thumbnails and a page per player,
+   with image file names escaped
+2. That later publishes only re-render the pages of the players of the new games, and drop renamed players' pages
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from PIL import Image
+
+from modules.synthetic_league import SyntheticLeague
+from modules.report import publish_report, player_page
+from modules.replay import build_name_resolver
+
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.tmp_dir, "report")
+        self.cropped = os.path.join(self.tmp_dir, "cropped_scoreboards")
+        self.league = SyntheticLeague(40, seed=5, rename_rate=0).play(60)
+        self.players_path, self.games_path = self.league.write(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def publish(self, **kwargs):
+        return publish_report(self.output, self.players_path, self.games_path, cropped_folder=self.cropped, recent_games=10, **kwargs)
+
+    def test_first_publish(self):
+        last_game = self.league.game_results[-1]
+        os.makedirs(self.cropped)
+        Image.new("RGB", (1200, 800), "white").save(os.path.join(self.cropped, last_game['image_file'].replace(".png", "_upscaled.png")))
+
+        result = self.publish()
+        players = self.league.elo_database['Players']
+        self.assertEqual(sorted(result['players_rendered']), sorted(player['PlayerName'] for player in players))
+        self.assertEqual(result['games'], 60)
+        self.assertEqual(len(os.listdir(os.path.join(self.output, "players"))), len(players))
+
+        with open(os.path.join(self.output, "index.html"), encoding="utf-8") as file:
+            self.assertIn(f"players/{player_page(players[0]['PlayerName'])}", file.read())
+        with open(os.path.join(self.output, "games.html"), encoding="utf-8") as file:
+            self.assertIn(f'src="thumbnails/{last_game["image_file"].replace(".png", ".jpg")}"', file.read())
+        with Image.open(os.path.join(self.output, "thumbnails", last_game['image_file'].replace(".png", ".jpg"))) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 480)
+        with open(os.path.join(self.output, "players", player_page(players[0]['PlayerName'])), encoding="utf-8") as file:
+            self.assertIn("<polyline", file.read())
+
+    def test_image_file_names_are_escaped(self):
+        last_game = self.league.game_results[-1]
+        last_game['image_file'] = 'final "4v4".png'
+        self.league.write(self.tmp_dir)
+        os.makedirs(self.cropped)
+        Image.new("RGB", (1200, 800), "white").save(os.path.join(self.cropped, 'final "4v4"_upscaled.png'))
+
+        self.publish()
+        with open(os.path.join(self.output, "games.html"), encoding="utf-8") as file:
+            self.assertIn('<img src="thumbnails/final &quot;4v4&quot;.jpg" alt="final &quot;4v4&quot;.png">', file.read())
+
+    def test_incremental_publish(self):
+        self.publish()
+        self.assertEqual(self.publish()['players_rendered'], [])
+
+        game_entry = self.league.play_game()
+        self.league.write(self.tmp_dir)
+        resolve = build_name_resolver(self.league.elo_database)
+        played = {resolve(player['name']) for team in game_entry['consensus_data']['teams'].values() for player in team['players']}
+        self.assertEqual(set(self.publish()['players_rendered']), played)
+
+        old_name = self.league.elo_database['Players'][0]['PlayerName']
+        self.league.rename(next(player for player in self.league.players if player['name'] == old_name))
+        self.league.write(self.tmp_dir)
+        result = self.publish()
+        self.assertEqual(result['players_removed'], [old_name])
+        self.assertEqual(len(result['players_rendered']), len(self.league.elo_database['Players']))  # Links to the old name changed everywhere
+        self.assertFalse(os.path.exists(os.path.join(self.output, "players", player_page(old_name))))
+
+
+if __name__ == '__main__':
+    unittest.main()
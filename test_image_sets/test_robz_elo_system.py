@@ -11,10 +11,14 @@ The test compares the parsed results against expected JSON files, validating tha
 - All players are detected
 - Player names are extracted accurately
 - Player scores are parsed correctly
+
+Without CLAUDE_API_KEY, the images are parsed from the responses recorded in CASSETTES_PATH
+(record them with: python -m benchmarks.bench_accuracy --mode record); images without a recording are skipped.
 """
 
 IMAGE_SET_PATH = 'images/set_1'
 EXPECTED_RESULTS_PATH = 'expected_results/set_1'
+CASSETTES_PATH = 'cassettes/set_1'  # Recorded API responses, replayed when no API key is set (see benchmarks/bench_accuracy.py)
 
 import os
 import sys
@@ -29,6 +33,8 @@ sys.path.insert(0, parent_dir)
 
 # Now you can import modules from the parent directory
 from modules.extract_data import parse_game_score
+from modules.cassettes import Cassette, CassetteClient
+from configs.llm_config import API_KEYS
 from modules.utils import load_elo_database
 from configs.app_config import ELO_JSON_DATABASE_PATH, LOGGING_FILE_PATH, LOG_LEVEL
 
@@ -80,7 +86,13 @@ class TestRobzEloSystem(unittest.TestCase):
                 
                 # Parse game score using your existing function
                 logger.info("Parsing game score...")
-                game_result = parse_game_score(image_path, num_attempts=1)
+                client = None
+                if not API_KEYS['claude']:
+                    cassette_path = os.path.join(current_dir, CASSETTES_PATH, os.path.splitext(image_file)[0] + '.json')
+                    if not os.path.exists(cassette_path):
+                        self.skipTest(f"No CLAUDE_API_KEY and no recorded responses in '{cassette_path}'")
+                    client = CassetteClient(Cassette(cassette_path), mode="replay")
+                game_result = parse_game_score(image_path, num_attempts=1, client=client)
                 self.assertIsNotNone(game_result, f"Failed to parse game result for {image_file}")
                 logger.info("Game score parsed successfully")
 
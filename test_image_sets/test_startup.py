@@ -0,0 +1,55 @@
+"""
+Tests for the startup cost of the command line entry point.
+
+These tests run entirely offline, each command in a fresh interpreter in a temporary directory. They validate:
+1. That the commands that do not read images never import OpenCV, Pillow, the Anthropic client or pandas
+2. That the rename and replay subcommands work on the database in the working directory
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from benchmarks.bench_startup import COMMANDS, write_database, run_command, loaded_heavy_modules
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        write_database(self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_no_heavy_imports(self):
+        for command, arguments, allowed in COMMANDS:
+            with self.subTest(command=command):
+                unexpected = [module for module in loaded_heavy_modules(arguments, self.tmp_dir) if module not in allowed]
+                self.assertEqual(unexpected, [])
+
+    def test_rename_and_replay(self):
+        script = os.path.join(parent_dir, "robz_elo_system.py")
+        _, completed = run_command([script, "rename", "Player 3", "Player Three"], self.tmp_dir)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        _, completed = run_command([script, "replay", "--player", "Player Three"], self.tmp_dir)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+
+        with open(os.path.join(self.tmp_dir, "players_data.json")) as file:
+            players = {player['PlayerName']: player for player in json.load(file)['Players']}
+        self.assertIn("Player 3", players["Player Three"]['past names'])
+        # Player 3 played in games 0-3 of the ledger (see write_database): rewinding removes four history
+        # entries (all there are) and replaying adds one per game again
+        self.assertEqual(len(players["Player Three"]['Elo History']), 4)
+        self.assertEqual(players["Player Three"]['games played'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
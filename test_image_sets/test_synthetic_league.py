@@ -0,0 +1,65 @@
+"""
+Tests for the synthetic league generator used for load testing.
+
+These tests run entirely offline against temporary files. They validate:
+1. That the same seed generates the same ledger and the same ratings
+2. That replaying the written ledger reproduces the generated ratings, renames and misread names included
+3. That a rendered scoreboard is found by the scoreboard detection and its expected result is written
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.synthetic_league import SyntheticLeague
+from modules.replay import rebuild_ratings
+from modules.database import players_database
+from modules.extract_data import detect_scoreboard
+
+
+class TestSyntheticLeague(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_seed_same_league(self):
+        first = SyntheticLeague(40, seed=7).play(100)
+        second = SyntheticLeague(40, seed=7).play(100)
+        self.assertEqual(first.game_results, second.game_results)
+        self.assertEqual(first.elo_database, second.elo_database)
+        self.assertNotEqual(first.game_results, SyntheticLeague(40, seed=8).play(100).game_results)
+
+    def test_replay_reproduces_ratings(self):
+        league = SyntheticLeague(60, seed=3, alias_rate=0.05, rename_rate=0.02).play(300)
+        self.assertTrue(league.renames)
+        self.assertTrue(any(record['past names'] for record in league.elo_database['Players']))
+
+        players_path, game_results_path = league.write(self.tmp_dir)
+        rebuild_ratings(players_path, game_results_path)
+        eloDatabase, _ = players_database(players_path).read()
+        self.assertEqual(eloDatabase, league.elo_database)
+
+    def test_render(self):
+        league = SyntheticLeague(20, seed=1).play(3)
+        league.render(self.tmp_dir, 1)
+        game_entry = league.game_results[-1]
+        stem = os.path.splitext(game_entry['image_file'])[0]
+
+        with open(os.path.join(self.tmp_dir, "expected_results", f"{stem}.json")) as file:
+            self.assertEqual(json.load(file), game_entry['consensus_data'])
+        scoreboard = detect_scoreboard(os.path.join(self.tmp_dir, "images", game_entry['image_file']), save_cropped=False)
+        self.assertLess(scoreboard.size, (2 * 1920, 2 * 1080))  # The panel, not the whole screenshot (upscaled 2x)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Tests for the matchmaking team balancer.
+
+These tests run entirely offline. They validate:
+1. That the exact solvers (DP and meet in the middle) find the same difference as a brute-force search
+2. That every solver returns two teams of the right size covering every player once
+3. That the heuristic solver stays close to the exact result for large lobbies
+4. That the win-probability objective uses the same model as gamePrediction and finds the split closest to 50%
+5. That multi-lobby partitioning uses every player once, honours must-together/must-apart constraints and
+   returns within its time budget
+6. That top_splits returns the same k best splits as a brute-force search, with and without pinned players
+"""
+
+import os
+import sys
+import time
+import random
+import unittest
+from itertools import combinations
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.insert(0, parent_dir)
+
+from modules.team_balancer import balance_teams, win_probability_matrix, split_win_probabilities, top_splits
+from modules.elo_calculation import gamePrediction, playerProbability
+from modules.lobby_partitioner import partition_lobbies
+
+
+def brute_force_difference(ratings):
+    total = sum(ratings)
+    return min(abs(total - 2 * sum(ratings[i] for i in team)) for team in combinations(range(len(ratings)), len(ratings) // 2))
+
+
+class TestTeamBalancer(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+
+    def assertValidSplit(self, split, num_players):
+        self.assertEqual(len(split['team_a']), num_players // 2)
+        self.assertEqual(sorted(split['team_a'] + split['team_b']), list(range(num_players)))
+
+    def test_exact_solvers_match_brute_force(self):
+        for _ in range(100):
+            num_players = self.rng.randint(2, 12)
+            ratings = [self.rng.randint(900, 1700) for _ in range(num_players)]
+            expected = brute_force_difference(ratings)
+            for method in ("dp", "mitm"):
+                split = balance_teams(ratings, method)
+                self.assertValidSplit(split, num_players)
+                self.assertEqual(abs(split['difference']), expected, (method, ratings))
+
+            fractional = [rating + self.rng.random() for rating in ratings]
+            split = balance_teams(fractional, "auto")
+            self.assertEqual(split['method'], "mitm")
+            self.assertAlmostEqual(abs(split['difference']), brute_force_difference(fractional))
+
+    def test_large_lobbies(self):
+        ratings = [self.rng.randint(900, 1900) for _ in range(60)]
+        exact = balance_teams(ratings)
+        self.assertEqual(exact['method'], "dp")
+        self.assertValidSplit(exact, 60)
+        self.assertIn(0, exact['team_a'])  # Symmetry breaking: player 0 is always on team A
+
+        heuristic = balance_teams(ratings, "kk")
+        self.assertValidSplit(heuristic, 60)
+        self.assertLessEqual(abs(heuristic['difference']), abs(exact['difference']) + 10)
+
+    def test_win_probability_objective(self):
+        ratings = [self.rng.randint(900, 1900) for _ in range(10)]
+        probabilities = win_probability_matrix(ratings)
+        self.assertEqual(probabilities[2, 5], playerProbability(ratings[5], ratings[2]))
+
+        split = balance_teams(ratings, objective="win_probability")
+        self.assertEqual(split['method'], "exhaustive")
+        self.assertValidSplit(split, 10)
+        playerDictionary = {
+            'Team A': {'players': [[str(i), ratings[i]] for i in split['team_a']]},
+            'Team B': {'players': [[str(i), ratings[i]] for i in split['team_b']]}
+        }
+        predicted = gamePrediction(playerDictionary)['Team A']['winProbability']
+        self.assertAlmostEqual(split['win_probability'], predicted, places=4)
+
+        masks = [[1 if i in team else 0 for i in range(10)] for team in combinations(range(10), 5)]
+        gaps = abs(split_win_probabilities(probabilities, masks) - 0.5)
+        self.assertAlmostEqual(abs(split['win_probability'] - 0.5), gaps.min(), places=4)
+
+    def test_win_probability_swap_search(self):
+        ratings = [self.rng.randint(900, 1900) for _ in range(41)]
+        split = balance_teams(ratings, objective="win_probability")
+        self.assertEqual(split['method'], "swap search")
+        self.assertValidSplit(split, 41)
+        self.assertLessEqual(abs(split['win_probability'] - 0.5), abs(balance_teams(ratings)['win_probability'] - 0.5))
+
+    def test_partition_lobbies(self):
+        ratings = [self.rng.randint(900, 1900) for _ in range(27)]
+        together, apart = [(0, 1), (2, 3, 4)], [(0, 5), (2, 6)]
+        result = partition_lobbies(ratings, team_size=4, together=together, apart=apart, time_budget=0.2)
+
+        self.assertEqual(len(result['lobbies']), 3)
+        self.assertEqual(len(result['bench']), 3)
+        seated = [p for lobby in result['lobbies'] for p in lobby['team_a'] + lobby['team_b']]
+        self.assertEqual(sorted(seated + result['bench']), list(range(27)))
+        self.assertEqual(result['violations'], 0)
+
+        team_of = {p: (number, side) for number, lobby in enumerate(result['lobbies'])
+                   for side in ('team_a', 'team_b') for p in lobby[side]}
+        for group in together:
+            self.assertEqual(len({team_of.get(p, 'bench') for p in group}), 1)
+        for first, second in apart:
+            self.assertTrue(first not in team_of or team_of.get(first) != team_of.get(second))
+
+        impossible = partition_lobbies(ratings[:24], team_size=4, together=[(0, 1)], apart=[(0, 1)], time_budget=0.05)
+        self.assertEqual(impossible['violations'], 1)
+
+    def test_partition_lobbies_keeps_to_time_budget(self):
+        # The final polish checks the deadline too: a full pass over a large pool takes seconds
+        ratings = [self.rng.randint(900, 1900) for _ in range(600)]
+        start = time.monotonic()
+        result = partition_lobbies(ratings, team_size=4, time_budget=0.1)
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(len(result['lobbies']), 75)
+
+    def test_top_splits_match_brute_force(self):
+        for _ in range(60):
+            num_players = self.rng.randint(4, 12)
+            ratings = [self.rng.randint(900, 1700) + (self.rng.random() if self.rng.random() < 0.3 else 0) for _ in range(num_players)]
+            pinned_a, pinned_b = ([0], [num_players - 1]) if self.rng.random() < 0.5 else ([], [])
+            k = self.rng.randint(1, 6)
+            splits = top_splits(ratings, k, pinned_a, pinned_b)
+
+            total = sum(ratings)
+            teams = [team for team in combinations(range(num_players), num_players // 2)
+                     if set(pinned_a) <= set(team) and not set(pinned_b) & set(team)]
+            if not pinned_a and num_players % 2 == 0:
+                teams = [team for team in teams if 0 in team]  # Each split once
+            expected = sorted(abs(total - 2 * sum(ratings[i] for i in team)) for team in teams)[:k]
+
+            self.assertEqual([split['rank'] for split in splits], list(range(1, len(expected) + 1)))
+            for split, difference in zip(splits, expected):
+                self.assertValidSplit(split, num_players)
+                self.assertTrue(set(pinned_a) <= set(split['team_a']) and set(pinned_b) <= set(split['team_b']))
+                self.assertAlmostEqual(abs(split['difference']), difference, places=4)
+            self.assertEqual(len({tuple(split['team_a']) for split in splits}), len(splits))
+
+        with self.assertRaises(ValueError):
+            top_splits([1000, 1100, 1200, 1300], pinned_a=[0], pinned_b=[0])
+
+
+if __name__ == '__main__':
+    unittest.main()